@@ -0,0 +1,175 @@
+"""
+Synthetic document corpus shared by the ingestion and retrieval benchmarks
+
+Writes a mix of PDF, DOCX and Markdown files with plausible technical prose,
+and builds notes with known answers for measuring retrieval recall.
+The PDFs are written by hand (one Helvetica text stream per page) so no PDF
+authoring library is needed.
+"""
+
+import os
+import tempfile
+from typing import List, Optional
+
+# Every on-disk store the server writes, and its file or directory name
+SCRATCH_PATHS = (
+    ("CHROMA_DB_PATH", "chroma"),
+    ("CATALOG_DB_PATH", "document_catalog.db"),
+    ("LEXICAL_INDEX_PATH", "lexical_index.db"),
+    ("EMBEDDING_CACHE_PATH", "embedding_cache.db"),
+    ("CONVERSATION_DB_PATH", "conversations.db"),
+    ("JOB_DB_PATH", "ingestion_jobs.db"),
+    ("JOB_FILES_PATH", "ingestion_job_files"),
+    ("DOCUMENTS_PATH", "documents"),
+)
+
+TOPICS = [
+    "carrier onboarding", "ELD integration", "ocean visibility", "rate limits",
+    "webhook retries", "tracking accuracy", "API authentication", "data retention",
+]
+
+
+def use_scratch_paths(prefix: str, scratch: Optional[str] = None) -> str:
+    """
+    Point every store the server writes at a scratch directory
+    
+    Config is read at import time, so call this before importing llm_rag.
+    Variables already set are left alone. Returns the scratch directory.
+    """
+    scratch = scratch or tempfile.mkdtemp(prefix=prefix)
+    for variable, name in SCRATCH_PATHS:
+        os.environ.setdefault(variable, os.path.join(scratch, name))
+    return scratch
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def paragraph(seed: int) -> str:
+    topic = TOPICS[seed % len(TOPICS)]
+    return (
+        f"Section {seed + 1} covers {topic}. Teams configure {topic} through the admin console, "
+        f"and changes to {topic} are audited. When {topic} fails, the platform raises an alert "
+        f"and retries with exponential backoff before paging the on-call engineer."
+    )
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: List[List[str]]):
+    """Write a minimal PDF with one line of text per entry on each page"""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages, filled in once the page object numbers are known
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_refs = []
+    for lines in pages:
+        ops = ["BT", "/F1 10 Tf", "12 TL", "40 800 Td"]
+        ops += [f"({_pdf_escape(line)}) '" for line in lines]
+        ops.append("ET")
+        stream = "\n".join(ops)
+        objects.append(f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream")
+        content_ref = len(objects)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_ref} 0 R >>"
+        )
+        page_refs.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(page_refs)}] /Count {len(page_refs)} >>"
+    
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def write_docx(path: str, paragraphs: List[str]):
+    import docx
+    
+    document = docx.Document()
+    for text in paragraphs:
+        document.add_paragraph(text)
+    document.save(path)
+
+
+def write_markdown(path: str, paragraphs: List[str]):
+    with open(path, "w", encoding="utf-8") as f:
+        for i, text in enumerate(paragraphs):
+            f.write(f"## Part {i + 1}\n\n{text}\n\n")
+
+
+def build_corpus(directory: str, files: int, pages: int = 4) -> List[str]:
+    """
+    Write `files` documents rotating through PDF, DOCX and Markdown
+    
+    Each document holds about `pages` pages of text (~1,500 characters each).
+    Returns the file paths in creation order.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(files):
+        page_texts = [[paragraph(i + page + line) for line in range(6)] for page in range(pages)]
+        kind = ("pdf", "docx", "md")[i % 3]
+        path = os.path.join(directory, f"doc_{i:04d}.{kind}")
+        if kind == "pdf":
+            # Long lines run off the page but still extract; that's fine here
+            write_pdf(path, page_texts)
+        elif kind == "docx":
+            write_docx(path, [line for page in page_texts for line in page])
+        else:
+            write_markdown(path, [" ".join(page) for page in page_texts])
+        paths.append(path)
+    return paths
+
+
+SERVICES = ["ingest", "tracking", "billing", "webhook", "carrier", "eld", "ocean", "search"]
+
+FACTS = [
+    ("New hires get their laptop from the IT desk on the third floor on their first morning.",
+     "Where do I pick up my computer when I start?"),
+    ("The quarterly hackathon runs for two days and every team demos on Friday afternoon.",
+     "How long is the company's internal coding competition?"),
+    ("Expense reports above five hundred dollars need approval from a director.",
+     "Who signs off on large reimbursement claims?"),
+    ("The staging cluster is wiped and rebuilt from production snapshots every Sunday night.",
+     "When does the pre-production environment get refreshed?"),
+]
+
+
+def retrieval_notes(count: int):
+    """(text, needle, query) for each note; the needle appears in exactly one chunk"""
+    notes = []
+    for n in range(count):
+        service = SERVICES[n % len(SERVICES)]
+        kind = n % 3
+        if kind == 0:
+            needle = f"{service.upper()}_WORKER_{n}_TIMEOUT"
+            sentence = f"Set {needle} to raise the {service} worker timeout."
+            query = f"What does {needle} control?"
+        elif kind == 1:
+            needle = f"--{service}-shard-{n}"
+            sentence = f"Pass {needle} to the {service} CLI to replay a single shard."
+            query = f"What is the {needle} flag for?"
+        else:
+            needle = f"E{n:04d}"
+            sentence = f"Error {needle} from the {service} service means the upstream token expired."
+            query = f"How do I fix error {needle}?"
+        notes.append((f"{paragraph(n)} {sentence} {paragraph(n + 1)}", needle, query))
+    for fact, question in FACTS:
+        notes.append((fact, fact, question))
+    return notes
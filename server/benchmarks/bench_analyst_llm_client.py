@@ -0,0 +1,97 @@
+"""
+Per-request overhead of The Analyst's Gemini client
+
+The old handler ran genai.configure() and built a new GenerativeModel on every
+request, then called the blocking generate_content() inside the event loop.
+The current handler reuses the ChatGoogleGenerativeAI client created at
+startup and awaits ainvoke()/astream().
+
+Offline, this measures the client setup cost the old path paid per request.
+With --live and GOOGLE_API_KEY set it also times real calls both ways, run
+concurrently, so event-loop blocking shows up in the wall time (this spends
+quota).
+
+Usage (from the server/ directory):
+    python benchmarks/bench_analyst_llm_client.py [--iterations 500] [--live --concurrency 8]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-fake-key")
+
+PROMPT = "Summarize in one sentence: carriers send location pings every 15 minutes."
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--live", action="store_true", help="Also time real Gemini calls")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    
+    import google.generativeai as genai
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    from llm_rag.config import config
+    
+    per_request = []
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        genai.configure(api_key=config.google_api_key)
+        genai.GenerativeModel(config.gemini_model)
+        per_request.append(time.perf_counter() - start)
+    
+    start = time.perf_counter()
+    shared = ChatGoogleGenerativeAI(
+        model=config.gemini_model,
+        temperature=0.7,
+        google_api_key=config.google_api_key
+    )
+    shared_setup = time.perf_counter() - start
+    
+    print(f"\n📊 Analyst Gemini client setup ({args.iterations} requests)")
+    print("=" * 60)
+    print(f"Per-request configure + GenerativeModel: median {statistics.median(per_request) * 1e6:.0f} us, "
+          f"p99 {sorted(per_request)[int(len(per_request) * 0.99) - 1] * 1e6:.0f} us")
+    print(f"Shared client, built once at startup:    {shared_setup * 1e3:.1f} ms total")
+    
+    if not args.live:
+        return
+    if config.google_api_key == "benchmark-fake-key":
+        print("\n⚠️  --live needs GOOGLE_API_KEY")
+        return
+    
+    async def old_path():
+        genai.configure(api_key=config.google_api_key)
+        model = genai.GenerativeModel(config.gemini_model)
+        return model.generate_content(PROMPT).text
+    
+    async def new_path(semaphore):
+        async with semaphore:
+            return (await shared.ainvoke(PROMPT)).content
+    
+    async def run(make_call):
+        start = time.perf_counter()
+        await asyncio.gather(*(make_call() for _ in range(args.concurrency)))
+        return time.perf_counter() - start
+    
+    async def compare():
+        semaphore = asyncio.Semaphore(config.max_concurrent_analyst_calls)
+        old_wall = await run(old_path)
+        new_wall = await run(lambda: new_path(semaphore))
+        print(f"\n{args.concurrency} concurrent live calls")
+        print(f"Old (blocking, per-request client): {old_wall:.2f}s wall")
+        print(f"New (shared async client):          {new_wall:.2f}s wall")
+    
+    asyncio.run(compare())
+
+
+if __name__ == "__main__":
+    main()
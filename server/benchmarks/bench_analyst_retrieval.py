@@ -0,0 +1,122 @@
+"""
+Prompt size and latency of The Analyst: whole document vs top-k chunks
+
+Builds a synthetic ~200 page document, indexes it the way /api/analyst/upload
+does, and compares the prompt the old code sent (entire document) with the
+chunked-retrieval prompt for a few questions. Token counts are estimated at
+4 characters per token.
+
+With --live and GOOGLE_API_KEY set, both prompts are also sent to Gemini so
+end-to-end latency can be compared (this spends quota).
+
+Usage (from the server/ directory):
+    python benchmarks/bench_analyst_retrieval.py [--pages 200] [--live]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _corpus import use_scratch_paths
+
+# Config is read at import time, so point every store at scratch files first
+use_scratch_paths("bench_analyst_")
+
+TOPICS = [
+    "carrier onboarding", "ELD integration", "ocean visibility", "rate limits",
+    "webhook retries", "tracking accuracy", "API authentication", "data retention",
+]
+QUESTIONS = [
+    "What are the webhook retry rules?",
+    "How does API authentication work?",
+    "How long is tracking data retained?",
+]
+
+
+def synthetic_document(pages: int) -> str:
+    """Roughly 3,000 characters per page of plausible technical prose"""
+    parts = []
+    for page in range(pages):
+        topic = TOPICS[page % len(TOPICS)]
+        paragraph = (
+            f"Section {page + 1} covers {topic}. Teams configure {topic} through the admin console, "
+            f"and changes to {topic} are audited. When {topic} fails, the platform raises an alert "
+            f"and retries with exponential backoff before paging the on-call engineer. "
+        )
+        parts.append(paragraph * 10)
+    return "\n\n".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--live", action="store_true", help="Also time real Gemini calls")
+    args = parser.parse_args()
+    
+    from llm_rag.analyst import DocumentIndex, build_analyst_prompt, format_excerpts
+    from llm_rag.config import config
+    from llm_rag.document_processor import DocumentProcessor
+    
+    processor = DocumentProcessor()
+    text = synthetic_document(args.pages)
+    
+    start = time.perf_counter()
+    chunks = processor.text_splitter.split_text(text)
+    embeddings = processor.embedding_service.embed_documents(chunks)
+    index = DocumentIndex(chunks, embeddings)
+    build_seconds = time.perf_counter() - start
+    
+    print(f"\n📊 {args.pages} pages, {len(text):,} chars, {len(chunks)} chunks, top_k={config.analyst_top_k}")
+    print(f"Index build (split + embed): {build_seconds:.2f}s, index size {index.nbytes / 1024:.0f} KB")
+    print("=" * 72)
+    print(f"{'question':<36} {'full tokens':>12} {'top-k tokens':>13} {'retrieval (ms)':>15}")
+    
+    prompts = []
+    for question in QUESTIONS:
+        full_prompt = build_analyst_prompt("bench.pdf", text, question)
+        
+        timings = []
+        for _ in range(20):
+            start = time.perf_counter()
+            query_embedding = processor.embedding_service.embed_queries([question])[0]
+            excerpts = index.context_for(query_embedding, config.analyst_top_k)
+            timings.append(time.perf_counter() - start)
+        chunked_prompt = build_analyst_prompt("bench.pdf", format_excerpts(index, excerpts), question)
+        
+        prompts.append((full_prompt, chunked_prompt))
+        print(
+            f"{question:<36} {len(full_prompt) // 4:>12,} {len(chunked_prompt) // 4:>13,} "
+            f"{statistics.median(timings) * 1000:>15.1f}"
+        )
+    
+    if args.live:
+        import google.generativeai as genai
+        
+        if not config.google_api_key:
+            print("\n⚠️  --live needs GOOGLE_API_KEY")
+            return
+        genai.configure(api_key=config.google_api_key)
+        model = genai.GenerativeModel(config.gemini_model)
+        
+        print(f"\n{'question':<36} {'full (s)':>12} {'top-k (s)':>13}")
+        for question, (full_prompt, chunked_prompt) in zip(QUESTIONS, prompts):
+            results = []
+            for prompt in (full_prompt, chunked_prompt):
+                start = time.perf_counter()
+                try:
+                    model.generate_content(prompt)
+                    results.append(f"{time.perf_counter() - start:.2f}")
+                except Exception as e:
+                    # Oversized full-document prompts can exceed the context window
+                    results.append(f"error: {type(e).__name__}")
+            print(f"{question:<36} {results[0]:>12} {results[1]:>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Batch upload throughput: sequential loop vs the staged ingestion pipeline
+
+Generates a mixed PDF/DOCX/Markdown corpus and ingests it twice into a scratch
+Chroma database: once the way /api/documents/batch-upload used to (awaiting
+process_and_ingest per file), and once through IngestionPipeline, which
+overlaps saving, extraction in a process pool, chunking, batched embedding
+and bulk writes.
+
+Usage (from the server/ directory):
+    python benchmarks/bench_batch_ingest.py [--files 500] [--pages 4]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _corpus import build_corpus, use_scratch_paths
+
+# Config is read at import time, so point every store at scratch files first
+use_scratch_paths("bench_ingest_")
+
+CONTENT_TYPES = {
+    ".pdf": "application/pdf",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".md": "text/markdown",
+}
+
+
+def as_upload(path: str):
+    """Wrap a file on disk the way FastAPI hands it to the endpoint"""
+    from fastapi import UploadFile
+    from starlette.datastructures import Headers
+    
+    content_type = CONTENT_TYPES[os.path.splitext(path)[1]]
+    return UploadFile(
+        file=open(path, "rb"),
+        filename=os.path.basename(path),
+        headers=Headers({"content-type": content_type})
+    )
+
+
+async def run_sequential(processor, paths):
+    ok = 0
+    for path in paths:
+        upload = as_upload(path)
+        try:
+            await processor.process_and_ingest(file=upload, category="bench_sequential")
+            ok += 1
+        except Exception as e:
+            print(f"⚠️  {path}: {e}")
+        finally:
+            upload.file.close()
+    return ok
+
+
+async def run_pipeline(pipeline, paths):
+    uploads = [as_upload(path) for path in paths]
+    try:
+        results = await pipeline.ingest(
+            [{"filename": u.filename, "upload": u} for u in uploads],
+            category="bench_pipeline"
+        )
+    finally:
+        for upload in uploads:
+            upload.file.close()
+    return sum(1 for r in results if r["status"] == "success")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--pages", type=int, default=4, help="Pages of text per document")
+    args = parser.parse_args()
+    
+    from llm_rag.config import config
+    from llm_rag.document_processor import DocumentProcessor
+    from llm_rag.ingestion import IngestionPipeline
+    
+    corpus_dir = tempfile.mkdtemp(prefix="bench_corpus_")
+    print(f"Writing {args.files} documents to {corpus_dir} ...")
+    paths = build_corpus(corpus_dir, args.files, pages=args.pages)
+    
+    processor = DocumentProcessor()
+    pipeline = IngestionPipeline(processor)
+    # Warm the model and the process pool so neither run pays first-use costs
+    processor.embedding_service.embed_documents(["warm up"])
+    
+    start = time.perf_counter()
+    sequential_ok = asyncio.run(run_sequential(processor, paths))
+    sequential_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    pipeline_ok = asyncio.run(run_pipeline(pipeline, paths))
+    pipeline_seconds = time.perf_counter() - start
+    processor.shutdown()
+    
+    print(f"\n📊 Batch ingest of {args.files} mixed PDF/DOCX/MD files ({args.pages} pages each)")
+    print(f"extract workers={config.extract_workers}, embed batch={config.ingest_embed_batch_size}")
+    print("=" * 60)
+    print(f"{'mode':<12} {'ok':>6} {'seconds':>10} {'files/s':>10}")
+    print(f"{'sequential':<12} {sequential_ok:>6} {sequential_seconds:>10.2f} {args.files / sequential_seconds:>10.1f}")
+    print(f"{'pipeline':<12} {pipeline_ok:>6} {pipeline_seconds:>10.2f} {args.files / pipeline_seconds:>10.1f}")
+    print(f"Speedup: {sequential_seconds / pipeline_seconds:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
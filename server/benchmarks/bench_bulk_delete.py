@@ -0,0 +1,113 @@
+"""
+Deleting a large category: fetch-everything delete vs batched filtered delete
+
+Fills a scratch collection (and keyword index) with two categories of
+--chunks chunks each, using random 8-dimensional vectors so no embedding
+work is done, then deletes one category each way while a ticker task
+measures how long the event loop is held:
+    
+    fetch-all  - the old delete_documents_by_category: collection.get(where)
+                 of every chunk with its text and metadata, then one delete,
+                 all on the event loop
+    batched    - EmbeddingService.delete_batch on a thread until nothing
+                 matches, as the delete job does
+
+Memory is the Python-side peak (tracemalloc) during the delete. Finally
+times a full wipe with reset_collection.
+
+Usage (from the server/ directory):
+    python benchmarks/bench_bulk_delete.py [--chunks 200000] [--batch-size 2000]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _corpus import use_scratch_paths
+
+# Config is read at import time, so point every store at scratch files first
+scratch = use_scratch_paths("bench_delete_")
+
+
+def fill(service, category: str, chunks: int, batch_size: int):
+    for start in range(0, chunks, batch_size):
+        count = min(batch_size, chunks - start)
+        service.add_chunks(
+            ids=[f"{category}_{start + i}" for i in range(count)],
+            documents=[f"Chunk {start + i}: carrier onboarding and webhook retries." for i in range(count)],
+            metadatas=[
+                {"source": f"{category}_{(start + i) // 100}.md", "category": category, "chunk_index": i}
+                for i in range(count)
+            ],
+            embeddings=[[random.random() for _ in range(8)] for _ in range(count)]
+        )
+
+
+async def measure(delete) -> tuple:
+    """(seconds, longest event loop stall in seconds, peak traced MB) for one delete"""
+    stalls = []
+    
+    async def ticker():
+        while True:
+            before = time.perf_counter()
+            await asyncio.sleep(0.005)
+            stalls.append(time.perf_counter() - before - 0.005)
+    
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0.05)
+    tracemalloc.start()
+    start = time.perf_counter()
+    await delete()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    tick.cancel()
+    return elapsed, max(stalls), peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=200_000, help="Chunks per category")
+    parser.add_argument("--batch-size", type=int, default=2000)
+    args = parser.parse_args()
+    
+    from llm_rag.embeddings import chunk_filter, get_embedding_service
+    
+    service = get_embedding_service()
+    write_batch = min(5000, service.chroma_client.get_max_batch_size())
+    print(f"📥 Writing 2 x {args.chunks} chunks...")
+    for category in ("fetch_all", "batched"):
+        fill(service, category, args.chunks, write_batch)
+    
+    async def fetch_all():
+        results = service.collection.get(where={"category": "fetch_all"})
+        service.delete_chunks(results.get('ids', []))
+    
+    async def batched():
+        where = chunk_filter(category="batched")
+        while await asyncio.to_thread(service.delete_batch, where, args.batch_size):
+            pass
+    
+    print(f"\n📊 Deleting a category of {args.chunks} chunks (batch size {args.batch_size})")
+    print("=" * 64)
+    print(f"{'mode':<10} {'seconds':>9} {'max loop stall (ms)':>20} {'peak MB':>9}")
+    for name, delete in (("fetch-all", fetch_all), ("batched", batched)):
+        elapsed, stall, peak = asyncio.run(measure(delete))
+        print(f"{name:<10} {elapsed:>9.1f} {stall * 1000:>20.0f} {peak:>9.1f}")
+    
+    fill(service, "wipe", args.chunks, write_batch)
+    start = time.perf_counter()
+    wiped = service.reset_collection()
+    print(f"\n🗑️  reset_collection: {wiped} chunks in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Load-test RAGPipeline.query under concurrent chats
+
+Fires N concurrent queries through the real retrieval path (local embeddings +
+Chroma) with the Gemini client replaced by a fake that sleeps for a fixed
+latency. A heartbeat task measures event-loop lag, which is what a /health
+request would see while the chats are in flight.
+
+"blocking" mode reproduces the old behaviour of calling the LLM synchronously
+inside the async handler; "async" mode is the current ainvoke path.
+
+Usage (from the server/ directory):
+    python benchmarks/bench_chat_concurrency.py [--concurrency 50] [--llm-latency 0.5]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _corpus import percentile, use_scratch_paths
+
+# Config is read at import time, so point every store at scratch files first
+use_scratch_paths("bench_chat_")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-fake-key")
+
+
+class FakeLLM:
+    """Stands in for ChatGoogleGenerativeAI with a fixed response latency"""
+    
+    def __init__(self, latency: float, blocking: bool):
+        self.latency = latency
+        self.blocking = blocking
+    
+    def invoke(self, prompt):
+        time.sleep(self.latency)
+        return SimpleNamespace(content=f"Answer based on {len(prompt)} prompt chars")
+    
+    async def ainvoke(self, prompt):
+        if self.blocking:
+            # Old code path: a synchronous call made from inside the event loop
+            return self.invoke(prompt)
+        await asyncio.sleep(self.latency)
+        return SimpleNamespace(content=f"Answer based on {len(prompt)} prompt chars")
+
+
+async def heartbeat(stop: asyncio.Event, lags: list, interval: float = 0.01):
+    """Record how late the event loop wakes us up"""
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+
+async def run(pipeline, concurrency: int):
+    latencies = []
+    lags = []
+    
+    async def one_chat(i):
+        start = time.perf_counter()
+        await pipeline.query(f"How do I set up my dev environment? ({i})", conversation_id=f"bench-{i}")
+        latencies.append(time.perf_counter() - start)
+    
+    stop = asyncio.Event()
+    beat = asyncio.create_task(heartbeat(stop, lags))
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one_chat(i) for i in range(concurrency)))
+    wall = time.perf_counter() - wall_start
+    stop.set()
+    await beat
+    return latencies, lags, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Fake Gemini latency in seconds")
+    args = parser.parse_args()
+    
+    from llm_rag.config import config
+    from llm_rag.rag_pipeline import RAGPipeline
+    from llm_rag.document_processor import DocumentProcessor
+    
+    processor = DocumentProcessor()
+    if processor.collection.count() == 0:
+        text = "\n\n".join(
+            f"Step {i}: install the toolchain, export CHROMA_DB_PATH and run the setup script." * 5
+            for i in range(200)
+        )
+        processor.ingest_text_directly(text, source_name="bench_setup_guide.md", category="dev_setup")
+    
+    pipeline = RAGPipeline()
+    
+    print(f"\n📊 {args.concurrency} concurrent chats, fake LLM latency {args.llm_latency}s")
+    print("=" * 72)
+    print(f"{'mode':<10} {'p50 (s)':>9} {'p99 (s)':>9} {'wall (s)':>9} {'max loop lag (ms)':>19}")
+    for mode in ("blocking", "async"):
+        pipeline.llm = FakeLLM(args.llm_latency, blocking=(mode == "blocking"))
+        # asyncio primitives bind to the loop they are first used on
+        pipeline.llm_semaphore = asyncio.Semaphore(config.max_concurrent_llm_calls)
+        latencies, lags, wall = asyncio.run(run(pipeline, args.concurrency))
+        print(
+            f"{mode:<10} {statistics.median(latencies):>9.3f} {percentile(latencies, 99):>9.3f} "
+            f"{wall:>9.3f} {max(lags, default=0) * 1000:>19.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
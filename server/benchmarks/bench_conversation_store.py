@@ -0,0 +1,104 @@
+"""
+Memory footprint of conversation history backends at 100k conversations
+
+Each conversation gets several question/answer exchanges. Python heap usage is
+measured with tracemalloc for the old dict of ConversationBufferMemory objects
+(if langchain is installed), the in-memory ring-buffer store and the SQLite
+store, along with append/read latency.
+
+Usage (from the server/ directory):
+    python benchmarks/bench_conversation_store.py [--conversations 100000] [--exchanges 5]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+QUESTION = "How do I configure the VPN and SSH keys for the staging cluster? "
+ANSWER = "## Setup\n\n1. Install the VPN client\n2. Generate an SSH key with `ssh-keygen`\n" * 4
+
+
+def measure(name, append, read, conversations, exchanges):
+    """Fill a backend, then report heap growth and per-operation latency"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    for exchange in range(exchanges):
+        for i in range(conversations):
+            append(f"conv-{i}", f"{QUESTION}{exchange}", ANSWER)
+    append_seconds = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    start = time.perf_counter()
+    sample = min(conversations, 10000)
+    for i in range(sample):
+        read(f"conv-{i}")
+    read_seconds = time.perf_counter() - start
+    
+    operations = conversations * exchanges
+    print(
+        f"{name:<24} {current / (1024 * 1024):>10.1f} "
+        f"{append_seconds / operations * 1e6:>12.1f} {read_seconds / sample * 1e6:>12.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=100000)
+    parser.add_argument("--exchanges", type=int, default=5)
+    args = parser.parse_args()
+    
+    from llm_rag.conversation_store import InMemoryConversationStore, SQLiteConversationStore
+    
+    print(f"\n📊 {args.conversations} conversations x {args.exchanges} exchanges")
+    print("=" * 62)
+    print(f"{'backend':<24} {'heap (MB)':>10} {'append (us)':>12} {'read (us)':>12}")
+    
+    try:
+        from langchain.memory import ConversationBufferMemory
+        
+        memories = {}
+        
+        def legacy_append(conversation_id, question, answer):
+            if conversation_id not in memories:
+                memories[conversation_id] = ConversationBufferMemory(
+                    memory_key="chat_history", return_messages=True, output_key="answer"
+                )
+            memories[conversation_id].chat_memory.add_user_message(question)
+            memories[conversation_id].chat_memory.add_ai_message(answer)
+        
+        measure(
+            "ConversationBufferMemory",
+            legacy_append,
+            lambda conversation_id: memories[conversation_id].chat_memory.messages[-6:],
+            args.conversations,
+            args.exchanges,
+        )
+        memories.clear()
+    except ImportError:
+        print(f"{'ConversationBufferMemory':<24} {'(langchain not installed)':>36}")
+    
+    store = InMemoryConversationStore(max_messages=6, max_conversations=args.conversations)
+    measure("memory ring buffer", store.append_exchange, store.get_history, args.conversations, args.exchanges)
+    del store
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "conversations.db")
+        store = SQLiteConversationStore(db_path, max_messages=6)
+        measure("sqlite", store.append_exchange, store.get_history, args.conversations, args.exchanges)
+        size_mb = sum(
+            os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp)
+        ) / (1024 * 1024)
+        print(f"{'':<24} sqlite files on disk: {size_mb:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
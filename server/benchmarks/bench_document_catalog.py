@@ -0,0 +1,104 @@
+"""
+/api/documents/list at scale: scanning the collection vs the document catalog
+
+Fills a scratch Chroma collection with N chunks spread over documents of
+--chunks-per-doc chunks each, using random 8-dimensional vectors so no
+embedding model is needed, and records each document in a DocumentCatalog
+as ingestion does. Then times:
+    
+    scan     - the old list_documents: collection.get() of every chunk,
+               grouped by source in Python
+    catalog  - one page of the catalog list, a document lookup and the
+               per-category stats
+
+Usage (from the server/ directory):
+    python benchmarks/bench_document_catalog.py [--chunks 1000000] [--chunks-per-doc 100] [--skip-scan]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+CATEGORIES = ["supply_chain", "company_culture", "teams", "dev_setup", "general"]
+
+
+def scan_list(collection):
+    """What list_documents did before the catalog"""
+    results = collection.get()
+    documents_by_source = {}
+    for i, doc_id in enumerate(results.get('ids', [])):
+        metadata = results['metadatas'][i]
+        entry = documents_by_source.setdefault(
+            metadata['source'], {"category": metadata['category'], "chunk_ids": []}
+        )
+        entry["chunk_ids"].append(doc_id)
+    return len(documents_by_source)
+
+
+def timed(fn, repeat: int):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=1_000_000)
+    parser.add_argument("--chunks-per-doc", type=int, default=100)
+    parser.add_argument("--skip-scan", action="store_true", help="Don't time the full-collection scan")
+    args = parser.parse_args()
+    
+    import chromadb
+    from chromadb.config import Settings
+    from llm_rag.document_catalog import DocumentCatalog
+    
+    scratch = tempfile.mkdtemp(prefix="bench_catalog_")
+    client = chromadb.PersistentClient(path=os.path.join(scratch, "chroma"), settings=Settings(anonymized_telemetry=False))
+    collection = client.get_or_create_collection("bench_catalog")
+    catalog = DocumentCatalog(os.path.join(scratch, "document_catalog.db"))
+    
+    documents = args.chunks // args.chunks_per_doc
+    batch_size = min(5000, client.get_max_batch_size())
+    print(f"📥 Writing {documents * args.chunks_per_doc} chunks in {documents} documents...")
+    start = time.perf_counter()
+    pending = {"ids": [], "documents": [], "metadatas": [], "embeddings": []}
+    for d in range(documents):
+        source, category = f"doc_{d:07d}.md", CATEGORIES[d % len(CATEGORIES)]
+        for c in range(args.chunks_per_doc):
+            pending["ids"].append(f"{source}_{category}_{c}")
+            pending["documents"].append(f"Chunk {c} of {source}: carrier onboarding and webhook retries.")
+            pending["metadatas"].append({"source": source, "category": category, "chunk_index": c})
+            pending["embeddings"].append([random.random() for _ in range(8)])
+            if len(pending["ids"]) >= batch_size:
+                collection.add(**pending)
+                pending = {key: [] for key in pending}
+        catalog.upsert(source, category, args.chunks_per_doc, size_bytes=64 * args.chunks_per_doc)
+    if pending["ids"]:
+        collection.add(**pending)
+    print(f"   done in {time.perf_counter() - start:.0f}s")
+    
+    print(f"\n📊 {collection.count()} chunks, {documents} documents")
+    print("=" * 60)
+    print(f"{'operation':<34} {'median (ms)':>12}")
+    if not args.skip_scan:
+        print(f"{'scan: list all documents':<34} {timed(lambda: scan_list(collection), 1):>12.1f}")
+    middle = documents // 2
+    print(f"{'catalog: list page (100)':<34} {timed(lambda: catalog.list(offset=middle, limit=100), 20):>12.2f}")
+    print(f"{'catalog: list page, one category':<34} "
+          f"{timed(lambda: catalog.list(category='teams', offset=middle // 5, limit=100), 20):>12.2f}")
+    print(f"{'catalog: document details':<34} {timed(lambda: catalog.get(f'doc_{middle:07d}.md'), 20):>12.2f}")
+    print(f"{'catalog: stats':<34} {timed(catalog.stats, 20):>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
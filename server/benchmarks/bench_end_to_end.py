@@ -0,0 +1,372 @@
+"""
+Offline end-to-end benchmark: ingest a synthetic corpus, then answer queries
+
+Runs entirely on this machine with no network calls and no API keys (the
+embedding model must already be in the local Hugging Face cache, unless
+--hash-embeddings is given):
+    
+    1. startup  - DocumentProcessor + RAGPipeline construction on an empty store
+    2. ingest   - a synthetic Markdown corpus of about --chunks chunks, written
+                  to scratch files and fed through DocumentProcessor.ingest_saved_file
+                  (extraction pool, chunking, embedding, Chroma, keyword index, catalog)
+    3. restart  - a fresh interpreter opening the now-populated store, as a
+                  server restart would
+    4. retrieve - one query at a time through retrieval and prompt assembly,
+                  for latency percentiles and recall (did the chunk that
+                  answers the query reach the prompt?)
+    5. query    - RAGPipeline.query at --concurrency, with Gemini replaced by
+                  a deterministic fake that waits --llm-latency seconds and
+                  echoes the context it was given
+
+Resident memory is sampled after each phase. The results are written as JSON
+(commit, settings, numbers) so runs on two commits can be compared:
+    
+    python benchmarks/bench_end_to_end.py --chunks 10000
+    python benchmarks/bench_end_to_end.py --chunks 10000 --compare benchmarks/results/<earlier>.json
+
+Embedding 100k+ chunks with the real model takes hours on a CPU; pass
+--hash-embeddings to replace it with deterministic hash vectors when the
+point is to measure the storage side at scale; the model is then never
+loaded, in the benchmark or its restart probe. Dense retrieval is then
+meaningless, so recall only reflects what the keyword index finds.
+
+Usage (from the server/ directory):
+    python benchmarks/bench_end_to_end.py [--chunks 1000] [--queries 200] [--concurrency 8]
+        [--llm-latency 0.05] [--hash-embeddings] [--output FILE] [--compare FILE]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _corpus import paragraph, percentile, retrieval_notes, use_scratch_paths
+
+# Config is read at import time, so point every store at scratch files first;
+# the restart probe inherits the same directory
+scratch = use_scratch_paths("bench_e2e_", os.environ.get("BENCH_E2E_SCRATCH"))
+os.environ["BENCH_E2E_SCRATCH"] = scratch
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-fake-key")
+# Every query should take the full path rather than a cache
+os.environ.setdefault("QUERY_CACHE_SIZE", "0")
+os.environ.setdefault("ANSWER_CACHE_SIZE", "0")
+
+# paragraph() is ~260 characters and chunks advance ~800, so about 3 per chunk
+PARAGRAPHS_PER_CHUNK = 3
+
+
+class FakeLLM:
+    """Stands in for ChatGoogleGenerativeAI: fixed latency, answer derived only from the prompt"""
+    
+    def __init__(self, latency: float):
+        self.latency = latency
+    
+    async def ainvoke(self, prompt: str):
+        await asyncio.sleep(self.latency)
+        # Echo the retrieved context so recall can be checked from the answer
+        context = prompt.split("Context from knowledge base:", 1)[-1].split("User question:", 1)[0]
+        return SimpleNamespace(content=context.strip(), usage_metadata=None)
+
+
+class HashEmbeddings:
+    """Stands in for SentenceTransformer: a deterministic unit vector per text"""
+    
+    # Model name under which vectors are cached, so they never mix with a real model's
+    model_name = "hash-embeddings"
+    
+    def __init__(self, dimensions: int = 384):
+        self.dimensions = dimensions
+    
+    def encode(self, texts, convert_to_numpy: bool = True, **kwargs):
+        import numpy
+        
+        vectors = numpy.empty((len(texts), self.dimensions), dtype=numpy.float32)
+        for i, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+            vector = numpy.random.default_rng(seed).standard_normal(self.dimensions)
+            vectors[i] = vector / numpy.linalg.norm(vector)
+        return vectors
+
+
+def use_hash_embeddings():
+    """Make EmbeddingService build HashEmbeddings instead of loading a SentenceTransformer"""
+    from llm_rag import embeddings
+    from llm_rag.config import config
+    
+    config.use_local_embeddings = True
+    config.local_embedding_model = HashEmbeddings.model_name
+    embeddings.SentenceTransformer = lambda model_name, **kwargs: HashEmbeddings()
+
+
+def latency_summary(seconds) -> dict:
+    return {
+        "count": len(seconds),
+        "p50_ms": round(percentile(seconds, 50) * 1000, 2),
+        "p95_ms": round(percentile(seconds, 95) * 1000, 2),
+        "p99_ms": round(percentile(seconds, 99) * 1000, 2),
+        "max_ms": round(max(seconds) * 1000, 2)
+    }
+
+
+def memory() -> dict:
+    """Current and peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux and bytes on macOS
+    peak_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    try:
+        with open("/proc/self/statm") as f:
+            current_mb = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        current_mb = peak_mb
+    return {"rss_mb": round(current_mb, 1), "peak_rss_mb": round(peak_mb, 1)}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=SERVER_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def write_corpus(directory: str, chunks: int, chunks_per_doc: int, notes) -> list:
+    """Markdown files totalling about `chunks` chunks, plus one file per retrieval note"""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for n, (text, _, _) in enumerate(notes):
+        path = os.path.join(directory, f"note_{n:05d}.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        paths.append(path)
+    
+    filler = max(0, chunks - len(notes))
+    documents = (filler + chunks_per_doc - 1) // chunks_per_doc
+    for d in range(documents):
+        count = min(chunks_per_doc, filler - d * chunks_per_doc) * PARAGRAPHS_PER_CHUNK
+        path = os.path.join(directory, f"doc_{d:06d}.md")
+        with open(path, "w", encoding="utf-8") as f:
+            for p in range(count):
+                f.write(f"{paragraph(d * 7 + p)}\n\n")
+        paths.append(path)
+    return paths
+
+
+async def ingest(processor, paths, concurrency: int) -> dict:
+    from llm_rag.uploads import SavedUpload, file_sha256
+    
+    limit = asyncio.Semaphore(concurrency)
+    chunks = []
+    failures = []
+    
+    async def one(path):
+        async with limit:
+            saved = SavedUpload(path=path, size=os.path.getsize(path), sha256=file_sha256(path))
+            try:
+                result = await processor.ingest_saved_file(saved, os.path.basename(path), "text/markdown", "bench")
+                chunks.append(result["chunks_created"] + result["chunks_unchanged"])
+            except Exception as e:
+                failures.append(f"{os.path.basename(path)}: {e}")
+    
+    # Measured up front: a failed ingest removes its file
+    total_bytes = sum(os.path.getsize(path) for path in paths)
+    start = time.perf_counter()
+    await asyncio.gather(*(one(path) for path in paths))
+    seconds = time.perf_counter() - start
+    return {
+        "files": len(paths),
+        "chunks": sum(chunks),
+        "failures": failures[:10],
+        "seconds": round(seconds, 2),
+        "chunks_per_second": round(sum(chunks) / seconds, 1) if seconds else None,
+        "mb_per_second": round(total_bytes / (1024 * 1024) / seconds, 2) if seconds else None
+    }
+
+
+async def retrieve(pipeline, notes) -> dict:
+    seconds, hits = [], 0
+    for n, (_, needle, query) in enumerate(notes):
+        start = time.perf_counter()
+        prepared = await pipeline._prepare_query(query, conversation_id=f"retrieve-{n}")
+        seconds.append(time.perf_counter() - start)
+        if prepared is not None and needle in prepared["prompt"].split("User question:")[0]:
+            hits += 1
+    return {**latency_summary(seconds), "recall": round(hits / len(notes), 3)}
+
+
+async def query(pipeline, notes, concurrency: int) -> dict:
+    from llm_rag.config import config
+    
+    # asyncio primitives bind to the loop they are first used on
+    pipeline.llm_semaphore = asyncio.Semaphore(config.max_concurrent_llm_calls)
+    limit = asyncio.Semaphore(concurrency)
+    seconds, hits = [], []
+    
+    async def one(n, needle, question):
+        async with limit:
+            start = time.perf_counter()
+            answer, _ = await pipeline.query(question, conversation_id=f"query-{n}")
+            seconds.append(time.perf_counter() - start)
+            hits.append(needle in answer)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(one(n, needle, question) for n, (_, needle, question) in enumerate(notes)))
+    wall = time.perf_counter() - start
+    return {
+        **latency_summary(seconds),
+        "concurrency": concurrency,
+        "queries_per_second": round(len(notes) / wall, 1),
+        "recall": round(sum(hits) / len(hits), 3)
+    }
+
+
+def build_components(hash_embeddings: bool):
+    """DocumentProcessor and RAGPipeline as startup_event builds them, plus the time it took"""
+    if hash_embeddings:
+        # Before anything builds the EmbeddingService, so the real model is never loaded
+        use_hash_embeddings()
+    from llm_rag.document_processor import DocumentProcessor
+    from llm_rag.rag_pipeline import RAGPipeline
+    
+    start = time.perf_counter()
+    processor = DocumentProcessor()
+    pipeline = RAGPipeline()
+    seconds = time.perf_counter() - start
+    return processor, pipeline, seconds
+
+
+def restart_probe(hash_embeddings: bool):
+    """Child process: time opening the populated store and print JSON"""
+    _, _, seconds = build_components(hash_embeddings)
+    print(json.dumps({"seconds": round(seconds, 2), **memory()}))
+
+
+def compare(current: dict, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    rows = [
+        ("startup s", ("startup", "seconds")),
+        ("restart s", ("restart", "seconds")),
+        ("ingest chunks/s", ("ingest", "chunks_per_second")),
+        ("retrieve p50 ms", ("retrieve", "p50_ms")),
+        ("retrieve p95 ms", ("retrieve", "p95_ms")),
+        ("retrieve recall", ("retrieve", "recall")),
+        ("query p95 ms", ("query", "p95_ms")),
+        ("query qps", ("query", "queries_per_second")),
+        ("peak RSS MB", ("memory", "after_query", "peak_rss_mb")),
+    ]
+    print(f"\n📊 {baseline['commit']} -> {current['commit']}")
+    print("=" * 60)
+    print(f"{'metric':<18} {'baseline':>12} {'current':>12} {'change':>12}")
+    for label, path in rows:
+        before, after = baseline, current
+        for key in path:
+            before = (before or {}).get(key)
+            after = (after or {}).get(key)
+        if not isinstance(before, (int, float)) or not isinstance(after, (int, float)):
+            continue
+        change = f"{(after - before) / before:+.1%}" if before else "n/a"
+        print(f"{label:<18} {before:>12} {after:>12} {change:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=1000, help="Approximate corpus size in chunks")
+    parser.add_argument("--chunks-per-doc", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent queries in the query phase")
+    parser.add_argument("--ingest-concurrency", type=int, default=4, help="Files ingested at once")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Fake Gemini latency in seconds")
+    parser.add_argument("--hash-embeddings", action="store_true", help="Replace the embedding model with hash vectors")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/e2e-<commit>-<chunks>.json)")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument("--restart-probe", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.restart_probe:
+        restart_probe(args.hash_embeddings)
+        return
+    
+    from llm_rag.config import config
+    
+    notes = retrieval_notes(args.queries)
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": {
+            **{key: value for key, value in vars(args).items() if key not in ("output", "compare", "restart_probe")},
+            "embedding_model": "hash" if args.hash_embeddings else config.local_embedding_model,
+            "retrieval_mode": config.retrieval_mode,
+            "rerank_enabled": config.rerank_enabled,
+            "chunk_size": config.chunk_size,
+            "top_k_retrieval": config.top_k_retrieval
+        },
+        "memory": {"baseline": memory()}
+    }
+    
+    print("🚀 Starting components...")
+    processor, pipeline, seconds = build_components(args.hash_embeddings)
+    pipeline.llm = FakeLLM(args.llm_latency)
+    results["startup"] = {"seconds": round(seconds, 2)}
+    results["memory"]["after_startup"] = memory()
+    
+    print(f"📝 Writing a corpus of ~{args.chunks} chunks...")
+    paths = write_corpus(os.path.join(scratch, "corpus"), args.chunks, args.chunks_per_doc, notes)
+    print(f"📥 Ingesting {len(paths)} files...")
+    results["ingest"] = asyncio.run(ingest(processor, paths, args.ingest_concurrency))
+    results["memory"]["after_ingest"] = memory()
+    processor.shutdown()
+    
+    print("🔁 Restarting against the populated store...")
+    probe = [sys.executable, os.path.abspath(__file__), "--restart-probe"]
+    if args.hash_embeddings:
+        probe.append("--hash-embeddings")
+    output = subprocess.run(
+        probe,
+        env=dict(os.environ), cwd=SERVER_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    results["restart"] = json.loads(output.strip().splitlines()[-1])
+    
+    print(f"🔎 Retrieving {len(notes)} queries one at a time...")
+    results["retrieve"] = asyncio.run(retrieve(pipeline, notes))
+    print(f"💬 Answering {len(notes)} queries, {args.concurrency} at a time...")
+    results["query"] = asyncio.run(query(pipeline, notes, args.concurrency))
+    results["memory"]["after_query"] = memory()
+    
+    ingest_results, retrieve_results, query_results = results["ingest"], results["retrieve"], results["query"]
+    print(f"\n📊 {ingest_results['chunks']} chunks in {ingest_results['files']} files, commit {results['commit']}")
+    print("=" * 72)
+    print(f"startup         {results['startup']['seconds']:>8.2f} s   (populated store: {results['restart']['seconds']:.2f} s)")
+    print(f"ingest          {ingest_results['chunks_per_second']:>8.1f} chunks/s   {ingest_results['mb_per_second']:.2f} MB/s"
+          f"   {len(ingest_results['failures'])} failures")
+    print(f"retrieve        p50 {retrieve_results['p50_ms']:.1f} ms   p95 {retrieve_results['p95_ms']:.1f} ms   "
+          f"p99 {retrieve_results['p99_ms']:.1f} ms   recall {retrieve_results['recall']:.1%}")
+    print(f"query           p50 {query_results['p50_ms']:.1f} ms   p95 {query_results['p95_ms']:.1f} ms   "
+          f"{query_results['queries_per_second']:.1f} q/s at {args.concurrency}   recall {query_results['recall']:.1%}")
+    print(f"memory          {results['memory']['after_query']['rss_mb']:.0f} MB RSS, "
+          f"{results['memory']['after_query']['peak_rss_mb']:.0f} MB peak")
+    
+    output_path = args.output or os.path.join(
+        SERVER_DIR, "benchmarks", "results", f"e2e-{results['commit']}-{args.chunks}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results written to {output_path}")
+    
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Recall@k and latency: dense-only vs hybrid (dense + BM25, RRF) retrieval
+
+Ingests a synthetic knowledge base into a scratch collection: many look-alike
+setup and troubleshooting notes, each carrying one exact token (an
+environment variable, a CLI flag or an error code), plus a few distinctive
+facts asked about in other words. Every query has exactly one chunk that
+answers it. Both modes run the same queries through
+RAGPipeline._retrieve_relevant_docs (no LLM call) and report recall@1,
+recall@k and latency.
+
+Usage (from the server/ directory):
+    python benchmarks/bench_hybrid_retrieval.py [--notes 300] [--top-k 5]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _corpus import percentile, retrieval_notes, use_scratch_paths
+
+# Config is read at import time, so point every store at scratch files first
+scratch = use_scratch_paths("bench_hybrid_")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-fake-key")
+# Every query should be encoded, in both modes
+os.environ.setdefault("QUERY_CACHE_SIZE", "0")
+
+
+async def run(pipeline, notes, top_k: int):
+    hits_at_1 = hits_at_k = 0
+    latencies = []
+    for _, needle, query in notes:
+        start = time.perf_counter()
+        retrieved = await pipeline._retrieve_relevant_docs(query, top_k=top_k)
+        latencies.append(time.perf_counter() - start)
+        matches = [needle in document for document in retrieved["documents"]]
+        hits_at_1 += bool(matches[:1] and matches[0])
+        hits_at_k += any(matches)
+    return hits_at_1 / len(notes), hits_at_k / len(notes), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--notes", type=int, default=300, help="Notes with an exact token to find")
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+    
+    from llm_rag.document_processor import DocumentProcessor
+    from llm_rag.rag_pipeline import RAGPipeline
+    
+    notes = retrieval_notes(args.notes)
+    processor = DocumentProcessor()
+    print(f"📥 Ingesting {len(notes)} notes...")
+    for n, (text, _, _) in enumerate(notes):
+        processor.ingest_text_directly(text, source_name=f"note_{n}.md", category="bench")
+    processor.shutdown()
+    
+    pipeline = RAGPipeline()
+    lexical_index = pipeline.embedding_service.lexical_index
+    if lexical_index is None:
+        print("❌ Keyword index is disabled (RETRIEVAL_MODE=dense or no FTS5); nothing to compare")
+        return
+    
+    print(f"\n📊 {len(notes)} queries over {pipeline.collection.count()} chunks, top_k={args.top_k}")
+    print("=" * 72)
+    print(f"{'mode':<8} {'recall@1':>9} {f'recall@{args.top_k}':>10} {'p50 (ms)':>10} {'p95 (ms)':>10}")
+    for mode in ("dense", "hybrid"):
+        pipeline.embedding_service.lexical_index = lexical_index if mode == "hybrid" else None
+        recall_1, recall_k, latencies = asyncio.run(run(pipeline, notes, args.top_k))
+        print(
+            f"{mode:<8} {recall_1:>9.1%} {recall_k:>10.1%} "
+            f"{statistics.median(latencies) * 1000:>10.1f} {percentile(latencies, 95) * 1000:>10.1f}"
+        )
+    pipeline.embedding_service.lexical_index = lexical_index
+
+
+if __name__ == "__main__":
+    main()
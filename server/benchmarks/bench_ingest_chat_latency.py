@@ -0,0 +1,123 @@
+"""
+Chat retrieval latency while a large PDF is being extracted
+
+Extracts a synthetic 300-page PDF twice while a few simulated chat users keep
+running retrieval (query embedding + Chroma search, no LLM call):
+
+    inline  - the old behaviour: PyPDF2 parses on the event loop
+    pool    - DocumentProcessor.extract_text, which runs in the extraction
+              process pool (page ranges in parallel for large PDFs)
+
+Inline extraction freezes every request for the whole parse, which shows up
+as a huge max/p99 retrieval latency.
+
+Usage (from the server/ directory):
+    python benchmarks/bench_ingest_chat_latency.py [--pages 300] [--users 4]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _corpus import paragraph, use_scratch_paths, write_pdf
+
+# Config is read at import time, so point every store at scratch files first
+use_scratch_paths("bench_ingest_chat_")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-fake-key")
+
+QUESTIONS = [
+    "What are the webhook retry rules?",
+    "How does API authentication work?",
+    "How long is tracking data retained?",
+    "How do I onboard a new carrier?",
+]
+
+
+async def chat_user(pipeline, user: int, stop: asyncio.Event, latencies: list):
+    i = user
+    while not stop.is_set():
+        # A distinct query each time so the embedding cache doesn't hide the work
+        query = f"{QUESTIONS[i % len(QUESTIONS)]} (user {user}, turn {i})"
+        start = time.perf_counter()
+        await pipeline._retrieve_relevant_docs(query)
+        latencies.append(time.perf_counter() - start)
+        i += 1
+        await asyncio.sleep(0.01)
+
+
+async def run(mode: str, pipeline, processor, pdf_path: str, users: int):
+    from llm_rag import extraction
+    
+    stop = asyncio.Event()
+    latencies = []
+    tasks = [asyncio.create_task(chat_user(pipeline, u, stop, latencies)) for u in range(users)]
+    await asyncio.sleep(0.5)
+    
+    start = time.perf_counter()
+    if mode == "inline":
+        text = extraction.extract_text(pdf_path, "application/pdf")
+    else:
+        text = await processor.extract_text(pdf_path, "application/pdf")
+    extract_seconds = time.perf_counter() - start
+    
+    await asyncio.sleep(0.5)
+    stop.set()
+    await asyncio.gather(*tasks)
+    
+    latencies.sort()
+    return {
+        "extract": extract_seconds,
+        "chars": len(text),
+        "requests": len(latencies),
+        "p50": statistics.median(latencies) * 1000,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "max": latencies[-1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--users", type=int, default=4, help="Concurrent simulated chat users")
+    args = parser.parse_args()
+    
+    from llm_rag.config import config
+    from llm_rag.document_processor import DocumentProcessor
+    from llm_rag.rag_pipeline import RAGPipeline
+    
+    pdf_path = os.path.join(tempfile.mkdtemp(prefix="bench_pdf_"), "large.pdf")
+    write_pdf(pdf_path, [[paragraph(page + line) for line in range(40)] for page in range(args.pages)])
+    
+    pipeline = RAGPipeline()
+    processor = DocumentProcessor()
+    processor.ingest_text_directly(" ".join(paragraph(i) for i in range(200)), "bench_seed.md")
+    
+    async def warm_up():
+        # Start the pool's worker processes and load the model before timing
+        await processor.extract_text(pdf_path, "application/pdf")
+        await pipeline._retrieve_relevant_docs("warm up")
+    asyncio.run(warm_up())
+    
+    print(f"\n📊 Chat retrieval during extraction of a {args.pages}-page PDF, {args.users} users")
+    print(f"extract workers={config.extract_workers}, {config.pdf_pages_per_task} PDF pages per task")
+    print("=" * 72)
+    print(f"{'mode':<8} {'extract (s)':>12} {'requests':>9} {'p50 (ms)':>10} {'p99 (ms)':>10} {'max (ms)':>10}")
+    for mode in ("inline", "pool"):
+        r = asyncio.run(run(mode, pipeline, processor, pdf_path, args.users))
+        print(
+            f"{mode:<8} {r['extract']:>12.2f} {r['requests']:>9} {r['p50']:>10.1f} "
+            f"{r['p99']:>10.1f} {r['max']:>10.1f}"
+        )
+    processor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Peak memory of PDF extraction + chunking: whole document vs page stream
+
+For synthetic PDFs of increasing length, compares
+    whole   - extract the full text, then split_text() on all of it (old path)
+    stream  - DocumentProcessor.iter_chunks(), which reads page ranges from
+              the extraction pool and chunks incrementally
+Chunks are discarded as they arrive, as the ingest path does after writing
+each batch. Peak Python heap is measured with tracemalloc in this process;
+parsing happens in pool workers in both modes.
+
+Usage (from the server/ directory):
+    python benchmarks/bench_pdf_streaming.py [--pages 100 400 1600]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _corpus import paragraph, use_scratch_paths, write_pdf
+
+# Config is read at import time, so point every store at scratch files first
+use_scratch_paths("bench_pdf_")
+
+
+async def whole(processor, path: str) -> int:
+    text = await processor.extract_text(path, "application/pdf")
+    return len(processor.text_splitter.split_text(text))
+
+
+async def stream(processor, path: str) -> int:
+    from llm_rag.config import config
+    
+    chunks = 0
+    async for records in processor.iter_chunks(path, "application/pdf", config.ingest_embed_batch_size):
+        chunks += len(records)
+    return chunks
+
+
+def measure(fn, processor, path: str):
+    tracemalloc.start()
+    start = time.perf_counter()
+    chunks = asyncio.run(fn(processor, path))
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return chunks, seconds, peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 400, 1600])
+    args = parser.parse_args()
+    
+    from llm_rag.document_processor import DocumentProcessor
+    
+    processor = DocumentProcessor()
+    directory = tempfile.mkdtemp(prefix="bench_pdf_")
+    
+    # Start the pool's worker processes before timing anything
+    warm_up = os.path.join(directory, "warm_up.pdf")
+    write_pdf(warm_up, [[paragraph(0)]])
+    asyncio.run(stream(processor, warm_up))
+    
+    print("\n📊 PDF extraction + chunking, peak heap in the server process")
+    print("=" * 72)
+    print(f"{'pages':>6} {'mode':<7} {'chunks':>8} {'seconds':>9} {'peak MB':>9}")
+    for pages in args.pages:
+        path = os.path.join(directory, f"doc_{pages}.pdf")
+        write_pdf(path, [[paragraph(page + line) for line in range(40)] for page in range(pages)])
+        for name, fn in (("whole", whole), ("stream", stream)):
+            chunks, seconds, peak_mb = measure(fn, processor, path)
+            print(f"{pages:>6} {name:<7} {chunks:>8} {seconds:>9.2f} {peak_mb:>9.1f}")
+    processor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
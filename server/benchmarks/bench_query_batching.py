@@ -0,0 +1,87 @@
+"""
+Throughput of per-request query encoding vs the QueryBatcher
+
+Runs the same set of concurrent query embeddings twice on a shared thread
+pool: once encoding each query on its own (the old _retrieve_relevant_docs
+behaviour) and once through QueryBatcher with several window/batch settings.
+
+Usage (from the server/ directory):
+    python benchmarks/bench_query_batching.py [--queries 2000] [--concurrency 64]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _corpus import use_scratch_paths
+
+# Config is read at import time, so point every store at scratch files first
+use_scratch_paths("bench_query_batching_")
+
+QUESTIONS = [
+    "How do I set up my dev environment?",
+    "Where do I find the VPN configuration?",
+    "What is a shipment visibility event?",
+    "Who owns the ocean tracking service?",
+    "How do I request access to the staging cluster?",
+    "What does CHROMA_DB_PATH control?",
+]
+
+
+async def drive(embed, queries, concurrency):
+    """Embed all queries with at most `concurrency` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def one(query):
+        async with semaphore:
+            await embed(query)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(one(q) for q in queries))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+    
+    from llm_rag.embeddings import QueryBatcher, get_embedding_service
+    
+    service = get_embedding_service()
+    executor = ThreadPoolExecutor(max_workers=args.threads)
+    queries = [f"{QUESTIONS[i % len(QUESTIONS)]} #{i}" for i in range(args.queries)]
+    service.embed_queries(queries[:8])  # warm up
+    
+    async def per_request(query):
+        loop = asyncio.get_running_loop()
+        return (await loop.run_in_executor(executor, service.embed_queries, [query]))[0]
+    
+    print(f"\n📊 {args.queries} queries, {args.concurrency} in flight, {args.threads} threads")
+    print("=" * 64)
+    print(f"{'mode':<28} {'queries/s':>10} {'avg batch':>10} {'speedup':>10}")
+    
+    baseline = args.queries / asyncio.run(drive(per_request, queries, args.concurrency))
+    print(f"{'per-request':<28} {baseline:>10.1f} {1:>10.1f} {1:>10.2f}")
+    
+    for window_ms, max_batch in ((2, 16), (5, 32), (10, 64)):
+        batcher = QueryBatcher(service.embed_queries, executor, window_ms=window_ms, max_batch_size=max_batch)
+        throughput = args.queries / asyncio.run(drive(batcher.embed, queries, args.concurrency))
+        avg_batch = batcher.queries_embedded / max(1, batcher.batches_run)
+        label = f"batched {window_ms}ms / {max_batch}"
+        print(f"{label:<28} {throughput:>10.1f} {avg_batch:>10.1f} {throughput / baseline:>10.2f}")
+    
+    executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
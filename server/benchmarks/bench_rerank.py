@@ -0,0 +1,102 @@
+"""
+Cross-encoder re-ranking: prompt size, latency and recall vs plain top-k
+
+Ingests the synthetic notes used by bench_hybrid_retrieval into a scratch
+collection, then builds the Gemini prompt for every query (no LLM call)
+three ways:
+    
+    top-k     - the first top_k_retrieval chunks in retrieval order
+    rerank    - rerank_candidates chunks re-ranked, best rerank_top_n kept
+    tight     - the same with a budget too small to finish, so every query
+                falls back to the retrieval order
+
+Recall is whether the one chunk that answers the query made it into the
+prompt.
+
+Usage (from the server/ directory):
+    python benchmarks/bench_rerank.py [--notes 300] [--tight-budget-ms 1]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _corpus import percentile, retrieval_notes, use_scratch_paths
+
+# Config is read at import time, so point every store at scratch files first
+scratch = use_scratch_paths("bench_rerank_")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-fake-key")
+# Every query should be encoded and get a fresh prompt
+os.environ.setdefault("QUERY_CACHE_SIZE", "0")
+os.environ.setdefault("ANSWER_CACHE_SIZE", "0")
+
+
+async def run(pipeline, notes):
+    hits = 0
+    prompt_chars, latencies = [], []
+    for n, (_, needle, query) in enumerate(notes):
+        start = time.perf_counter()
+        prepared = await pipeline._prepare_query(query, conversation_id=f"bench-{n}")
+        latencies.append(time.perf_counter() - start)
+        if prepared is None:
+            continue
+        prompt_chars.append(len(prepared["prompt"]))
+        hits += needle in prepared["prompt"].split("User question:")[0]
+    return hits / len(notes), prompt_chars, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--notes", type=int, default=300)
+    parser.add_argument("--tight-budget-ms", type=float, default=1.0)
+    args = parser.parse_args()
+    
+    from llm_rag.config import config
+    from llm_rag.document_processor import DocumentProcessor
+    from llm_rag.rag_pipeline import RAGPipeline
+    from llm_rag.reranker import CrossEncoderReranker
+    
+    notes = retrieval_notes(args.notes)
+    processor = DocumentProcessor()
+    print(f"📥 Ingesting {len(notes)} notes...")
+    for n, (text, _, _) in enumerate(notes):
+        processor.ingest_text_directly(text, source_name=f"note_{n}.md", category="bench")
+    processor.shutdown()
+    
+    pipeline = RAGPipeline()
+    reranker = CrossEncoderReranker(
+        config.rerank_model,
+        batch_size=config.rerank_batch_size,
+        budget_ms=config.rerank_budget_ms,
+        workers=config.rerank_workers
+    )
+    mode = "hybrid" if pipeline.embedding_service.lexical_index is not None else "dense"
+    
+    print(
+        f"\n📊 {len(notes)} queries, {mode} retrieval, top_k={config.top_k_retrieval}, "
+        f"re-rank {config.rerank_candidates} -> {config.rerank_top_n} in {config.rerank_budget_ms:.0f} ms"
+    )
+    print("=" * 72)
+    print(f"{'mode':<8} {'recall':>7} {'prompt chars':>13} {'p50 (ms)':>10} {'p95 (ms)':>10} {'fallbacks':>10}")
+    for name, budget_ms in (("top-k", None), ("rerank", config.rerank_budget_ms), ("tight", args.tight_budget_ms)):
+        pipeline.reranker = None if budget_ms is None else reranker
+        reranker.budget = (budget_ms or 0) / 1000
+        fallbacks_before = reranker.fallbacks
+        recall, prompt_chars, latencies = asyncio.run(run(pipeline, notes))
+        print(
+            f"{name:<8} {recall:>7.1%} {statistics.mean(prompt_chars):>13.0f} "
+            f"{statistics.median(latencies) * 1000:>10.1f} {percentile(latencies, 95) * 1000:>10.1f} "
+            f"{reranker.fallbacks - fallbacks_before:>10}"
+        )
+    reranker.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark startup time and resident memory of the embedding stack
+
+Compares the shared EmbeddingService used by RAGPipeline and DocumentProcessor
+against the previous behaviour of each class loading its own model and Chroma
+client. Every mode runs in a fresh interpreter so peak RSS is not polluted by
+the other run.
+
+Usage (from the server/ directory):
+    python benchmarks/bench_startup.py
+"""
+
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _corpus import use_scratch_paths
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux and bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _run_mode(mode: str):
+    """Build the embedding stack in the requested mode and print a JSON result"""
+    sys.path.insert(0, SERVER_DIR)
+    from llm_rag import embeddings
+    
+    baseline_mb = _peak_rss_mb()
+    start = time.perf_counter()
+    if mode == "shared":
+        # What startup_event does now: both components share one service
+        first = embeddings.get_embedding_service()
+        second = embeddings.get_embedding_service()
+    else:
+        # Previous behaviour: each component loads its own copy
+        first = embeddings.EmbeddingService()
+        second = embeddings.EmbeddingService()
+    elapsed = time.perf_counter() - start
+    
+    first.embed_queries(["warm up"])
+    second.embed_queries(["warm up"])
+    
+    print(json.dumps({
+        "mode": mode,
+        "startup_seconds": round(elapsed, 3),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "rss_added_mb": round(_peak_rss_mb() - baseline_mb, 1),
+        "model_instances": 1 if first is second else 2,
+    }))
+
+
+def main():
+    results = []
+    with tempfile.TemporaryDirectory() as scratch:
+        # Both modes open the same stores, as two components of one server would
+        use_scratch_paths("bench_startup_", scratch)
+        env = dict(os.environ)
+        for mode in ("separate", "shared"):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--mode", mode],
+                env=env,
+                cwd=SERVER_DIR,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+    
+    print("\n📊 Embedding stack startup")
+    print("=" * 60)
+    print(f"{'mode':<10} {'startup (s)':>12} {'peak RSS (MB)':>15} {'instances':>10}")
+    for r in results:
+        print(f"{r['mode']:<10} {r['startup_seconds']:>12} {r['peak_rss_mb']:>15} {r['model_instances']:>10}")
+    
+    separate, shared = results
+    print("=" * 60)
+    print(f"Startup saved: {separate['startup_seconds'] - shared['startup_seconds']:.3f}s")
+    print(f"RSS saved:     {separate['peak_rss_mb'] - shared['peak_rss_mb']:.1f} MB")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--mode":
+        _run_mode(sys.argv[2])
+    else:
+        main()
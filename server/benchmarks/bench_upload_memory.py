@@ -0,0 +1,93 @@
+"""
+Memory used by concurrent uploads: read-all vs streamed to disk
+
+Saves N concurrent uploads of the same size the old way (await file.read()
+then write) and through llm_rag.uploads.save_upload, which copies fixed-size
+blocks and hashes them on the fly. Uploads are UploadFile objects backed by
+files on disk, as Starlette hands them over once they exceed its spool size.
+Peak Python heap is measured with tracemalloc.
+
+Usage (from the server/ directory):
+    python benchmarks/bench_upload_memory.py [--uploads 8] [--size-mb 50]
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+
+async def save_read_all(upload, path: str):
+    """What _save_file did before"""
+    import aiofiles
+    
+    async with aiofiles.open(path, 'wb') as f:
+        content = await upload.read()
+        await f.write(content)
+
+
+async def save_streamed(upload, path: str):
+    from llm_rag.uploads import save_upload
+    
+    # The limit is off so both modes do the same work
+    await save_upload(upload, path, max_bytes=0)
+
+
+async def run(save, sources, out_dir: str):
+    from fastapi import UploadFile
+    
+    uploads = [UploadFile(file=open(path, "rb"), filename=os.path.basename(path)) for path in sources]
+    try:
+        await asyncio.gather(*(
+            save(upload, os.path.join(out_dir, upload.filename)) for upload in uploads
+        ))
+    finally:
+        for upload in uploads:
+            upload.file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=8, help="Concurrent uploads")
+    parser.add_argument("--size-mb", type=int, default=50)
+    args = parser.parse_args()
+    
+    from llm_rag.config import config
+    
+    work_dir = tempfile.mkdtemp(prefix="bench_uploads_")
+    block = os.urandom(1024 * 1024)
+    sources = []
+    for i in range(args.uploads):
+        path = os.path.join(work_dir, f"upload_{i}.bin")
+        with open(path, "wb") as f:
+            for _ in range(args.size_mb):
+                f.write(block)
+        sources.append(path)
+    
+    print(f"\n📊 {args.uploads} concurrent uploads of {args.size_mb} MB "
+          f"(block size {config.upload_block_size_kb} KB)")
+    print("=" * 60)
+    print(f"{'mode':<10} {'seconds':>9} {'peak MB':>10}")
+    try:
+        for name, save in (("read-all", save_read_all), ("streamed", save_streamed)):
+            out_dir = tempfile.mkdtemp(dir=work_dir)
+            tracemalloc.start()
+            start = time.perf_counter()
+            asyncio.run(run(save, sources, out_dir))
+            seconds = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{name:<10} {seconds:>9.2f} {peak / (1024 * 1024):>10.1f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+Load generator for the chat endpoints of a running server
+
+Drives /api/chat, /api/chat/stream, /api/analyst/chat or
+/api/analyst/chat/stream for --duration seconds, either closed-loop
+(--concurrency clients, each sending its next request when the last one
+returns) or open-loop (--rate new requests per second, however slow the
+server gets). Reports latency percentiles, time to first token for the
+streaming endpoints, throughput and errors by status.
+
+Run the server against benchmarks/mock_llm_server.py to measure the app's
+own concurrency behaviour without spending quota:
+    
+    python benchmarks/mock_llm_server.py --latency 1.0 &
+    GEMINI_BASE_URL=http://127.0.0.1:8100 uvicorn main:app --port 8000 &
+    python benchmarks/load_test.py --endpoint chat --concurrency 64 --duration 60 \\
+        --mock-url http://127.0.0.1:8100
+
+The analyst endpoints first upload a generated document. With --metrics the
+server's /metrics is read before and after the run, and the mean time per
+stage (llm_wait shows queueing behind MAX_CONCURRENT_LLM_CALLS) is printed;
+with --mock-url the stand-in's peak number of concurrent LLM calls is too.
+
+Usage (from the server/ directory):
+    python benchmarks/load_test.py [--url http://127.0.0.1:8000] [--endpoint chat]
+        [--concurrency 32 | --rate 20] [--duration 60] [--metrics] [--mock-url URL] [--output FILE]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _corpus import paragraph, percentile, retrieval_notes
+
+ENDPOINTS = {
+    "chat": ("/api/chat", False),
+    "chat-stream": ("/api/chat/stream", True),
+    "analyst": ("/api/analyst/chat", False),
+    "analyst-stream": ("/api/analyst/chat/stream", True),
+}
+
+_STAGE_LINE = re.compile(
+    r'^rag_stage_duration_seconds_(sum|count)\{operation="([^"]+)",stage="([^"]+)"\} (\S+)$'
+)
+
+
+def latency_summary(seconds: List[float]) -> Dict:
+    if not seconds:
+        return {"count": 0}
+    return {
+        "count": len(seconds),
+        "p50_ms": round(percentile(seconds, 50) * 1000, 1),
+        "p95_ms": round(percentile(seconds, 95) * 1000, 1),
+        "p99_ms": round(percentile(seconds, 99) * 1000, 1),
+        "max_ms": round(max(seconds) * 1000, 1)
+    }
+
+
+class Results:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.first_tokens: List[float] = []
+        self.statuses: Dict[str, int] = {}
+    
+    def record(self, status: str, seconds: Optional[float] = None, first_token: Optional[float] = None):
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if seconds is not None:
+            self.latencies.append(seconds)
+        if first_token is not None:
+            self.first_tokens.append(first_token)
+
+
+async def upload_analyst_document(client: httpx.AsyncClient) -> str:
+    text = "\n\n".join(paragraph(seed) for seed in range(40))
+    response = await client.post(
+        "/api/analyst/upload",
+        files={"file": ("load_test.md", text.encode("utf-8"), "text/markdown")}
+    )
+    response.raise_for_status()
+    return response.json()["document_id"]
+
+
+async def send(client: httpx.AsyncClient, path: str, streaming: bool, body: Dict, results: Results):
+    start = time.perf_counter()
+    try:
+        if not streaming:
+            response = await client.post(path, json=body)
+            results.record(str(response.status_code), time.perf_counter() - start if response.is_success else None)
+            return
+        
+        first_token = None
+        status = None
+        async with client.stream("POST", path, json=body) as response:
+            if not response.is_success:
+                await response.aread()
+                results.record(str(response.status_code))
+                return
+            async for line in response.aiter_lines():
+                if line.startswith("event: token") and first_token is None:
+                    first_token = time.perf_counter() - start
+                elif line.startswith("event: error"):
+                    status = "stream_error"
+                elif line.startswith("event: done"):
+                    status = "200"
+        if status == "200":
+            results.record(status, time.perf_counter() - start, first_token)
+        else:
+            results.record(status or "stream_incomplete")
+    except httpx.HTTPError as e:
+        results.record(type(e).__name__)
+
+
+async def read_stage_times(client: httpx.AsyncClient) -> Dict:
+    """(operation, stage) -> [sum, count] from /metrics"""
+    response = await client.get("/metrics")
+    response.raise_for_status()
+    stages: Dict = {}
+    for line in response.text.splitlines():
+        match = _STAGE_LINE.match(line)
+        if match:
+            kind, operation, stage, value = match.groups()
+            entry = stages.setdefault((operation, stage), [0.0, 0.0])
+            entry[0 if kind == "sum" else 1] = float(value)
+    return stages
+
+
+def stage_means(before: Dict, after: Dict, operation: str) -> Dict:
+    """Mean ms per stage of an operation between two /metrics reads"""
+    means = {}
+    for (op, stage), (total, count) in after.items():
+        if op != operation:
+            continue
+        previous_total, previous_count = before.get((op, stage), [0.0, 0.0])
+        if count > previous_count:
+            means[stage] = round((total - previous_total) / (count - previous_count) * 1000, 1)
+    return means
+
+
+async def run(args) -> Dict:
+    path, streaming = ENDPOINTS[args.endpoint]
+    questions = [question for _, _, question in retrieval_notes(200)]
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    results = Results()
+    
+    async with httpx.AsyncClient(base_url=args.url, timeout=timeout, limits=limits) as client:
+        document_id = None
+        if args.endpoint.startswith("analyst"):
+            document_id = await upload_analyst_document(client)
+            print(f"📄 Uploaded analyst document {document_id}")
+        before = await read_stage_times(client) if args.metrics else {}
+        
+        sent = 0
+        
+        def next_body() -> Dict:
+            nonlocal sent
+            question = questions[sent % len(questions)]
+            sent += 1
+            if document_id is not None:
+                return {"document_id": document_id, "message": question}
+            # A fresh conversation per request, so history never grows during the run
+            return {"message": question, "conversation_id": f"load-{uuid.uuid4().hex[:12]}"}
+        
+        start = time.perf_counter()
+        deadline = start + args.duration
+        if args.rate:
+            # Open loop: arrivals keep coming at the set rate, with a cap on outstanding requests
+            outstanding = asyncio.Semaphore(args.max_outstanding)
+            tasks = []
+            
+            async def arrival(body):
+                try:
+                    await send(client, path, streaming, body, results)
+                finally:
+                    outstanding.release()
+            
+            while time.perf_counter() < deadline:
+                if outstanding.locked():
+                    results.record("dropped")
+                else:
+                    await outstanding.acquire()
+                    tasks.append(asyncio.create_task(arrival(next_body())))
+                await asyncio.sleep(1 / args.rate)
+            await asyncio.gather(*tasks)
+        else:
+            async def client_loop():
+                while time.perf_counter() < deadline:
+                    await send(client, path, streaming, next_body(), results)
+            
+            await asyncio.gather(*(client_loop() for _ in range(args.concurrency)))
+        wall = time.perf_counter() - start
+        
+        after = await read_stage_times(client) if args.metrics else {}
+    
+    mock_stats = None
+    if args.mock_url:
+        async with httpx.AsyncClient(base_url=args.mock_url, timeout=timeout) as mock:
+            mock_stats = (await mock.get("/stats")).json()
+    
+    operation = "analyst_chat" if document_id is not None else "query"
+    return {
+        "endpoint": args.endpoint,
+        "mode": f"rate {args.rate}/s" if args.rate else f"concurrency {args.concurrency}",
+        "duration_seconds": round(wall, 1),
+        "sent": sent,
+        "completed_per_second": round(len(results.latencies) / wall, 2),
+        "statuses": results.statuses,
+        "latency": latency_summary(results.latencies),
+        "first_token": latency_summary(results.first_tokens) if streaming else None,
+        "stage_mean_ms": stage_means(before, after, operation) if args.metrics else None,
+        "mock": mock_stats
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Server under test")
+    parser.add_argument("--endpoint", choices=sorted(ENDPOINTS), default="chat")
+    parser.add_argument("--concurrency", type=int, default=32, help="Closed-loop clients")
+    parser.add_argument("--rate", type=float, help="Open-loop arrivals per second (overrides --concurrency)")
+    parser.add_argument("--max-outstanding", type=int, default=1000, help="Open loop: drop arrivals past this many in flight")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to keep sending")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--metrics", action="store_true", help="Report per-stage means from the server's /metrics")
+    parser.add_argument("--mock-url", help="mock_llm_server.py address, to report what the LLM saw")
+    parser.add_argument("--output", help="Also write the results as JSON to this file")
+    args = parser.parse_args()
+    
+    print(f"🚀 {args.endpoint} at {args.url} for {args.duration:.0f}s, "
+          f"{f'{args.rate}/s open loop' if args.rate else f'{args.concurrency} clients'}")
+    results = asyncio.run(run(args))
+    
+    latency = results["latency"]
+    print(f"\n📊 {results['endpoint']}, {results['mode']}")
+    print("=" * 64)
+    print(f"sent {results['sent']}, {results['completed_per_second']} completed/s over {results['duration_seconds']}s")
+    print(f"statuses        {json.dumps(results['statuses'])}")
+    if latency["count"]:
+        print(f"latency         p50 {latency['p50_ms']} ms   p95 {latency['p95_ms']} ms   "
+              f"p99 {latency['p99_ms']} ms   max {latency['max_ms']} ms")
+    first_token = results["first_token"]
+    if first_token and first_token["count"]:
+        print(f"first token     p50 {first_token['p50_ms']} ms   p95 {first_token['p95_ms']} ms   "
+              f"p99 {first_token['p99_ms']} ms")
+    if results["stage_mean_ms"]:
+        print("stage means     " + "   ".join(f"{stage} {ms} ms" for stage, ms in sorted(results["stage_mean_ms"].items())))
+    if results["mock"]:
+        print(f"LLM stand-in    peak {results['mock']['peak_in_flight']} calls in flight, "
+              f"requests {json.dumps(results['mock']['requests'])}")
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
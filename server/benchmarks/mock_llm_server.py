@@ -0,0 +1,307 @@
+"""
+Local stand-in for the Gemini and OpenAI APIs, for load testing without quota
+
+Answers the requests the server's own clients make, in the same wire format:
+    
+    POST /v1beta/models/{model}:generateContent        ChatGoogleGenerativeAI.ainvoke
+    POST /v1beta/models/{model}:streamGenerateContent  ChatGoogleGenerativeAI.astream
+    POST /v1/embeddings                                 OpenAIEmbeddings
+
+Answers and embeddings are deterministic (derived from a hash of the input),
+so runs are repeatable; only the latencies are random. Each response waits a
+time drawn from --distribution around --latency (streams: --first-token,
+then --tokens-per-second), and --error-rate / --rate-limit-rate fail that
+fraction of requests with Google's or OpenAI's error body. --max-in-flight
+answers 429 past that many concurrent calls, like a per-minute quota.
+GET /stats reports what the stand-in has seen, including the peak number of
+calls in flight, which shows whether MAX_CONCURRENT_LLM_CALLS is holding.
+
+Point the server at it:
+    
+    GEMINI_BASE_URL=http://127.0.0.1:8100 uvicorn main:app
+
+and for OpenAI embeddings as well:
+    
+    USE_LOCAL_EMBEDDINGS=false USE_OPENAI_EMBEDDINGS=true OPENAI_API_KEY=mock \\
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 GEMINI_BASE_URL=http://127.0.0.1:8100 uvicorn main:app
+
+Both client libraries retry 429 and 5xx responses on their own, so injected
+errors show up at the API partly as extra latency.
+
+Usage (from the server/ directory):
+    python benchmarks/mock_llm_server.py [--port 8100] [--latency 1.0] [--distribution lognormal]
+        [--first-token 0.4] [--tokens-per-second 80] [--error-rate 0.01] [--max-in-flight 60]
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Words the fake answers are made of
+VOCABULARY = (
+    "onboarding carrier shipment freight dispatch invoice tracking warehouse pallet route "
+    "driver schedule policy account portal rate quote delivery pickup customer team "
+    "manager system process request update report document review access support"
+).split()
+
+# Rough size of a token in characters, as in llm_rag.metrics
+CHARS_PER_TOKEN = 4
+
+
+class LatencyModel:
+    """Draws response delays around a mean from the configured distribution"""
+    
+    def __init__(self, distribution: str, jitter: float, seed: Optional[int]):
+        self.distribution = distribution
+        self.jitter = jitter
+        self.random = random.Random(seed)
+    
+    def sample(self, mean: float) -> float:
+        if mean <= 0:
+            return 0.0
+        if self.distribution == "fixed":
+            return mean
+        if self.distribution == "uniform":
+            return self.random.uniform(mean * (1 - self.jitter), mean * (1 + self.jitter))
+        if self.distribution == "normal":
+            return max(0.0, self.random.gauss(mean, mean * self.jitter))
+        # Lognormal with this mean: long right tail, like real LLM latencies
+        sigma = math.sqrt(math.log(1 + self.jitter ** 2))
+        return self.random.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+
+
+class Stats:
+    """Request counts by route and status, and concurrency, for GET /stats"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests: Dict[str, Dict[str, int]] = {}
+        self.in_flight = 0
+        self.peak_in_flight = 0
+    
+    def enter(self) -> int:
+        with self.lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            return self.in_flight
+    
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+    
+    def record(self, route: str, status: int):
+        with self.lock:
+            counts = self.requests.setdefault(route, {})
+            counts[str(status)] = counts.get(str(status), 0) + 1
+    
+    def as_dict(self) -> Dict:
+        with self.lock:
+            return {
+                "uptime_seconds": round(time.time() - self.started, 1),
+                "requests": {route: dict(counts) for route, counts in self.requests.items()},
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight
+            }
+
+
+def seeded_random(text: str) -> random.Random:
+    return random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+
+
+def fake_answer(prompt: str, words: int) -> str:
+    rng = seeded_random(prompt)
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words)).capitalize() + "."
+
+
+def fake_embedding(text: str, dimensions: int) -> List[float]:
+    rng = seeded_random(text)
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dimensions)]
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+def token_count(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def gemini_error(status: int) -> JSONResponse:
+    statuses = {429: ("RESOURCE_EXHAUSTED", "Resource has been exhausted (e.g. check quota)."),
+                500: ("INTERNAL", "An internal error has occurred.")}
+    name, message = statuses[status]
+    return JSONResponse(status_code=status, content={"error": {"code": status, "message": message, "status": name}})
+
+
+def openai_error(status: int) -> JSONResponse:
+    errors = {429: ("rate_limit_error", "Rate limit reached for requests"),
+              500: ("server_error", "The server had an error while processing your request.")}
+    kind, message = errors[status]
+    return JSONResponse(status_code=status, content={"error": {"message": message, "type": kind, "code": None}})
+
+
+def create_app(args) -> FastAPI:
+    app = FastAPI(title="Mock Gemini/OpenAI")
+    latency = LatencyModel(args.distribution, args.jitter, args.seed)
+    failures = random.Random(args.seed)
+    stats = Stats()
+    
+    def injected_error() -> Optional[int]:
+        """Status to fail this request with, if any (call between stats.enter and stats.leave)"""
+        if args.max_in_flight and stats.in_flight > args.max_in_flight:
+            return 429
+        roll = failures.random()
+        if roll < args.rate_limit_rate:
+            return 429
+        if roll < args.rate_limit_rate + args.error_rate:
+            return 500
+        return None
+    
+    def gemini_chunk(text: str, model: str, finish: bool = False, prompt_tokens: int = 0, answer_tokens: int = 0) -> Dict:
+        candidate = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+        chunk = {"candidates": [candidate], "modelVersion": model}
+        if finish:
+            candidate["finishReason"] = "STOP"
+            chunk["usageMetadata"] = {
+                "promptTokenCount": prompt_tokens,
+                "candidatesTokenCount": answer_tokens,
+                "totalTokenCount": prompt_tokens + answer_tokens
+            }
+        return chunk
+    
+    @app.post("/v1beta/models/{target}")
+    async def gemini(target: str, request: Request):
+        model, _, method = target.partition(":")
+        if method not in ("generateContent", "streamGenerateContent"):
+            return JSONResponse(status_code=404, content={"error": {"code": 404, "message": f"Unknown method {method}", "status": "NOT_FOUND"}})
+        body = await request.json()
+        prompt = "\n".join(
+            part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", [])
+        )
+        answer = fake_answer(prompt, args.answer_words)
+        prompt_tokens, answer_tokens = token_count(prompt), token_count(answer)
+        
+        stats.enter()
+        status = injected_error()
+        if status is not None:
+            await asyncio.sleep(latency.sample(args.error_latency))
+            stats.leave()
+            stats.record(method, status)
+            return gemini_error(status)
+        
+        if method == "generateContent":
+            try:
+                await asyncio.sleep(latency.sample(args.latency))
+            finally:
+                stats.leave()
+            stats.record(method, 200)
+            return gemini_chunk(answer, model, True, prompt_tokens, answer_tokens)
+        
+        # The REST client asks for a streamed JSON array ($alt=json), browsers and curl for SSE
+        sse = (request.query_params.get("alt") or request.query_params.get("$alt") or "").startswith("sse")
+        words = answer.split(" ")
+        pieces = [" ".join(words[i:i + args.chunk_words]) for i in range(0, len(words), args.chunk_words)]
+        
+        async def stream():
+            try:
+                await asyncio.sleep(latency.sample(args.first_token))
+                for n, piece in enumerate(pieces):
+                    if n:
+                        await asyncio.sleep(token_count(piece) / args.tokens_per_second)
+                        piece = " " + piece
+                    last = n == len(pieces) - 1
+                    chunk = json.dumps(gemini_chunk(piece, model, last, prompt_tokens, answer_tokens))
+                    if sse:
+                        yield f"data: {chunk}\r\n\r\n"
+                    else:
+                        yield ("[" if n == 0 else ",\r\n") + chunk + ("]" if last else "")
+                stats.record(method, 200)
+            finally:
+                stats.leave()
+        
+        return StreamingResponse(stream(), media_type="text/event-stream" if sse else "application/json")
+    
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body.get("input", [])
+        # A single string, a list of strings, or token IDs (one list or a list of lists)
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        texts = [item if isinstance(item, str) else json.dumps(item) for item in inputs]
+        dimensions = body.get("dimensions") or args.embedding_dimensions
+        
+        stats.enter()
+        try:
+            status = injected_error()
+            await asyncio.sleep(latency.sample(args.error_latency if status else args.embedding_latency))
+        finally:
+            stats.leave()
+        stats.record("embeddings", status or 200)
+        if status is not None:
+            return openai_error(status)
+        
+        data = []
+        for index, text in enumerate(texts):
+            vector = fake_embedding(text, dimensions)
+            if body.get("encoding_format") == "base64":
+                # The openai client asks for packed little-endian float32 by default
+                vector = base64.b64encode(array("f", vector).tobytes()).decode("ascii")
+            data.append({"object": "embedding", "index": index, "embedding": vector})
+        tokens = sum(token_count(text) for text in texts)
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", ""),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+        }
+    
+    @app.get("/stats")
+    async def get_stats():
+        return stats.as_dict()
+    
+    @app.on_event("shutdown")
+    async def print_stats():
+        print(f"📊 {json.dumps(stats.as_dict())}")
+    
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=1.0, help="Mean generateContent latency in seconds")
+    parser.add_argument("--first-token", type=float, default=0.4, help="Mean time to the first streamed chunk in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0, help="Streaming speed after the first chunk")
+    parser.add_argument("--embedding-latency", type=float, default=0.05, help="Mean /v1/embeddings latency in seconds")
+    parser.add_argument("--error-latency", type=float, default=0.05, help="Mean latency of injected errors in seconds")
+    parser.add_argument("--distribution", choices=("fixed", "uniform", "normal", "lognormal"), default="lognormal")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Spread as a fraction of the mean")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failed with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests failed with 429")
+    parser.add_argument("--max-in-flight", type=int, default=0, help="Answer 429 past this many concurrent calls (0: no limit)")
+    parser.add_argument("--answer-words", type=int, default=120)
+    parser.add_argument("--chunk-words", type=int, default=8, help="Words per streamed chunk")
+    parser.add_argument("--embedding-dimensions", type=int, default=1536)
+    parser.add_argument("--seed", type=int, help="Seed for latencies and injected errors")
+    args = parser.parse_args()
+    
+    print(f"🧪 Mock Gemini/OpenAI on http://{args.host}:{args.port} "
+          f"({args.distribution} latency, mean {args.latency}s, first token {args.first_token}s)")
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
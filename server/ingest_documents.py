@@ -1,119 +1,215 @@
 """
 Script to help ingest documents programmatically
 Useful for bulk ingestion of existing documents
+
+Walks a directory tree and feeds every supported file through the staged
+IngestionPipeline: text is extracted in worker processes, chunks from many
+files are embedded together in large batches and written to Chroma in bulk.
+Progress is checkpointed to a manifest after every slice of files, so an
+interrupted run picks up where it stopped.
+
+Usage:
+    python ingest_documents.py <directory_path> [category] [--manifest PATH] [--batch-files N] [--restart]
+    python ingest_documents.py <file_path> [category]
 """
 
-import os
+import argparse
 import asyncio
+import json
+import os
+import time
 from pathlib import Path
+from typing import Dict, List
+
 from llm_rag.document_processor import DocumentProcessor
-from llm_rag.config import config
+from llm_rag.embedding_cache import EmbeddingStats
+from llm_rag.extraction import SUPPORTED_EXTENSIONS
+from llm_rag.ingestion import IngestionPipeline
+
+MANIFEST_NAME = ".ingest_manifest.json"
+
+
+def find_documents(directory: Path) -> List[Path]:
+    """Every supported file under directory, in a stable order"""
+    return sorted(
+        path for path in directory.rglob("*")
+        if path.is_file() and path.suffix.lower() in SUPPORTED_EXTENSIONS
+    )
+
 
+def source_name(directory: Path, path: Path) -> str:
+    """Source name stored in Chroma: the path relative to the ingested directory"""
+    return path.relative_to(directory).as_posix()
 
-async def ingest_directory(directory_path: str, category: str = "general"):
+
+def load_manifest(manifest_path: Path) -> Dict:
+    if not manifest_path.exists():
+        return {"files": {}}
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(manifest_path: Path, manifest: Dict):
+    """Write the manifest atomically so a kill mid-write can't corrupt it"""
+    partial_path = manifest_path.with_name(manifest_path.name + ".part")
+    with open(partial_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(partial_path, manifest_path)
+
+
+def is_done(entry: Dict, path: Path, category: str) -> bool:
+    """True if the manifest says this exact file was already ingested"""
+    if not entry or entry.get("status") != "success" or entry.get("category") != category:
+        return False
+    stat = path.stat()
+    return entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime
+
+
+async def ingest_directory(
+    directory_path: str,
+    category: str = "general",
+    manifest_path: str = None,
+    batch_files: int = 64,
+    restart: bool = False
+):
     """
-    Ingest all supported documents from a directory
+    Ingest all supported documents under a directory tree
     
     Args:
         directory_path: Path to directory containing documents
         category: Category to assign to all documents
+        manifest_path: Checkpoint file (defaults to .ingest_manifest.json in the directory)
+        batch_files: Files handed to the pipeline per checkpoint
+        restart: Ignore the manifest and process every file again
     """
-    processor = DocumentProcessor()
-    
-    supported_extensions = {'.pdf', '.docx', '.txt', '.md'}
-    directory = Path('server/llm_rag/context_documents')
-    
-    if not directory.exists():
+    directory = Path(directory_path).resolve()
+    if not directory.is_dir():
         print(f"❌ Directory not found: {directory_path}")
         return
     
-    files = [f for f in directory.iterdir() if f.suffix.lower() in supported_extensions]
+    manifest_file = Path(manifest_path) if manifest_path else directory / MANIFEST_NAME
+    manifest = {"files": {}} if restart else load_manifest(manifest_file)
     
+    files = find_documents(directory)
     if not files:
         print(f"❌ No supported documents found in {directory_path}")
         return
     
-    print(f"📁 Found {len(files)} documents to process...")
+    pending = [
+        path for path in files
+        if not is_done(manifest["files"].get(source_name(directory, path)), path, category)
+    ]
+    print(f"📁 Found {len(files)} documents, {len(files) - len(pending)} already ingested, {len(pending)} to process...")
+    if not pending:
+        return
     
-    for file_path in files:
-        try:
-            print(f"📄 Processing: {file_path.name}...")
+    processor = DocumentProcessor()
+    pipeline = IngestionPipeline(processor)
+    embedding_stats = EmbeddingStats()
+    started = time.perf_counter()
+    totals = {"files": 0, "failed": 0, "unchanged": 0, "chunks": 0}
+    
+    try:
+        for start in range(0, len(pending), batch_files):
+            batch = pending[start:start + batch_files]
+            batch_started = time.perf_counter()
+            batch_stats = EmbeddingStats()
+            results = await pipeline.ingest(
+                [{"filename": source_name(directory, path), "path": str(path)} for path in batch],
+                category=category,
+                embedding_stats=batch_stats
+            )
+            embedding_stats.merge(batch_stats)
             
-            # Read file content
-            if file_path.suffix.lower() == '.pdf':
-                import PyPDF2
-                text = ""
-                with open(file_path, 'rb') as f:
-                    pdf_reader = PyPDF2.PdfReader(f)
-                    for page in pdf_reader.pages:
-                        text += page.extract_text() + "\n"
-            elif file_path.suffix.lower() == '.docx':
-                import docx
-                doc = docx.Document(file_path)
-                text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-            else:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    text = f.read()
+            batch_chunks = 0
+            for path, result in zip(batch, results):
+                name = source_name(directory, path)
+                if result["status"] != "success":
+                    totals["failed"] += 1
+                    print(f"❌ Error processing {name}: {result['error']}")
+                    manifest["files"][name] = {"status": "error", "category": category, "error": result["error"]}
+                    continue
+                stat = path.stat()
+                totals["files"] += 1
+                totals["unchanged"] += int(result["unchanged"])
+                batch_chunks += result["chunks_created"]
+                manifest["files"][name] = {
+                    "status": "success",
+                    "category": category,
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime,
+                    "sha256": result["sha256"],
+                    "chunks": result["chunks_created"] + result["chunks_unchanged"]
+                }
+            totals["chunks"] += batch_chunks
+            save_manifest(manifest_file, manifest)
             
-            # Ingest directly
-            result = processor.ingest_text_directly(
-                text=text,
-                source_name=file_path.name,
-                category=category
+            batch_seconds = time.perf_counter() - batch_started
+            done = min(start + batch_files, len(pending))
+            print(
+                f"⏳ {done}/{len(pending)} files, {batch_chunks} chunks in {batch_seconds:.1f}s "
+                f"({batch_chunks / max(batch_seconds, 1e-6):.1f} chunks/s)"
             )
-            
-            print(f"✅ Processed {file_path.name}: {result['chunks_created']} chunks created")
-        
-        except Exception as e:
-            print(f"❌ Error processing {file_path.name}: {str(e)}")
+    finally:
+        processor.shutdown()
+    
+    elapsed = time.perf_counter() - started
+    print(
+        f"✅ Ingested {totals['files']} files ({totals['unchanged']} unchanged, {totals['failed']} failed): "
+        f"{totals['chunks']} chunks in {elapsed:.1f}s ({totals['chunks'] / max(elapsed, 1e-6):.1f} chunks/s)"
+    )
+    stats = embedding_stats.as_dict()
+    print(f"🧮 Embedding cache hit rate {stats['hit_rate']:.0%}, ~{stats['seconds_saved']:.1f}s saved")
+    print(f"📝 Checkpoint: {manifest_file}")
 
 
 async def ingest_text_file(file_path: str, category: str = "general"):
     """
-    Ingest a single text file
+    Ingest a single file
     
     Args:
-        file_path: Path to text file
+        file_path: Path to a supported document
         category: Category to assign
     """
-    processor = DocumentProcessor()
-    
     file = Path(file_path)
     if not file.exists():
         print(f"❌ File not found: {file_path}")
         return
     
+    processor = DocumentProcessor()
     try:
-        with open(file, 'r', encoding='utf-8') as f:
-            text = f.read()
-        
-        result = processor.ingest_text_directly(
-            text=text,
-            source_name=file.name,
+        [result] = await IngestionPipeline(processor).ingest(
+            [{"filename": file.name, "path": str(file)}],
             category=category
         )
-        
-        print(f"✅ Processed {file.name}: {result['chunks_created']} chunks created")
+    finally:
+        processor.shutdown()
     
-    except Exception as e:
-        print(f"❌ Error processing {file_path}: {str(e)}")
+    if result["status"] == "success":
+        print(f"✅ Processed {file.name}: {result['chunks_created']} chunks created")
+    else:
+        print(f"❌ Error processing {file_path}: {result['error']}")
 
 
 if __name__ == "__main__":
-    import sys
-    
-    if len(sys.argv) < 2:
-        print("Usage:")
-        print("  python ingest_documents.py <directory_path> [category]")
-        print("  python ingest_documents.py <file_path> [category]")
-        print("\nCategories: supply_chain, company_culture, teams, dev_setup, general")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description="Bulk-ingest documents into the RAG collection",
+        epilog="Categories: supply_chain, company_culture, teams, dev_setup, general"
+    )
+    parser.add_argument("path", help="Directory (walked recursively) or single file")
+    parser.add_argument("category", nargs="?", default="general")
+    parser.add_argument("--manifest", help=f"Checkpoint file (default: <directory>/{MANIFEST_NAME})")
+    parser.add_argument("--batch-files", type=int, default=64, help="Files per checkpoint")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start over")
+    args = parser.parse_args()
     
-    path = sys.argv[1]
-    category = sys.argv[2] if len(sys.argv) > 2 else "general"
-    
-    if os.path.isdir(path):
-        asyncio.run(ingest_directory(path, category))
+    if os.path.isdir(args.path):
+        asyncio.run(ingest_directory(
+            args.path,
+            args.category,
+            manifest_path=args.manifest,
+            batch_files=args.batch_files,
+            restart=args.restart
+        ))
     else:
-        asyncio.run(ingest_text_file(path, category))
-
+        asyncio.run(ingest_text_file(args.path, args.category))
@@ -0,0 +1,333 @@
+"""
+The Analyst - question answering over a single uploaded document
+
+Analyst uploads are private to a session, so they are not written to Chroma.
+Instead each document is chunked and embedded once at upload time into a
+NumPy matrix, and every question only sends the best-matching chunks to
+Gemini instead of the whole document.
+"""
+
+import json
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class DocumentIndex:
+    """Cosine top-k search over the chunks of one document"""
+    
+    def __init__(self, chunks: List[str], embeddings: List[List[float]]):
+        if len(chunks) != len(embeddings):
+            raise ValueError("Each chunk needs exactly one embedding")
+        self.chunks = chunks
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        # Rows are unit length so a dot product is the cosine similarity
+        self.matrix = matrix / norms
+    
+    def __len__(self) -> int:
+        return len(self.chunks)
+    
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the index (vectors plus UTF-8 text)"""
+        return self.matrix.nbytes + sum(len(chunk.encode("utf-8")) for chunk in self.chunks)
+    
+    def search(self, query_embedding: List[float], top_k: int) -> List[Tuple[int, float]]:
+        """
+        Find the chunks most similar to a query
+        
+        Returns:
+            List of (chunk_index, score), best match first
+        """
+        if len(self.chunks) == 0 or top_k <= 0:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        scores = self.matrix @ query
+        top_k = min(top_k, len(scores))
+        # argpartition is O(n); only the k winners get sorted
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        ranked = candidates[np.argsort(-scores[candidates])]
+        return [(int(i), float(scores[i])) for i in ranked]
+    
+    def save(self, path: str):
+        """Write the index to a compressed .npz file"""
+        chunks_json = json.dumps(self.chunks).encode("utf-8")
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                matrix=self.matrix,
+                chunks=np.frombuffer(chunks_json, dtype=np.uint8)
+            )
+    
+    @classmethod
+    def load(cls, path: str) -> "DocumentIndex":
+        """Read an index written by save()"""
+        with np.load(path) as data:
+            index = cls.__new__(cls)
+            index.matrix = data["matrix"]
+            index.chunks = json.loads(data["chunks"].tobytes().decode("utf-8"))
+        return index
+    
+    def context_for(self, query_embedding: List[float], top_k: int) -> List[Tuple[int, str]]:
+        """Top-k chunks as (chunk_index, text), in document order for readability"""
+        hits = self.search(query_embedding, top_k)
+        return [(i, self.chunks[i]) for i, _ in sorted(hits)]
+
+
+
+class DocumentExpired(Exception):
+    """Raised when an analyst document's session has run out"""
+
+
+class DocumentTooLarge(Exception):
+    """Raised when one analyst document alone does not fit in the disk budget"""
+
+
+class AnalystDocumentStore:
+    """
+    Session store for analyst documents with a memory budget
+    
+    Indexes live in memory until the total exceeds `memory_budget_bytes`; the
+    least recently used ones are then spilled to compressed files in
+    `spill_dir` and loaded back on demand. Indexes larger than
+    `spill_threshold_bytes` go straight to disk. If spilled files exceed
+    `disk_budget_bytes` the oldest documents are dropped, never the one just
+    added or read; a document too big for the disk budget on its own is
+    rejected with DocumentTooLarge. Expired documents
+    are removed by sweep(), which main.py runs periodically.
+    
+    Entries are per process, so each store spills into its own subdirectory
+    of `spill_dir` and close() removes only that one; other workers sharing
+    `spill_dir` keep their files.
+    
+    Methods do blocking file IO; call them from a worker thread.
+    """
+    
+    def __init__(
+        self,
+        spill_dir: str,
+        memory_budget_bytes: int,
+        spill_threshold_bytes: int,
+        disk_budget_bytes: int,
+        ttl: timedelta = timedelta(hours=24)
+    ):
+        self.spill_dir = os.path.join(spill_dir, f"{os.getpid()}-{uuid.uuid4().hex[:8]}")
+        self.memory_budget_bytes = memory_budget_bytes
+        self.spill_threshold_bytes = spill_threshold_bytes
+        self.disk_budget_bytes = disk_budget_bytes
+        self.ttl = ttl
+        os.makedirs(self.spill_dir, exist_ok=True)
+        
+        # document_id -> {"filename", "uploaded_at", "expires_at", "nbytes", "index", "path"}
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        # Recently expired ids, so callers can tell "expired" from "never existed"
+        self._expired_ids: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.memory_bytes = 0
+        self.disk_bytes = 0
+        self.spills = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def put(self, document_id: str, filename: str, index: DocumentIndex):
+        """
+        Add a freshly uploaded document
+        
+        Raises:
+            DocumentTooLarge: if its spill file alone exceeds the disk budget (nothing is kept)
+        """
+        now = datetime.now()
+        entry = {
+            "filename": filename,
+            "uploaded_at": now,
+            "expires_at": now + self.ttl,
+            "nbytes": index.nbytes,
+            "index": None,
+            "path": None
+        }
+        with self._lock:
+            self._entries[document_id] = entry
+            if entry["nbytes"] > self.spill_threshold_bytes:
+                self._spill(document_id, entry, index)
+            else:
+                entry["index"] = index
+                self.memory_bytes += entry["nbytes"]
+            self._enforce_budgets(keep=document_id)
+            if entry["path"] is not None and entry["disk_bytes"] > self.disk_budget_bytes:
+                self._remove(document_id)
+                raise DocumentTooLarge(
+                    f"{filename} needs {entry['disk_bytes']} bytes on disk; "
+                    f"the limit is {self.disk_budget_bytes}"
+                )
+    
+    def get(self, document_id: str) -> Optional[Tuple[Dict, DocumentIndex]]:
+        """
+        Fetch a document's metadata and index
+        
+        Returns:
+            (entry, index), or None if the document does not exist
+        
+        Raises:
+            DocumentExpired: if the document's session has run out
+        """
+        with self._lock:
+            if document_id in self._expired_ids:
+                raise DocumentExpired(document_id)
+            entry = self._entries.get(document_id)
+            if entry is None:
+                return None
+            if datetime.now() > entry["expires_at"]:
+                self._remove(document_id)
+                self._remember_expired(document_id)
+                self.expirations += 1
+                raise DocumentExpired(document_id)
+            
+            self._entries.move_to_end(document_id)
+            if entry["index"] is not None:
+                return entry, entry["index"]
+            
+            try:
+                index = DocumentIndex.load(entry["path"])
+            except FileNotFoundError:
+                # The spill file was removed behind our back; the session is gone
+                self._remove(document_id)
+                self._remember_expired(document_id)
+                self.expirations += 1
+                raise DocumentExpired(document_id)
+            if entry["nbytes"] <= self.spill_threshold_bytes:
+                # Small enough to bring back into memory
+                os.remove(entry["path"])
+                self.disk_bytes -= entry["disk_bytes"]
+                entry["path"] = None
+                entry["index"] = index
+                self.memory_bytes += entry["nbytes"]
+                self._enforce_budgets(keep=document_id)
+            return entry, index
+    
+    def delete(self, document_id: str) -> bool:
+        """Remove a document; returns False if it did not exist"""
+        with self._lock:
+            if document_id not in self._entries:
+                return False
+            self._remove(document_id)
+            return True
+    
+    def sweep(self) -> int:
+        """Remove every expired document; returns how many were removed"""
+        now = datetime.now()
+        with self._lock:
+            expired = [
+                document_id for document_id, entry in self._entries.items()
+                if now > entry["expires_at"]
+            ]
+            for document_id in expired:
+                self._remove(document_id)
+                self._remember_expired(document_id)
+            self.expirations += len(expired)
+            return len(expired)
+    
+    def close(self):
+        """Forget every document and remove this store's spill directory"""
+        with self._lock:
+            self._entries.clear()
+            self.memory_bytes = 0
+            self.disk_bytes = 0
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+    
+    def stats(self) -> Dict:
+        """Memory and disk usage plus eviction counters"""
+        with self._lock:
+            in_memory = sum(1 for entry in self._entries.values() if entry["index"] is not None)
+            return {
+                "documents": len(self._entries),
+                "documents_in_memory": in_memory,
+                "documents_on_disk": len(self._entries) - in_memory,
+                "memory_bytes": self.memory_bytes,
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "disk_bytes": self.disk_bytes,
+                "disk_budget_bytes": self.disk_budget_bytes,
+                "spills": self.spills,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+    
+    def _spill(self, document_id: str, entry: Dict, index: DocumentIndex):
+        """Write an index to disk and drop it from memory"""
+        path = os.path.join(self.spill_dir, f"{document_id}.npz")
+        index.save(path)
+        entry["path"] = path
+        entry["disk_bytes"] = os.path.getsize(path)
+        entry["index"] = None
+        self.disk_bytes += entry["disk_bytes"]
+        self.spills += 1
+    
+    def _enforce_budgets(self, keep: Optional[str] = None):
+        """
+        Spill LRU documents over the memory budget, drop LRU documents over the disk budget
+        
+        `keep` (the document being added or read) is never spilled or dropped.
+        """
+        for document_id, entry in list(self._entries.items()):
+            if self.memory_bytes <= self.memory_budget_bytes:
+                break
+            if entry["index"] is not None and document_id != keep:
+                index = entry["index"]
+                self.memory_bytes -= entry["nbytes"]
+                self._spill(document_id, entry, index)
+        
+        for document_id, entry in list(self._entries.items()):
+            if self.disk_bytes <= self.disk_budget_bytes:
+                break
+            if entry["path"] is not None and document_id != keep:
+                self._remove(document_id)
+                self.evictions += 1
+    
+    def _remove(self, document_id: str):
+        """Forget a document and delete its spill file"""
+        entry = self._entries.pop(document_id)
+        if entry["index"] is not None:
+            self.memory_bytes -= entry["nbytes"]
+        if entry["path"] is not None:
+            self.disk_bytes -= entry["disk_bytes"]
+            try:
+                os.remove(entry["path"])
+            except OSError:
+                pass
+    
+    def _remember_expired(self, document_id: str):
+        self._expired_ids[document_id] = None
+        while len(self._expired_ids) > 10000:
+            self._expired_ids.popitem(last=False)
+
+def build_analyst_prompt(filename: str, document_content: str, question: str) -> str:
+    """Build the Gemini prompt for a question about an uploaded document"""
+    return f"""You are an AI assistant helping analyze a document. Answer the user's question based ONLY on the following document content.
+
+Document: {filename}
+
+Relevant Document Excerpts:
+{document_content}
+
+User Question: {question}
+
+Please provide a helpful answer based on the document content. If the document doesn't contain information to answer the question, say so. Format your response using markdown for better readability (use headings, lists, code blocks, etc.).
+
+Answer:"""
+
+
+def format_excerpts(index: DocumentIndex, excerpts: List[Tuple[int, str]]) -> str:
+    """Label retrieved chunks so the model can tell them apart"""
+    return "\n\n---\n\n".join(
+        f"[Excerpt {i + 1} of {len(index)}]\n{chunk}" for i, chunk in excerpts
+    )
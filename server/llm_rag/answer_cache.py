@@ -0,0 +1,161 @@
+"""
+Semantic cache of generated answers
+
+An answer can be reused when a new question is close to a previous one in
+embedding space AND retrieval returned exactly the same chunks, because the
+Gemini prompt would then carry the same context.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """
+    Answer cache keyed on retrieved chunk IDs plus query-embedding similarity
+    
+    Entries are grouped by the frozen set of chunk IDs they were generated
+    from; within a group the most similar cached question wins if its cosine
+    similarity reaches `similarity_threshold`. Groups are evicted LRU.
+    """
+    
+    def __init__(
+        self,
+        similarity_threshold: float = 0.95,
+        max_size: int = 512,
+        ttl_seconds: float = 86400,
+        max_per_chunk_set: int = 8
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.max_per_chunk_set = max_per_chunk_set
+        # chunk-id set -> list of {"embedding", "answer", "sources", "stored_at"}
+        self._groups: "OrderedDict[FrozenSet[str], List[Dict]]" = OrderedDict()
+        # source filename -> chunk-id sets that used it, for invalidation
+        self._by_source: Dict[str, Set[FrozenSet[str]]] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+    
+    @staticmethod
+    def _unit(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    def lookup(self, query_embedding: List[float], chunk_ids: Iterable[str]) -> Optional[str]:
+        """Return a cached answer for a near-duplicate question over the same chunks"""
+        if self.max_size <= 0:
+            return None
+        key = frozenset(chunk_ids)
+        query = self._unit(query_embedding)
+        now = time.monotonic()
+        with self._lock:
+            group = self._groups.get(key)
+            if group:
+                expired = [e for e in group if now - e["stored_at"] > self.ttl_seconds]
+                if expired:
+                    group[:] = [e for e in group if now - e["stored_at"] <= self.ttl_seconds]
+                    self._size -= len(expired)
+                    self._forget_entries(key, expired)
+                if group:
+                    matrix = np.stack([e["embedding"] for e in group])
+                    scores = matrix @ query
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.similarity_threshold:
+                        self._groups.move_to_end(key)
+                        self.hits += 1
+                        return group[best]["answer"]
+            self.misses += 1
+            return None
+    
+    def store(
+        self,
+        query_embedding: List[float],
+        chunk_ids: Iterable[str],
+        source_names: Iterable[str],
+        answer: str
+    ):
+        """Cache an answer generated from the given chunks"""
+        if self.max_size <= 0:
+            return
+        key = frozenset(chunk_ids)
+        source_names = set(source_names)
+        with self._lock:
+            group = self._groups.setdefault(key, [])
+            group.append({
+                "embedding": self._unit(query_embedding),
+                "answer": answer,
+                "sources": source_names,
+                "stored_at": time.monotonic()
+            })
+            self._size += 1
+            self._groups.move_to_end(key)
+            for source in source_names:
+                self._by_source.setdefault(source, set()).add(key)
+            if len(group) > self.max_per_chunk_set:
+                self._size -= 1
+                self._forget_entries(key, [group.pop(0)])
+            
+            while self._size > self.max_size and self._groups:
+                evicted_key, evicted = self._groups.popitem(last=False)
+                self._size -= len(evicted)
+                self._forget_entries(evicted_key, evicted)
+    
+    def _forget_entries(self, key: FrozenSet[str], entries: List[Dict]):
+        """
+        Update the indexes after entries of a chunk-id set were dropped
+        
+        Sources that no remaining entry of the set used lose the set, and a
+        set left without entries is removed.
+        """
+        group = self._groups.get(key)
+        if not group:
+            self._groups.pop(key, None)
+        remaining = set().union(*(entry["sources"] for entry in group or []))
+        for source in set().union(*(entry["sources"] for entry in entries)) - remaining:
+            keys = self._by_source.get(source)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_source[source]
+    
+    def invalidate_source(self, source: str) -> int:
+        """Drop every answer generated from a document's chunks"""
+        with self._lock:
+            removed = 0
+            for key in self._by_source.pop(source, set()):
+                entries = self._groups.pop(key, [])
+                removed += len(entries)
+                self._forget_entries(key, entries)
+            self._size -= removed
+            self.invalidated += removed
+            return removed
+    
+    def clear(self):
+        """Drop every cached answer"""
+        with self._lock:
+            self.invalidated += self._size
+            self._groups.clear()
+            self._by_source.clear()
+            self._size = 0
+    
+    def stats(self) -> Dict:
+        """Hit rate and size"""
+        lookups = self.hits + self.misses
+        return {
+            "size": self._size,
+            "max_size": self.max_size,
+            "similarity_threshold": self.similarity_threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidated": self.invalidated
+        }
@@ -0,0 +1,111 @@
+"""
+Incremental chunking of page-wise text
+
+RecursiveCharacterTextSplitter needs the whole text up front. PageChunker
+takes pages one at a time instead, splits a bounded window and carries only
+the unfinished tail forward, so memory stays proportional to the window and
+not to the document. Every chunk comes from the splitter, so none exceeds
+chunk_size, and the carried tail (the splitter's last chunk) overlaps the
+next page's text. Where a window ends is not where the splitter would have
+cut the whole text, so boundaries near it can differ from splitting in one
+go, occasionally adding an extra chunk. No text is dropped.
+"""
+
+import bisect
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+Record = Tuple[str, Dict]
+
+
+def content_hash(text: str) -> str:
+    """Stable hash of a chunk's text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class PageChunker:
+    """Turns a stream of (page, text) into (chunk, page metadata) records"""
+    
+    def __init__(self, splitter, chunk_size: int, chunk_overlap: int, window_chunks: int = 8):
+        """
+        Args:
+            splitter: Text splitter with a split_text(str) -> List[str] method
+            chunk_size: The splitter's chunk size
+            chunk_overlap: The splitter's chunk overlap
+            window_chunks: Buffered text, in chunks, before a split is attempted
+        """
+        self.splitter = splitter
+        self.chunk_overlap = chunk_overlap
+        self.window = chunk_size * window_chunks
+        self._buffer = ""
+        # Buffer offset where each page starts, and that page's number
+        self._page_offsets: List[int] = []
+        self._page_numbers: List[Optional[int]] = []
+    
+    def feed(self, text: str, page: Optional[int] = None) -> List[Record]:
+        """Add a page of text and return the chunks that are now complete"""
+        if not text:
+            return []
+        if self._buffer and not self._buffer.endswith("\n"):
+            self._buffer += "\n"
+        self._page_offsets.append(len(self._buffer))
+        self._page_numbers.append(page)
+        self._buffer += text
+        if len(self._buffer) < self.window:
+            return []
+        return self._split(final=False)
+    
+    def flush(self) -> List[Record]:
+        """Return the remaining chunks once the last page has been fed"""
+        if not self._buffer.strip():
+            self._reset()
+            return []
+        return self._split(final=True)
+    
+    def _split(self, final: bool) -> List[Record]:
+        chunks = self.splitter.split_text(self._buffer)
+        if not chunks:
+            self._reset()
+            return []
+        
+        emit = chunks if final else chunks[:-1]
+        records = []
+        index, length = 0, 0
+        for chunk in emit:
+            index, length = self._locate(chunk, index, length), len(chunk)
+            records.append((chunk, self._page_metadata(index, index + length)))
+        
+        if final:
+            self._reset()
+        else:
+            # Carry the last chunk forward; it may still grow with the next page.
+            # It ends where the buffer ends, which locates it without searching.
+            tail = chunks[-1]
+            self._reset_from(max(0, len(self._buffer.rstrip()) - len(tail)), tail)
+        return records
+    
+    def _locate(self, chunk: str, previous_index: int, previous_length: int) -> int:
+        """Buffer offset of a chunk, searching from where the previous one ended"""
+        index = self._buffer.find(chunk, max(0, previous_index + previous_length - self.chunk_overlap))
+        # The splitter can normalize whitespace; fall back to the previous position
+        return index if index >= 0 else previous_index
+    
+    def _page_metadata(self, start: int, end: int) -> Dict:
+        first = self._page_numbers[bisect.bisect_right(self._page_offsets, start) - 1]
+        last = self._page_numbers[bisect.bisect_right(self._page_offsets, max(start, end - 1)) - 1]
+        if first is None:
+            return {}
+        return {"page": first, "page_end": last if last is not None else first}
+    
+    def _reset_from(self, start: int, tail: str):
+        position = bisect.bisect_right(self._page_offsets, start) - 1
+        self._page_offsets = [0] + [
+            offset - start for offset in self._page_offsets[position + 1:] if offset - start < len(tail)
+        ]
+        self._page_numbers = self._page_numbers[position:position + len(self._page_offsets)]
+        self._buffer = tail
+    
+    def _reset(self):
+        self._buffer = ""
+        self._page_offsets = []
+        self._page_numbers = []
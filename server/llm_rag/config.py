@@ -3,6 +3,7 @@ Configuration settings for RAG pipeline
 """
 
 import os
+import tempfile
 from pydantic_settings import BaseSettings
 from typing import Optional
 
@@ -13,6 +14,8 @@ class RAGConfig(BaseSettings):
     google_api_key: Optional[str] = os.getenv("GOOGLE_API_KEY")
     # Available models: gemini-pro (free), gemini-1.5-pro, gemini-1.5-flash, gemini-2.5-flash
     gemini_model: str = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+    # Send Gemini calls to a compatible server instead of Google (e.g. benchmarks/mock_llm_server.py)
+    gemini_base_url: Optional[str] = os.getenv("GEMINI_BASE_URL")
     
     # Embedding options (choose one):
     # Option 1: Local embeddings (FREE, no API needed) - DEFAULT & RECOMMENDED
@@ -23,6 +26,8 @@ class RAGConfig(BaseSettings):
     use_openai_embeddings: bool = os.getenv("USE_OPENAI_EMBEDDINGS", "false").lower() == "true"
     openai_api_key: Optional[str] = os.getenv("OPENAI_API_KEY")
     openai_embedding_model: str = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
+    # OpenAI-compatible embeddings server to use instead of api.openai.com, ending in /v1
+    openai_base_url: Optional[str] = os.getenv("OPENAI_BASE_URL")
     
     # Option 3: Gemini embeddings (requires PAID account, free tier has limit: 0)
     use_gemini_embeddings: bool = os.getenv("USE_GEMINI_EMBEDDINGS", "false").lower() == "true"
@@ -31,15 +36,115 @@ class RAGConfig(BaseSettings):
     # Vector database settings
     chroma_db_path: str = os.getenv("CHROMA_DB_PATH", "./chroma_db")
     collection_name: str = os.getenv("COLLECTION_NAME", "learn44_documents")
+    # One row per ingested document, so listing never scans the chunks
+    catalog_db_path: str = os.getenv("CATALOG_DB_PATH", "./document_catalog.db")
     
     # RAG settings
     chunk_size: int = int(os.getenv("CHUNK_SIZE", "1000"))
     chunk_overlap: int = int(os.getenv("CHUNK_OVERLAP", "200"))
     top_k_retrieval: int = int(os.getenv("TOP_K_RETRIEVAL", "5"))
+    # "dense" (vector search only) or "hybrid" (vector + BM25 keyword index, fused with RRF)
+    retrieval_mode: str = os.getenv("RETRIEVAL_MODE", "dense").lower()
+    lexical_index_path: str = os.getenv("LEXICAL_INDEX_PATH", "./lexical_index.db")
+    # Candidates taken from each retriever before fusion
+    hybrid_candidates: int = int(os.getenv("HYBRID_CANDIDATES", "20"))
+    hybrid_dense_weight: float = float(os.getenv("HYBRID_DENSE_WEIGHT", "1.0"))
+    hybrid_lexical_weight: float = float(os.getenv("HYBRID_LEXICAL_WEIGHT", "1.0"))
+    # RRF constant; larger values flatten the lead of the top ranks
+    rrf_k: int = int(os.getenv("RRF_K", "60"))
+    # Cross-encoder re-ranking: fetch rerank_candidates chunks, keep the best rerank_top_n
+    rerank_enabled: bool = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+    rerank_model: str = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    rerank_candidates: int = int(os.getenv("RERANK_CANDIDATES", "30"))
+    rerank_top_n: int = int(os.getenv("RERANK_TOP_N", "3"))
+    rerank_batch_size: int = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+    # Past this, the query falls back to the first top_k_retrieval chunks in retrieval order
+    rerank_budget_ms: float = float(os.getenv("RERANK_BUDGET_MS", "250"))
+    rerank_workers: int = int(os.getenv("RERANK_WORKERS", "1"))
+    
+    # Query concurrency
+    # Threads used for query encoding and Chroma lookups
+    query_thread_pool_size: int = int(os.getenv("QUERY_THREAD_POOL_SIZE", "8"))
+    # Maximum number of Gemini calls in flight per worker
+    max_concurrent_llm_calls: int = int(os.getenv("MAX_CONCURRENT_LLM_CALLS", "16"))
+    # Concurrent query embeddings are coalesced into one encode call
+    query_batch_window_ms: float = float(os.getenv("QUERY_BATCH_WINDOW_MS", "5"))
+    query_batch_max_size: int = int(os.getenv("QUERY_BATCH_MAX_SIZE", "32"))
+    # Cache of query embeddings keyed on normalized query text (0 disables)
+    query_cache_size: int = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+    query_cache_ttl_seconds: float = float(os.getenv("QUERY_CACHE_TTL_SECONDS", "3600"))
+    # Semantic answer cache in front of Gemini (0 size disables)
+    answer_cache_size: int = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+    answer_cache_similarity_threshold: float = float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.95"))
+    answer_cache_ttl_seconds: float = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400"))
+    
+    # Conversation history
+    # "memory" (per-process ring buffers) or "sqlite" (persistent, shared by workers)
+    conversation_store: str = os.getenv("CONVERSATION_STORE", "memory").lower()
+    conversation_db_path: str = os.getenv("CONVERSATION_DB_PATH", "./conversations.db")
+    # Messages kept per conversation (the prompt uses the last 3 exchanges)
+    conversation_history_messages: int = int(os.getenv("CONVERSATION_HISTORY_MESSAGES", "6"))
+    max_conversations: int = int(os.getenv("MAX_CONVERSATIONS", "10000"))
+    # SQLite store only: forget conversations idle this long (0 keeps them until evicted)
+    conversation_ttl_seconds: float = float(os.getenv("CONVERSATION_TTL_SECONDS", "0"))
+    
+    # The Analyst: chunks of an uploaded document sent with each question
+    analyst_top_k: int = int(os.getenv("ANALYST_TOP_K", "8"))
+    # Maximum number of Analyst Gemini calls in flight per worker
+    max_concurrent_analyst_calls: int = int(os.getenv("MAX_CONCURRENT_ANALYST_CALLS", "8"))
+    # Session documents expire after this long; a background sweeper removes them
+    analyst_ttl_hours: float = float(os.getenv("ANALYST_TTL_HOURS", "24"))
+    analyst_sweep_interval_seconds: float = float(os.getenv("ANALYST_SWEEP_INTERVAL_SECONDS", "300"))
+    # Indexes beyond the memory budget (or larger than the spill threshold) go to compressed files
+    analyst_memory_budget_mb: int = int(os.getenv("ANALYST_MEMORY_BUDGET_MB", "256"))
+    analyst_spill_threshold_mb: int = int(os.getenv("ANALYST_SPILL_THRESHOLD_MB", "32"))
+    analyst_disk_budget_mb: int = int(os.getenv("ANALYST_DISK_BUDGET_MB", "2048"))
+    analyst_spill_dir: str = os.getenv(
+        "ANALYST_SPILL_DIR", os.path.join(tempfile.gettempdir(), "learn44_analyst")
+    )
     
     # Document processing
     documents_path: str = os.getenv("DOCUMENTS_PATH", "./documents")
     max_file_size_mb: int = int(os.getenv("MAX_FILE_SIZE_MB", "50"))
+    # Uploads are copied to disk in blocks of this size
+    upload_block_size_kb: int = int(os.getenv("UPLOAD_BLOCK_SIZE_KB", "1024"))
+    
+    # Persistent cache of chunk embeddings keyed by (model, chunk hash)
+    embedding_cache_enabled: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    embedding_cache_path: str = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache.db")
+    embedding_cache_max_entries: int = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+    # "float32" or "float16" (half the disk, slightly lossy)
+    embedding_cache_dtype: str = os.getenv("EMBEDDING_CACHE_DTYPE", "float32")
+    
+    # Text extraction runs in a process pool so parsing never blocks the event loop
+    extract_workers: int = int(os.getenv("EXTRACT_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+    extract_timeout_seconds: int = int(os.getenv("EXTRACT_TIMEOUT_SECONDS", "300"))
+    # PDFs are read in page ranges of this size, several ranges in parallel
+    pdf_pages_per_task: int = int(os.getenv("PDF_PAGES_PER_TASK", "32"))
+    
+    # Batch ingestion pipeline: workers per stage and queue depth between stages
+    ingest_save_workers: int = int(os.getenv("INGEST_SAVE_WORKERS", "4"))
+    ingest_embed_workers: int = int(os.getenv("INGEST_EMBED_WORKERS", "1"))
+    ingest_write_workers: int = int(os.getenv("INGEST_WRITE_WORKERS", "1"))
+    # Chunks (possibly from several files) embedded per model call
+    ingest_embed_batch_size: int = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "256"))
+    ingest_queue_size: int = int(os.getenv("INGEST_QUEUE_SIZE", "16"))
+    
+    # Background ingestion jobs for /api/documents/upload, persisted in SQLite
+    job_db_path: str = os.getenv("JOB_DB_PATH", "./ingestion_jobs.db")
+    # Each queued upload is kept in its own directory here until it is ingested
+    job_files_path: str = os.getenv("JOB_FILES_PATH", "./ingestion_job_files")
+    ingest_job_workers: int = int(os.getenv("INGEST_JOB_WORKERS", "2"))
+    # A running job with no heartbeat for this long is assumed dead and retried
+    ingest_job_stale_seconds: int = int(os.getenv("INGEST_JOB_STALE_SECONDS", "120"))
+    
+    # Bulk deletes remove chunks this many at a time (IDs only, never documents)
+    delete_batch_size: int = int(os.getenv("DELETE_BATCH_SIZE", "2000"))
+    # Deletes of more chunks than this run as background jobs instead of in the request
+    delete_inline_max_chunks: int = int(os.getenv("DELETE_INLINE_MAX_CHUNKS", "5000"))
+    
+    # Per-stage timing histograms and counters, served on /metrics
+    metrics_enabled: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,263 @@
+"""
+Conversation history stores
+
+Only the last few messages of a conversation ever reach the prompt, so stores
+keep a bounded window per conversation. The in-memory store is the default;
+the SQLite store survives restarts and can be shared by several workers.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Tuple
+
+from llm_rag.config import config
+
+# (role, content) where role is "user" or "assistant"
+Message = Tuple[str, str]
+
+# The SQLite store prunes old conversations once per this many writes
+PRUNE_EVERY = 100
+
+
+class ConversationStore:
+    """Interface for conversation history backends"""
+    
+    def get_history(self, conversation_id: str) -> List[Message]:
+        """Return the most recent messages of a conversation, oldest first"""
+        raise NotImplementedError
+    
+    def append_exchange(self, conversation_id: str, user_message: str, ai_message: str):
+        """Record one question/answer exchange"""
+        raise NotImplementedError
+    
+    def clear(self, conversation_id: str):
+        """Forget a conversation"""
+        raise NotImplementedError
+    
+    def stats(self) -> Dict:
+        """Size information for monitoring"""
+        raise NotImplementedError
+
+
+class InMemoryConversationStore(ConversationStore):
+    """
+    Ring buffer of recent messages per conversation, LRU across conversations
+    
+    Memory is bounded by max_conversations * max_messages messages.
+    """
+    
+    def __init__(self, max_messages: int = 6, max_conversations: int = 10000):
+        self.max_messages = max_messages
+        self.max_conversations = max_conversations
+        self._conversations: "OrderedDict[str, Deque[Message]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+    
+    def get_history(self, conversation_id: str) -> List[Message]:
+        with self._lock:
+            messages = self._conversations.get(conversation_id)
+            if messages is None:
+                return []
+            self._conversations.move_to_end(conversation_id)
+            return list(messages)
+    
+    def append_exchange(self, conversation_id: str, user_message: str, ai_message: str):
+        with self._lock:
+            messages = self._conversations.get(conversation_id)
+            if messages is None:
+                messages = deque(maxlen=self.max_messages)
+                self._conversations[conversation_id] = messages
+            messages.append(("user", user_message))
+            messages.append(("assistant", ai_message))
+            self._conversations.move_to_end(conversation_id)
+            while len(self._conversations) > self.max_conversations:
+                self._conversations.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self, conversation_id: str):
+        with self._lock:
+            self._conversations.pop(conversation_id, None)
+    
+    def stats(self) -> Dict:
+        return {
+            "backend": "memory",
+            "conversations": len(self._conversations),
+            "max_conversations": self.max_conversations,
+            "max_messages": self.max_messages,
+            "evictions": self.evictions
+        }
+
+
+class SQLiteConversationStore(ConversationStore):
+    """
+    Conversation history in a SQLite database
+    
+    WAL mode lets several uvicorn workers read and write the same file, so a
+    conversation can continue on any worker and survives restarts. Each
+    conversation is trimmed to its last max_messages on write, and every
+    prune_every writes the least recently active conversations past
+    max_conversations (and any idle longer than ttl_seconds) are dropped.
+    """
+    
+    def __init__(
+        self,
+        db_path: str,
+        max_messages: int = 6,
+        max_conversations: int = 10000,
+        ttl_seconds: float = 0,
+        prune_every: int = PRUNE_EVERY
+    ):
+        self.db_path = db_path
+        self.max_messages = max_messages
+        self.max_conversations = max_conversations
+        self.ttl_seconds = ttl_seconds
+        self.prune_every = max(1, prune_every)
+        self.evictions = 0
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS conversation_messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    conversation_id TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_conversation_messages
+                ON conversation_messages (conversation_id, id)
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_conversation_messages_created
+                ON conversation_messages (created_at)
+            """)
+    
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; sqlite3 connections are not thread-safe"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def get_history(self, conversation_id: str) -> List[Message]:
+        rows = self._connection().execute(
+            """
+            SELECT role, content FROM conversation_messages
+            WHERE conversation_id = ?
+            ORDER BY id DESC LIMIT ?
+            """,
+            (conversation_id, self.max_messages)
+        ).fetchall()
+        return [(role, content) for role, content in reversed(rows)]
+    
+    def append_exchange(self, conversation_id: str, user_message: str, ai_message: str):
+        now = time.time()
+        with self._connection() as conn:
+            conn.executemany(
+                """
+                INSERT INTO conversation_messages (conversation_id, role, content, created_at)
+                VALUES (?, ?, ?, ?)
+                """,
+                [
+                    (conversation_id, "user", user_message, now),
+                    (conversation_id, "assistant", ai_message, now)
+                ]
+            )
+            # Keep only the window the prompt can use
+            conn.execute(
+                """
+                DELETE FROM conversation_messages
+                WHERE conversation_id = ? AND id NOT IN (
+                    SELECT id FROM conversation_messages
+                    WHERE conversation_id = ?
+                    ORDER BY id DESC LIMIT ?
+                )
+                """,
+                (conversation_id, conversation_id, self.max_messages)
+            )
+            with self._writes_lock:
+                self._writes += 1
+                prune = self._writes % self.prune_every == 0
+            if prune:
+                self._prune(conn, now)
+    
+    def _prune(self, conn: sqlite3.Connection, now: float):
+        """Drop whole conversations idle past the TTL or beyond max_conversations, oldest first"""
+        expired: List[str] = []
+        if self.ttl_seconds > 0:
+            cutoff = now - self.ttl_seconds
+            expired = [row[0] for row in conn.execute(
+                """
+                SELECT conversation_id FROM conversation_messages WHERE created_at < ?
+                EXCEPT
+                SELECT conversation_id FROM conversation_messages WHERE created_at >= ?
+                """,
+                (cutoff, cutoff)
+            )]
+        evicted = [row[0] for row in conn.execute(
+            """
+            SELECT conversation_id FROM conversation_messages
+            GROUP BY conversation_id
+            ORDER BY MAX(created_at) DESC, MAX(id) DESC
+            LIMIT -1 OFFSET ?
+            """,
+            (self.max_conversations,)
+        )]
+        stale = set(expired) | set(evicted)
+        if not stale:
+            return
+        conn.executemany(
+            "DELETE FROM conversation_messages WHERE conversation_id = ?",
+            [(conversation_id,) for conversation_id in stale]
+        )
+        with self._writes_lock:
+            self.evictions += len(stale)
+    
+    def clear(self, conversation_id: str):
+        with self._connection() as conn:
+            conn.execute(
+                "DELETE FROM conversation_messages WHERE conversation_id = ?",
+                (conversation_id,)
+            )
+    
+    def stats(self) -> Dict:
+        conversations, messages = self._connection().execute(
+            "SELECT COUNT(DISTINCT conversation_id), COUNT(*) FROM conversation_messages"
+        ).fetchone()
+        return {
+            "backend": "sqlite",
+            "conversations": conversations,
+            "messages": messages,
+            "max_conversations": self.max_conversations,
+            "max_messages": self.max_messages,
+            "evictions": self.evictions,
+            "db_path": self.db_path
+        }
+
+
+def create_conversation_store() -> ConversationStore:
+    """Build the conversation store selected in RAGConfig"""
+    if config.conversation_store == "sqlite":
+        print(f"💬 Using SQLite conversation store: {config.conversation_db_path}")
+        return SQLiteConversationStore(
+            config.conversation_db_path,
+            max_messages=config.conversation_history_messages,
+            max_conversations=config.max_conversations,
+            ttl_seconds=config.conversation_ttl_seconds
+        )
+    return InMemoryConversationStore(
+        max_messages=config.conversation_history_messages,
+        max_conversations=config.max_conversations
+    )
@@ -0,0 +1,191 @@
+"""
+Per-document catalog
+
+Listing documents used to pull every chunk out of Chroma and group them by
+source on each request. The catalog keeps one row per (source, category)
+with its chunk count, size, content hash and ingest times, written when a
+document is ingested or deleted, so list, detail and stats requests are a
+single indexed query however many chunks are stored. Like the other SQLite
+stores it is shared by all uvicorn workers through WAL mode.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+_COLUMNS = "source, category, chunk_count, size_bytes, sha256, ingested_at, updated_at"
+
+
+class DocumentCatalog:
+    """
+    (source, category) -> chunk count, size, hash and ingest times
+    
+    Methods are synchronous; call them from a thread when on the event loop.
+    """
+    
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    source TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    chunk_count INTEGER NOT NULL,
+                    size_bytes INTEGER,
+                    sha256 TEXT,
+                    ingested_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (source, category)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_category ON documents (category, source)")
+            # Bumped whenever the Chroma collection is dropped and recreated
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS collection_state (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    generation INTEGER NOT NULL
+                )
+            """)
+            conn.execute("INSERT OR IGNORE INTO collection_state (id, generation) VALUES (1, 0)")
+    
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; sqlite3 connections are not thread-safe"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+    
+    def upsert(
+        self,
+        source: str,
+        category: str,
+        chunk_count: int,
+        size_bytes: Optional[int] = None,
+        sha256: Optional[str] = None
+    ):
+        """Record a (re-)ingested document; ingested_at keeps the first ingest time"""
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                f"""
+                INSERT INTO documents ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (source, category) DO UPDATE SET
+                    chunk_count = excluded.chunk_count,
+                    size_bytes = excluded.size_bytes,
+                    sha256 = excluded.sha256,
+                    updated_at = excluded.updated_at
+                """,
+                (source, category, chunk_count, size_bytes, sha256, now, now)
+            )
+    
+    def remove(self, source: Optional[str] = None, category: Optional[str] = None) -> int:
+        """Forget documents matching source and/or category (both None removes everything)"""
+        clauses, params = self._filter(source, category)
+        with self._connection() as conn:
+            return conn.execute(f"DELETE FROM documents {clauses}", params).rowcount
+    
+    def get(self, source: str) -> List[Dict]:
+        """Every category the source is stored under"""
+        rows = self._connection().execute(
+            f"SELECT {_COLUMNS} FROM documents WHERE source = ? ORDER BY category", (source,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+    
+    def list(self, category: Optional[str] = None, offset: int = 0, limit: int = 100) -> Tuple[List[Dict], int]:
+        """
+        One page of documents ordered by source
+        
+        Returns:
+            (documents, total number of documents matching the filter)
+        """
+        clauses, params = self._filter(None, category)
+        conn = self._connection()
+        rows = conn.execute(
+            f"SELECT {_COLUMNS} FROM documents {clauses} ORDER BY source, category LIMIT ? OFFSET ?",
+            (*params, limit, offset)
+        ).fetchall()
+        (total,) = conn.execute(f"SELECT COUNT(*) FROM documents {clauses}", params).fetchone()
+        return [dict(row) for row in rows], total
+    
+    def stats(self) -> Dict:
+        conn = self._connection()
+        documents, chunks, size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(chunk_count), 0), COALESCE(SUM(size_bytes), 0) FROM documents"
+        ).fetchone()
+        categories = {
+            category: {"documents": count, "chunks": category_chunks}
+            for category, count, category_chunks in conn.execute(
+                "SELECT category, COUNT(*), SUM(chunk_count) FROM documents GROUP BY category ORDER BY category"
+            )
+        }
+        return {
+            "total_documents": documents,
+            "total_chunks": chunks,
+            "total_bytes": size,
+            "categories": categories
+        }
+    
+    def collection_generation(self) -> int:
+        """How many times the collection has been recreated; lets other processes notice"""
+        return self._connection().execute("SELECT generation FROM collection_state WHERE id = 1").fetchone()[0]
+    
+    def bump_collection_generation(self) -> int:
+        with self._connection() as conn:
+            conn.execute("UPDATE collection_state SET generation = generation + 1 WHERE id = 1")
+        return self.collection_generation()
+    
+    def is_empty(self) -> bool:
+        return self._connection().execute("SELECT 1 FROM documents LIMIT 1").fetchone() is None
+    
+    def rebuild_from(self, collection, batch_size: int = 5000) -> int:
+        """
+        Fill the catalog from chunk metadata in a Chroma collection
+        
+        Reads metadata only, a page at a time. Run once when the catalog is
+        introduced on an existing collection; sizes are unknown for documents
+        recorded this way.
+        """
+        documents: Dict[Tuple[str, str], Dict] = {}
+        offset = 0
+        while True:
+            page = collection.get(include=["metadatas"], limit=batch_size, offset=offset)
+            metadatas = page.get('metadatas') or []
+            if not metadatas:
+                break
+            for metadata in metadatas:
+                key = (metadata.get('source', 'unknown'), metadata.get('category', 'general'))
+                entry = documents.setdefault(key, {"chunks": 0, "sha256": metadata.get('file_hash')})
+                entry["chunks"] += 1
+            offset += len(metadatas)
+        
+        now = time.time()
+        with self._connection() as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO documents ({_COLUMNS}) VALUES (?, ?, ?, NULL, ?, ?, ?)",
+                [
+                    (source, category, entry["chunks"], entry["sha256"], now, now)
+                    for (source, category), entry in documents.items()
+                ]
+            )
+        return len(documents)
+    
+    @staticmethod
+    def _filter(source: Optional[str], category: Optional[str]) -> Tuple[str, tuple]:
+        conditions, params = [], []
+        if source is not None:
+            conditions.append("source = ?")
+            params.append(source)
+        if category is not None:
+            conditions.append("category = ?")
+            params.append(category)
+        return ("WHERE " + " AND ".join(conditions)) if conditions else "", tuple(params)
@@ -2,22 +2,24 @@
 Document processing module for ingesting various document types
 """
 
+import asyncio
 import os
-import aiofiles
-from typing import List, Dict, Optional
+import time
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, Optional, Tuple
 from fastapi import UploadFile
-import PyPDF2
-import docx
-from markdown import markdown
-from bs4 import BeautifulSoup
-import chromadb
-from chromadb.config import Settings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_openai import OpenAIEmbeddings
-from sentence_transformers import SentenceTransformer  # Local embeddings (FREE)
 
+from llm_rag import extraction, metrics
+from llm_rag.chunking import PageChunker, Record, content_hash
 from llm_rag.config import config
+from llm_rag.embedding_cache import EmbeddingStats, create_embedding_cache
+from llm_rag.embeddings import get_embedding_service
+from llm_rag.metrics import stage_timer
+from llm_rag.uploads import SavedUpload, save_upload
+
+# Awaited with (stage, chunks_done) while a saved file is ingested
+ProgressCallback = Callable[[str, int], Awaitable[None]]
 
 
 class DocumentProcessor:
@@ -25,146 +27,334 @@ class DocumentProcessor:
     
     def __init__(self):
         """Initialize document processor"""
-        self.chroma_client = chromadb.PersistentClient(
-            path=config.chroma_db_path,
-            settings=Settings(anonymized_telemetry=False)
-        )
-        self.collection = self.chroma_client.get_or_create_collection(
-            name=config.collection_name,
-            metadata={"hnsw:space": "cosine"}
-        )
-        # Initialize embeddings (priority: local > OpenAI > Gemini)
-        if config.use_local_embeddings:
-            # Use local embeddings (FREE, no API needed)
-            print(f"📦 Loading local embedding model: {config.local_embedding_model}")
-            self.embeddings = SentenceTransformer(config.local_embedding_model)
-            self.embedding_type = "local"
-            print("✅ Using local embeddings (free, no API calls)")
-        elif config.use_openai_embeddings and config.openai_api_key:
-            # Use OpenAI embeddings (requires API key, very cheap)
-            self.embeddings = OpenAIEmbeddings(
-                model=config.openai_embedding_model,
-                openai_api_key=config.openai_api_key
-            )
-            self.embedding_type = "openai"
-            print("✅ Using OpenAI embeddings")
-        elif config.use_gemini_embeddings and config.google_api_key:
-            # Use Gemini embeddings (requires PAID account)
-            self.embeddings = GoogleGenerativeAIEmbeddings(
-                model=config.embedding_model,
-                google_api_key=config.google_api_key
-            )
-            self.embedding_type = "gemini"
-            print("✅ Using Gemini embeddings")
-        else:
-            # Default to local if nothing specified
-            print("⚠️  No embedding provider specified, defaulting to local embeddings")
-            self.embeddings = SentenceTransformer(config.local_embedding_model)
-            self.embedding_type = "local"
+        # Embedding model and Chroma collection are shared with RAGPipeline
+        self.embedding_service = get_embedding_service()
+        self.catalog = self.embedding_service.catalog
+        # Chunks already embedded by this model (in any document) are reused
+        self.embedding_cache = create_embedding_cache()
+        # Running average cost of embedding one chunk, to estimate time saved
+        self._seconds_per_chunk = 0.0
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=config.chunk_size,
             chunk_overlap=config.chunk_overlap,
             length_function=len,
         )
+        # Parsing is CPU-bound, so it runs in worker processes
+        self.extract_executor = extraction.create_extraction_pool(config.extract_workers)
         
         # Ensure documents directory exists
         os.makedirs(config.documents_path, exist_ok=True)
     
-    async def _save_file(self, file: UploadFile) -> str:
-        """Save uploaded file to disk"""
-        file_path = os.path.join(config.documents_path, file.filename)
-        async with aiofiles.open(file_path, 'wb') as f:
-            content = await file.read()
-            await f.write(content)
-        return file_path
-    
-    async def _extract_text_pdf(self, file_path: str) -> str:
-        """Extract text from PDF file"""
-        text = ""
-        with open(file_path, 'rb') as f:
-            pdf_reader = PyPDF2.PdfReader(f)
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-        return text
+    @property
+    def collection(self):
+        # Looked up on each use: a full wipe replaces the collection
+        return self.embedding_service.collection
     
-    async def _extract_text_docx(self, file_path: str) -> str:
-        """Extract text from DOCX file"""
-        doc = docx.Document(file_path)
-        text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-        return text
+    async def _save_file(self, file: UploadFile, directory: Optional[str] = None) -> SavedUpload:
+        """Stream uploaded file to disk (documents_path by default), enforcing max_file_size_mb"""
+        file_path = os.path.join(directory or config.documents_path, file.filename)
+        with stage_timer("ingest", "save"):
+            return await save_upload(file, file_path)
     
-    async def _extract_text_markdown(self, file_path: str) -> str:
-        """Extract text from Markdown file"""
-        async with aiofiles.open(file_path, 'r', encoding='utf-8') as f:
-            content = await f.read()
-        # Convert markdown to HTML then extract text
-        html = markdown(content)
-        soup = BeautifulSoup(html, 'lxml')
-        return soup.get_text()
+    def shutdown(self):
+        """Stop the extraction pool"""
+        self.extract_executor.shutdown(wait=False, cancel_futures=True)
     
-    async def _extract_text_txt(self, file_path: str) -> str:
-        """Extract text from plain text file"""
-        async with aiofiles.open(file_path, 'r', encoding='utf-8') as f:
-            return await f.read()
+    async def iter_pages(self, file_path: str, file_type: str) -> AsyncIterator[Tuple[Optional[int], str]]:
+        """
+        Yield (page_number, text) in page order, extracted in the pool
+        
+        PDFs are read in ranges of pdf_pages_per_task pages with at most
+        extract_workers ranges in flight, so only a few ranges are held in
+        memory however long the file is. Other formats yield their whole text
+        once with no page number. Raises ExtractionTimeout when the file takes
+        longer than extract_timeout_seconds.
+        """
+        loop = asyncio.get_running_loop()
+        timeout = config.extract_timeout_seconds
+        deadline = loop.time() + timeout if timeout > 0 else None
+        
+        def submit(fn, *args) -> asyncio.Future:
+            return loop.run_in_executor(
+                self.extract_executor, extraction.run_with_deadline, timeout, fn, *args
+            )
+        
+        async def result(future: asyncio.Future):
+            remaining = None if deadline is None else max(0, deadline - loop.time())
+            try:
+                return await asyncio.wait_for(future, timeout=remaining)
+            except asyncio.TimeoutError:
+                raise extraction.ExtractionTimeout(
+                    f"Extraction of {os.path.basename(file_path)} exceeded {timeout}s"
+                )
+        
+        if not extraction.is_pdf(file_path, file_type):
+            yield None, await result(submit(extraction.extract_text, file_path, file_type))
+            return
+        
+        page_count = await result(submit(extraction.pdf_page_count, file_path))
+        step = config.pdf_pages_per_task
+        ranges = deque((start, min(start + step, page_count)) for start in range(0, page_count, step))
+        in_flight = deque()
+        try:
+            while ranges or in_flight:
+                while ranges and len(in_flight) < config.extract_workers:
+                    start, stop = ranges.popleft()
+                    in_flight.append((start, submit(extraction.extract_pdf_pages, file_path, start, stop)))
+                start, future = in_flight.popleft()
+                for offset, text in enumerate(await result(future)):
+                    yield start + offset + 1, text
+        finally:
+            for _, future in in_flight:
+                future.cancel()
     
     async def extract_text(self, file_path: str, file_type: str) -> str:
-        """Extract text from various file types"""
-        file_type_lower = file_type.lower()
+        """Extract the full text of a document in the extraction pool"""
+        return "".join([
+            text if page is None else text + "\n"
+            async for page, text in self.iter_pages(file_path, file_type)
+        ])
+    
+    def _new_chunker(self) -> PageChunker:
+        return PageChunker(self.text_splitter, config.chunk_size, config.chunk_overlap)
+    
+    async def iter_chunks(self, file_path: str, file_type: str, batch_size: int) -> AsyncIterator[List[Record]]:
+        """
+        Yield batches of (chunk, page metadata) records as pages are extracted
         
-        if file_type_lower == 'application/pdf' or file_path.endswith('.pdf'):
-            return await self._extract_text_pdf(file_path)
-        elif file_type_lower == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document' or file_path.endswith('.docx'):
-            return await self._extract_text_docx(file_path)
-        elif file_type_lower == 'text/markdown' or file_path.endswith('.md'):
-            return await self._extract_text_markdown(file_path)
-        elif file_type_lower.startswith('text/') or file_path.endswith('.txt'):
-            return await self._extract_text_txt(file_path)
-        else:
-            raise ValueError(f"Unsupported file type: {file_type}")
+        Chunks stay within chunk_size and overlap carries across page
+        boundaries, but only a window of text is held. Boundaries near a
+        window edge can differ from splitting the whole text at once.
+        """
+        chunker = self._new_chunker()
+        batch: List[Record] = []
+        async for page, text in self.iter_pages(file_path, file_type):
+            batch.extend(await asyncio.to_thread(chunker.feed, text, page))
+            while len(batch) >= batch_size:
+                yield batch[:batch_size]
+                batch = batch[batch_size:]
+        batch.extend(await asyncio.to_thread(chunker.flush))
+        while batch:
+            yield batch[:batch_size]
+            batch = batch[batch_size:]
+    
+    def _cached_embeddings(self, texts: List[str]) -> Tuple[List[str], Dict[str, List[float]]]:
+        """Chunk hashes and whatever vectors the embedding cache already has"""
+        hashes = [content_hash(text) for text in texts]
+        if self.embedding_cache is None:
+            return hashes, {}
+        return hashes, self.embedding_cache.get_many(self.embedding_service.model_name, hashes)
+    
+    @staticmethod
+    def _missing_positions(hashes: List[str], cached: Dict[str, List[float]]) -> List[int]:
+        """First position of each chunk that still needs embedding; repeats embed once"""
+        seen = set(cached)
+        missing = []
+        for i, digest in enumerate(hashes):
+            if digest not in seen:
+                seen.add(digest)
+                missing.append(i)
+        return missing
     
-    async def _create_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Create embeddings for text chunks"""
-        import asyncio
-        from functools import partial
+    def _record_embedding(
+        self,
+        hashes: List[str],
+        cached: Dict[str, List[float]],
+        missing: List[int],
+        fresh: List[List[float]],
+        seconds: float,
+        stats: Optional[EmbeddingStats]
+    ) -> List[List[float]]:
+        """Store fresh vectors, update stats and return vectors in input order"""
+        vectors = dict(cached)
+        vectors.update({hashes[i]: vector for i, vector in zip(missing, fresh)})
+        if self.embedding_cache is not None and fresh:
+            self.embedding_cache.put_many(
+                self.embedding_service.model_name,
+                {hashes[i]: vector for i, vector in zip(missing, fresh)}
+            )
         
+        if missing:
+            per_chunk = seconds / len(missing)
+            self._seconds_per_chunk = per_chunk if not self._seconds_per_chunk else (
+                0.8 * self._seconds_per_chunk + 0.2 * per_chunk
+            )
+        metrics.CACHE_REQUESTS.inc("embedding", "hit", amount=len(hashes) - len(missing))
+        metrics.CACHE_REQUESTS.inc("embedding", "miss", amount=len(missing))
+        if stats is not None:
+            hits = len(hashes) - len(missing)
+            stats.chunks += len(hashes)
+            stats.cache_hits += hits
+            stats.embedded += len(missing)
+            stats.embed_seconds += seconds
+            stats.seconds_saved += hits * self._seconds_per_chunk
+        return [vectors[digest] for digest in hashes]
+    
+    async def _create_embeddings(
+        self,
+        texts: List[str],
+        stats: Optional[EmbeddingStats] = None
+    ) -> List[List[float]]:
+        """Create embeddings for text chunks, reusing cached vectors"""
         try:
-            # Handle local embeddings (sentence-transformers)
-            if self.embedding_type == "local":
-                # Local embeddings are synchronous, run in executor
-                loop = asyncio.get_event_loop()
-                embed_func = partial(self.embeddings.encode, texts, convert_to_numpy=False)
-                embeddings = await loop.run_in_executor(None, embed_func)
-                # Convert to list of lists
-                return [emb.tolist() if hasattr(emb, 'tolist') else list(emb) for emb in embeddings]
-            
-            # Handle API-based embeddings (OpenAI or Gemini)
-            # Check if embeddings object has async method
-            if hasattr(self.embeddings, 'aembed_documents'):
-                try:
-                    return await self.embeddings.aembed_documents(texts)
-                except (AttributeError, NotImplementedError, TypeError):
-                    # Fall back to sync if async not supported
-                    pass
+            hashes, cached = await asyncio.to_thread(self._cached_embeddings, texts)
+            missing = self._missing_positions(hashes, cached)
             
-            # Use sync embedding (works for both Gemini and OpenAI)
-            # Run in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
-            embed_func = partial(self.embeddings.embed_documents, texts)
-            return await loop.run_in_executor(None, embed_func)
+            start = time.perf_counter()
+            fresh = await self.embedding_service.aembed_documents([texts[i] for i in missing]) if missing else []
+            seconds = time.perf_counter() - start
             
+            return await asyncio.to_thread(
+                self._record_embedding, hashes, cached, missing, fresh, seconds, stats
+            )
         except Exception as e:
             import traceback
             print(f"❌ Error in _create_embeddings: {str(e)}")
             print(traceback.format_exc())
-            # Final fallback - try sync directly
-            try:
-                if self.embedding_type == "local":
-                    embeddings = self.embeddings.encode(texts, convert_to_numpy=False)
-                    return [emb.tolist() if hasattr(emb, 'tolist') else list(emb) for emb in embeddings]
-                else:
-                    return self.embeddings.embed_documents(texts)
-            except Exception as e2:
-                raise Exception(f"Failed to create embeddings: {str(e2)}")
+            raise Exception(f"Failed to create embeddings: {str(e)}")
+    
+    def _create_embeddings_sync(
+        self,
+        texts: List[str],
+        stats: Optional[EmbeddingStats] = None
+    ) -> List[List[float]]:
+        """Synchronous _create_embeddings for ingest_text_directly"""
+        hashes, cached = self._cached_embeddings(texts)
+        missing = self._missing_positions(hashes, cached)
+        start = time.perf_counter()
+        fresh = self.embedding_service.embed_documents([texts[i] for i in missing]) if missing else []
+        return self._record_embedding(hashes, cached, missing, fresh, time.perf_counter() - start, stats)
+    
+    @staticmethod
+    def _log_embedding_stats(name: str, stats: EmbeddingStats):
+        if stats.chunks:
+            summary = stats.as_dict()
+            print(
+                f"🧮 {name}: {summary['cache_hits']}/{summary['chunks']} embeddings from cache "
+                f"({summary['hit_rate']:.0%}), {summary['embed_seconds']:.2f}s embedding, "
+                f"~{summary['seconds_saved']:.2f}s saved"
+            )
+    
+    def _existing_chunks(self, source_name: str, category: str) -> Dict[str, Dict]:
+        """IDs and metadata of the chunks already stored for a document"""
+        results = self.collection.get(
+            where={"$and": [{"source": source_name}, {"category": category}]},
+            include=["metadatas"]
+        )
+        return dict(zip(results.get('ids', []), results.get('metadatas') or []))
+    
+    @staticmethod
+    def _is_unchanged(existing: Dict[str, Dict], file_hash: Optional[str]) -> bool:
+        """True if every chunk of a complete ingest came from a file with this hash"""
+        return bool(existing) and file_hash is not None and all(
+            metadata.get("file_hash") == file_hash and metadata.get("total_chunks") == len(existing)
+            for metadata in existing.values()
+        )
+    
+    def _build_records(
+        self,
+        source_name: str,
+        category: str,
+        chunks: List[str],
+        start_index: int = 0,
+        chunk_metadata: Optional[List[Dict]] = None,
+        file_hash: Optional[str] = None,
+        occurrences: Optional[Dict[str, int]] = None,
+        total_chunks: Optional[int] = None
+    ) -> Tuple[List[str], List[Dict]]:
+        """
+        Chunk IDs and metadata for a run of a document's chunks
+        
+        IDs come from the chunk's content hash, so an unchanged chunk keeps its
+        ID, and its stored embedding, when the document is re-ingested. Pass
+        the same `occurrences` dict for every batch of one document so repeated
+        text gets distinct IDs. total_chunks (by default the count so far) is
+        provisional until _finish_document.
+        """
+        occurrences = {} if occurrences is None else occurrences
+        ids, metadata_list = [], []
+        for i, chunk in enumerate(chunks):
+            digest = content_hash(chunk)
+            seen = occurrences.get(digest, 0)
+            occurrences[digest] = seen + 1
+            ids.append(f"{source_name}_{category}_{digest[:16]}" + (f"_{seen}" if seen else ""))
+            
+            metadata = {
+                "source": source_name,
+                "category": category,
+                "chunk_index": start_index + i,
+                "total_chunks": start_index + len(chunks) if total_chunks is None else total_chunks,
+                "content_hash": digest
+            }
+            if file_hash:
+                metadata["file_hash"] = file_hash
+            if chunk_metadata:
+                metadata.update(chunk_metadata[i])
+            metadata_list.append(metadata)
+        return ids, metadata_list
+    
+    def _finish_document(
+        self,
+        ids: List[str],
+        metadata_list: List[Dict],
+        existing: Dict[str, Dict],
+        added: Dict[str, Dict],
+        source_name: str,
+        category: str,
+        size_bytes: Optional[int] = None,
+        file_hash: Optional[str] = None
+    ) -> Dict:
+        """
+        Reconcile a (re-)ingested document with what was stored before
+        
+        Sets the final total_chunks, refreshes the metadata of kept chunks whose
+        position or page moved, deletes chunks no longer in the document and
+        records the document in the catalog.
+        
+        Args:
+            ids: Every chunk ID of the new version, in order
+            metadata_list: Matching metadata
+            existing: Chunks stored before this ingest (from _existing_chunks)
+            added: Metadata as written for the chunks this ingest added, by ID
+            source_name, category: The document
+            size_bytes, file_hash: Size and SHA-256 of the source file, for the catalog
+        
+        Returns:
+            Counts of added, unchanged and removed chunks
+        """
+        total = len(ids)
+        update_ids, update_metadatas = [], []
+        for chunk_id, metadata in zip(ids, metadata_list):
+            metadata["total_chunks"] = total
+            if added.get(chunk_id, existing.get(chunk_id)) != metadata:
+                update_ids.append(chunk_id)
+                update_metadatas.append(metadata)
+        
+        batch_size = config.ingest_embed_batch_size
+        for start in range(0, len(update_ids), batch_size):
+            self.collection.update(
+                ids=update_ids[start:start + batch_size],
+                metadatas=update_metadatas[start:start + batch_size]
+            )
+        
+        current = set(ids)
+        removed = [chunk_id for chunk_id in existing if chunk_id not in current]
+        for start in range(0, len(removed), batch_size):
+            self.embedding_service.delete_chunks(removed[start:start + batch_size])
+        
+        if total:
+            self.catalog.upsert(source_name, category, total, size_bytes=size_bytes, sha256=file_hash)
+        else:
+            self.catalog.remove(source_name, category)
+        
+        metrics.CHUNKS_INGESTED.inc("added", amount=len(added))
+        metrics.CHUNKS_INGESTED.inc("unchanged", amount=total - len(added))
+        metrics.CHUNKS_INGESTED.inc("removed", amount=len(removed))
+        return {
+            "chunks_added": len(added),
+            "chunks_unchanged": total - len(added),
+            "chunks_removed": len(removed)
+        }
     
     async def process_and_ingest(
         self,
@@ -181,76 +371,181 @@ class DocumentProcessor:
         Returns:
             Dictionary with processing results
         """
-        # Save file
-        file_path = await self._save_file(file)
+        # Save file (raises FileTooLarge before anything is ingested)
+        saved = await self._save_file(file)
+        return await self.ingest_saved_file(saved, file.filename, file.content_type or "", category)
+    
+    async def ingest_saved_file(
+        self,
+        saved: SavedUpload,
+        filename: str,
+        content_type: str = "",
+        category: str = "general",
+        progress: Optional[ProgressCallback] = None
+    ) -> Dict:
+        """
+        Ingest a document that is already on disk
+        
+        Pages are extracted, chunked, embedded and written in batches as they
+        arrive, so memory stays roughly constant however large the file is.
+        Re-uploading a document only embeds chunks that are new; chunks that
+        disappeared are deleted, and a byte-identical file is skipped.
+        
+        Args:
+            saved: The saved upload (path, size and SHA-256)
+            filename: Source name stored with the chunks
+            content_type: MIME type reported by the client
+            category: Document category
+            progress: Awaited with (stage, chunks_done) as the ingest advances
+        
+        Returns:
+            Dictionary with processing results
+        """
+        with stage_timer("ingest", "total"):
+            return await self._ingest_saved_file(saved, filename, content_type, category, progress)
+    
+    async def _ingest_saved_file(
+        self,
+        saved: SavedUpload,
+        filename: str,
+        content_type: str,
+        category: str,
+        progress: Optional[ProgressCallback]
+    ) -> Dict:
+        """Body of ingest_saved_file, which times the whole ingest"""
+        file_path = saved.path
+        added: Dict[str, Dict] = {}
+        embedding_stats = EmbeddingStats()
+        
+        async def report(stage: str, chunks_done: int):
+            if progress is not None:
+                await progress(stage, chunks_done)
         
         try:
-            # Extract text
-            text = await self.extract_text(file_path, file.content_type or "")
-            
-            if not text.strip():
-                raise ValueError("No text content extracted from document")
-            
-            # Split into chunks
-            chunks = self.text_splitter.split_text(text)
-            
-            if not chunks:
-                raise ValueError("No chunks created from document text")
-            
-            print(f"📄 Created {len(chunks)} chunks from document")
-            
-            # Create embeddings
-            print(f"⏳ Creating embeddings...")
-            try:
-                embeddings = await self._create_embeddings(chunks)
-                print(f"✅ Created {len(embeddings)} embeddings")
-            except Exception as e:
-                import traceback
-                print(f"❌ Error creating embeddings: {str(e)}")
-                print(traceback.format_exc())
-                raise Exception(f"Failed to create embeddings: {str(e)}")
-            
-            # Prepare metadata
-            metadata_list = [
-                {
-                    "source": file.filename,
+            await report("extracting", 0)
+            with stage_timer("ingest", "lookup"):
+                existing = await asyncio.to_thread(self._existing_chunks, filename, category)
+            if self._is_unchanged(existing, saved.sha256):
+                metrics.CHUNKS_INGESTED.inc("unchanged", amount=len(existing))
+                print(f"⏭️  {filename} is unchanged, skipping")
+                return {
+                    "chunks_created": 0,
+                    "chunks_unchanged": len(existing),
+                    "chunks_removed": 0,
+                    "unchanged": True,
+                    "filename": filename,
                     "category": category,
-                    "chunk_index": i,
-                    "total_chunks": len(chunks)
+                    "size_bytes": saved.size,
+                    "sha256": saved.sha256
                 }
-                for i in range(len(chunks))
-            ]
             
-            # Generate IDs
-            ids = [f"{file.filename}_{category}_{i}" for i in range(len(chunks))]
+            all_ids: List[str] = []
+            all_metadata: List[Dict] = []
+            occurrences: Dict[str, int] = {}
+            # Extraction and chunking happen while this loop waits for the next batch
+            waiting = time.perf_counter()
+            async for records in self.iter_chunks(file_path, content_type, config.ingest_embed_batch_size):
+                metrics.STAGE_SECONDS.observe(time.perf_counter() - waiting, "ingest", "extract")
+                chunks = [chunk for chunk, _ in records]
+                # total_chunks stays 0 until _finish_document, so a crash part
+                # way through is never mistaken for a complete document
+                ids, metadata_list = self._build_records(
+                    filename,
+                    category,
+                    chunks,
+                    start_index=len(all_ids),
+                    chunk_metadata=[metadata for _, metadata in records],
+                    file_hash=saved.sha256,
+                    occurrences=occurrences,
+                    total_chunks=0
+                )
+                all_ids.extend(ids)
+                all_metadata.extend(metadata_list)
+                
+                # Chunks already stored keep their embeddings
+                new = [i for i, chunk_id in enumerate(ids) if chunk_id not in existing]
+                if not new:
+                    await report("extracting", len(all_ids))
+                    waiting = time.perf_counter()
+                    continue
+                new_chunks = [chunks[i] for i in new]
+                
+                # Create embeddings
+                await report("embedding", len(all_ids) - len(chunks))
+                try:
+                    with stage_timer("ingest", "embed"):
+                        embeddings = await self._create_embeddings(new_chunks, embedding_stats)
+                except Exception as e:
+                    import traceback
+                    print(f"❌ Error creating embeddings: {str(e)}")
+                    print(traceback.format_exc())
+                    raise Exception(f"Failed to create embeddings: {str(e)}")
+                
+                # Add to ChromaDB
+                await report("writing", len(all_ids) - len(chunks))
+                try:
+                    with stage_timer("ingest", "write"):
+                        await asyncio.to_thread(
+                            self.embedding_service.add_chunks,
+                            embeddings=embeddings,
+                            documents=new_chunks,
+                            metadatas=[metadata_list[i] for i in new],
+                            ids=[ids[i] for i in new]
+                        )
+                except Exception as e:
+                    import traceback
+                    print(f"❌ Error adding to ChromaDB: {str(e)}")
+                    print(traceback.format_exc())
+                    raise Exception(f"Failed to add to ChromaDB: {str(e)}")
+                for i in new:
+                    added[ids[i]] = dict(metadata_list[i])
+                print(f"⏳ {filename}: {len(added)} new chunks added to ChromaDB")
+                await report("extracting", len(all_ids))
+                waiting = time.perf_counter()
             
-            # Add to ChromaDB
-            print(f"⏳ Adding to ChromaDB...")
-            try:
-                # ChromaDB expects embeddings as a list of lists
-                self.collection.add(
-                    embeddings=embeddings if isinstance(embeddings[0], list) else embeddings,
-                    documents=chunks,
-                    metadatas=metadata_list,
-                    ids=ids
+            if not all_ids:
+                raise ValueError("No text content extracted from document")
+            
+            await report("finalizing", len(all_ids))
+            with stage_timer("ingest", "finalize"):
+                counts = await asyncio.to_thread(
+                    self._finish_document,
+                    all_ids,
+                    all_metadata,
+                    existing,
+                    added,
+                    filename,
+                    category,
+                    size_bytes=saved.size,
+                    file_hash=saved.sha256
                 )
-                print(f"✅ Successfully added {len(chunks)} chunks to ChromaDB")
-            except Exception as e:
-                import traceback
-                print(f"❌ Error adding to ChromaDB: {str(e)}")
-                print(traceback.format_exc())
-                raise Exception(f"Failed to add to ChromaDB: {str(e)}")
+            print(
+                f"✅ {filename}: {counts['chunks_added']} chunks added, "
+                f"{counts['chunks_unchanged']} unchanged, {counts['chunks_removed']} removed"
+            )
+            self._log_embedding_stats(filename, embedding_stats)
             
             return {
-                "chunks_created": len(chunks),
-                "filename": file.filename,
-                "category": category
+                "chunks_created": counts["chunks_added"],
+                "chunks_unchanged": counts["chunks_unchanged"],
+                "chunks_removed": counts["chunks_removed"],
+                "unchanged": False,
+                "filename": filename,
+                "category": category,
+                "size_bytes": saved.size,
+                "sha256": saved.sha256,
+                "embedding_cache": embedding_stats.as_dict()
             }
         
         except Exception as e:
-            # Clean up file on error
+            # Remove the chunks this ingest added; the previous version stays intact
+            if added:
+                try:
+                    await asyncio.to_thread(self.embedding_service.delete_chunks, list(added))
+                except Exception as cleanup_error:
+                    print(f"⚠️  Could not remove partial chunks of {filename}: {cleanup_error}")
             if os.path.exists(file_path):
-                os.remove(file_path)
+                await asyncio.to_thread(os.remove, file_path)
             raise Exception(f"Error processing document: {str(e)}")
     
     def ingest_text_directly(
@@ -266,37 +561,38 @@ class DocumentProcessor:
         # Split into chunks
         chunks = self.text_splitter.split_text(text)
         
+        # Only chunks that aren't stored yet need embedding
+        existing = self._existing_chunks(source_name, category)
+        ids, metadata_list = self._build_records(source_name, category, chunks)
+        new = [i for i, chunk_id in enumerate(ids) if chunk_id not in existing]
+        
         # Create embeddings (synchronous version)
+        embedding_stats = EmbeddingStats()
         try:
-            embeddings = self.embeddings.embed_documents(chunks)
+            embeddings = self._create_embeddings_sync([chunks[i] for i in new], embedding_stats) if new else []
         except Exception as e:
             raise Exception(f"Error creating embeddings: {str(e)}")
         
-        # Prepare metadata
-        metadata_list = [
-            {
-                "source": source_name,
-                "category": category,
-                "chunk_index": i,
-                "total_chunks": len(chunks)
-            }
-            for i in range(len(chunks))
-        ]
-        
-        # Generate IDs
-        ids = [f"{source_name}_{category}_{i}" for i in range(len(chunks))]
-        
         # Add to ChromaDB
-        self.collection.add(
-            embeddings=embeddings,
-            documents=chunks,
-            metadatas=metadata_list,
-            ids=ids
+        added = {}
+        if new:
+            self.embedding_service.add_chunks(
+                embeddings=embeddings,
+                documents=[chunks[i] for i in new],
+                metadatas=[metadata_list[i] for i in new],
+                ids=[ids[i] for i in new]
+            )
+            added = {ids[i]: dict(metadata_list[i]) for i in new}
+        counts = self._finish_document(
+            ids, metadata_list, existing, added, source_name, category, size_bytes=len(text.encode("utf-8"))
         )
+        self._log_embedding_stats(source_name, embedding_stats)
         
         return {
-            "chunks_created": len(chunks),
+            "chunks_created": counts["chunks_added"],
+            "chunks_unchanged": counts["chunks_unchanged"],
+            "chunks_removed": counts["chunks_removed"],
             "source": source_name,
-            "category": category
+            "category": category,
+            "embedding_cache": embedding_stats.as_dict()
         }
-
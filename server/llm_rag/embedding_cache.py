@@ -0,0 +1,206 @@
+"""
+Persistent embedding cache for document chunks
+
+Legal footers, setup preambles and other boilerplate show up in many
+documents. Vectors are stored in SQLite keyed by (embedding model, chunk
+content hash), so a chunk is embedded once per model no matter how many
+documents or uploads repeat it. The cache survives restarts and is bounded
+by entry count, evicting the least recently used vectors.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from llm_rag.config import config
+
+
+class EmbeddingStats:
+    """Cache hits and embedding time for one ingest"""
+    
+    def __init__(self):
+        self.chunks = 0
+        self.cache_hits = 0
+        self.embedded = 0
+        self.embed_seconds = 0.0
+        self.seconds_saved = 0.0
+    
+    def merge(self, other: "EmbeddingStats"):
+        """Add another ingest's numbers to these"""
+        self.chunks += other.chunks
+        self.cache_hits += other.cache_hits
+        self.embedded += other.embedded
+        self.embed_seconds += other.embed_seconds
+        self.seconds_saved += other.seconds_saved
+    
+    def as_dict(self) -> Dict:
+        return {
+            "chunks": self.chunks,
+            "cache_hits": self.cache_hits,
+            "embedded": self.embedded,
+            "hit_rate": round(self.cache_hits / self.chunks, 4) if self.chunks else 0.0,
+            "embed_seconds": round(self.embed_seconds, 3),
+            "seconds_saved": round(self.seconds_saved, 3)
+        }
+
+
+class EmbeddingCache:
+    """
+    SQLite-backed (model, chunk hash) -> vector cache
+    
+    Vectors are stored as float32 or float16 blobs. WAL mode lets several
+    uvicorn workers share the file. Methods are synchronous; call them from a
+    thread when on the event loop.
+    """
+    
+    def __init__(self, db_path: str, max_entries: int = 200000, dtype: str = "float32"):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.dtype = np.dtype(dtype)
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Rows at the last COUNT(*) plus rows put since, so puts below the
+        # limit skip the count; other workers' puts show up at the next count
+        self._entries: Optional[int] = None
+        self._entries_lock = threading.Lock()
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS chunk_embeddings (
+                    model TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    dtype TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (model, content_hash)
+                )
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_chunk_embeddings_last_used
+                ON chunk_embeddings (last_used)
+            """)
+    
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; sqlite3 connections are not thread-safe"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, List[float]]:
+        """Cached vectors for whichever of `hashes` are present"""
+        unique = list(dict.fromkeys(hashes))
+        found: Dict[str, List[float]] = {}
+        conn = self._connection()
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(unique), 500):
+            part = unique[start:start + 500]
+            rows = conn.execute(
+                f"""
+                SELECT content_hash, dtype, vector FROM chunk_embeddings
+                WHERE model = ? AND content_hash IN ({",".join("?" * len(part))})
+                """,
+                [model, *part]
+            ).fetchall()
+            for content_hash, dtype, blob in rows:
+                found[content_hash] = np.frombuffer(blob, dtype=dtype).astype(np.float32).tolist()
+        
+        if found:
+            now = time.time()
+            with conn:
+                conn.executemany(
+                    "UPDATE chunk_embeddings SET last_used = ? WHERE model = ? AND content_hash = ?",
+                    [(now, model, content_hash) for content_hash in found]
+                )
+        self.hits += len(found)
+        self.misses += len(unique) - len(found)
+        return found
+    
+    def put_many(self, model: str, vectors: Dict[str, List[float]]):
+        """Store vectors, then evict the least recently used beyond max_entries"""
+        if not vectors:
+            return
+        now = time.time()
+        with self._connection() as conn:
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO chunk_embeddings (model, content_hash, dtype, vector, last_used)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                [
+                    (model, content_hash, self.dtype.name, np.asarray(vector, dtype=self.dtype).tobytes(), now)
+                    for content_hash, vector in vectors.items()
+                ]
+            )
+            self._evict(conn, len(vectors))
+    
+    def _evict(self, conn: sqlite3.Connection, added: int):
+        if self.max_entries <= 0:
+            return
+        with self._entries_lock:
+            if self._entries is not None:
+                # Replaced rows are counted too, which only brings the next count forward
+                self._entries += added
+                if self._entries <= self.max_entries:
+                    return
+        (count,) = conn.execute("SELECT COUNT(*) FROM chunk_embeddings").fetchone()
+        if count > self.max_entries:
+            # Trim an extra 10% so every insert near the limit doesn't trigger a sweep
+            excess = count - int(self.max_entries * 0.9)
+            conn.execute(
+                """
+                DELETE FROM chunk_embeddings WHERE rowid IN (
+                    SELECT rowid FROM chunk_embeddings ORDER BY last_used LIMIT ?
+                )
+                """,
+                (excess,)
+            )
+            self.evictions += excess
+            count -= excess
+        with self._entries_lock:
+            self._entries = count
+    
+    def clear(self):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM chunk_embeddings")
+        with self._entries_lock:
+            self._entries = 0
+    
+    def stats(self) -> Dict:
+        entries, size = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM chunk_embeddings"
+        ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "vector_mb": round(size / (1024 * 1024), 2),
+            "dtype": self.dtype.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "db_path": self.db_path
+        }
+
+
+def create_embedding_cache() -> Optional[EmbeddingCache]:
+    """Build the embedding cache configured in RAGConfig, if enabled"""
+    if not config.embedding_cache_enabled:
+        return None
+    return EmbeddingCache(
+        config.embedding_cache_path,
+        max_entries=config.embedding_cache_max_entries,
+        dtype=config.embedding_cache_dtype
+    )
@@ -0,0 +1,339 @@
+"""
+Shared embedding model and vector store provider
+
+Loading a SentenceTransformer and opening a Chroma PersistentClient are the
+two most expensive things the server does at startup, so both are created
+once per process and shared by RAGPipeline and DocumentProcessor, together
+with the per-document catalog. Chunks are written through
+add_chunks/delete_chunks so the BM25 keyword index stays in step with Chroma;
+bulk deletes go through delete_where and reset_collection, which never load
+more than one batch of chunk IDs.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+
+import chromadb
+from chromadb.config import Settings
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from langchain_openai import OpenAIEmbeddings
+from sentence_transformers import SentenceTransformer  # Local embeddings (FREE)
+
+from llm_rag.config import config
+from llm_rag.document_catalog import DocumentCatalog
+from llm_rag.lexical_index import create_lexical_index
+
+# How often the collection generation is re-read from the catalog
+GENERATION_CHECK_SECONDS = 5.0
+
+
+def configured_embedding_model() -> str:
+    """Name of the embedding model RAGConfig currently selects"""
+    if config.use_local_embeddings:
+        return config.local_embedding_model
+    if config.use_openai_embeddings and config.openai_api_key:
+        return config.openai_embedding_model
+    if config.use_gemini_embeddings and config.google_api_key:
+        return config.embedding_model
+    return config.local_embedding_model
+
+
+class EmbeddingService:
+    """Owns the embedding model and the Chroma collection for the process"""
+    
+    def __init__(self):
+        """Load the embedding model and open the vector store"""
+        self.chroma_client = chromadb.PersistentClient(
+            path=config.chroma_db_path,
+            settings=Settings(anonymized_telemetry=False)
+        )
+        # One row per document for the list/detail/stats endpoints
+        self.catalog = DocumentCatalog(config.catalog_db_path)
+        self._generation = self.catalog.collection_generation()
+        self._generation_checked_at = time.monotonic()
+        self._collection = self._open_collection()
+        
+        if self.catalog.is_empty() and self.collection.count() > 0:
+            print("📚 Building document catalog from the existing collection...")
+            print(f"✅ Catalogued {self.catalog.rebuild_from(self.collection)} documents")
+        
+        # Keyword index for hybrid retrieval (None in dense mode)
+        self.lexical_index = create_lexical_index()
+        if self.lexical_index is not None:
+            # Catching up can read the whole collection; don't hold up startup for it
+            threading.Thread(target=self._sync_lexical_index, name="lexical-index-sync", daemon=True).start()
+        
+        # Initialize embeddings (priority: local > OpenAI > Gemini)
+        if config.use_local_embeddings:
+            # Use local embeddings (FREE, no API needed)
+            print(f"📦 Loading local embedding model: {config.local_embedding_model}")
+            self.embeddings = SentenceTransformer(config.local_embedding_model)
+            self.embedding_type = "local"
+            self.model_name = config.local_embedding_model
+            print("✅ Using local embeddings (free, no API calls)")
+        elif config.use_openai_embeddings and config.openai_api_key:
+            # Use OpenAI embeddings (requires API key, very cheap)
+            if config.openai_base_url:
+                # Compatible servers take raw text; this also skips tiktoken's encoding download
+                self.embeddings = OpenAIEmbeddings(
+                    model=config.openai_embedding_model,
+                    openai_api_key=config.openai_api_key,
+                    openai_api_base=config.openai_base_url,
+                    check_embedding_ctx_length=False
+                )
+                print(f"✅ Using OpenAI embeddings at {config.openai_base_url}")
+            else:
+                self.embeddings = OpenAIEmbeddings(
+                    model=config.openai_embedding_model,
+                    openai_api_key=config.openai_api_key
+                )
+                print("✅ Using OpenAI embeddings")
+            self.embedding_type = "openai"
+            self.model_name = config.openai_embedding_model
+        elif config.use_gemini_embeddings and config.google_api_key:
+            # Use Gemini embeddings (requires PAID account)
+            self.embeddings = GoogleGenerativeAIEmbeddings(
+                model=config.embedding_model,
+                google_api_key=config.google_api_key
+            )
+            self.embedding_type = "gemini"
+            self.model_name = config.embedding_model
+            print("✅ Using Gemini embeddings")
+        else:
+            # Default to local if nothing specified
+            print("⚠️  No embedding provider specified, defaulting to local embeddings")
+            self.embeddings = SentenceTransformer(config.local_embedding_model)
+            self.embedding_type = "local"
+            self.model_name = config.local_embedding_model
+    
+    def _open_collection(self):
+        return self.chroma_client.get_or_create_collection(
+            name=config.collection_name,
+            metadata={"hnsw:space": "cosine"}
+        )
+    
+    @property
+    def collection(self):
+        """
+        The Chroma collection, reopened if another process has recreated it
+        
+        Resets are rare, so the catalog is only asked for the current
+        generation every GENERATION_CHECK_SECONDS rather than on every access.
+        """
+        now = time.monotonic()
+        if now - self._generation_checked_at >= GENERATION_CHECK_SECONDS:
+            self._generation_checked_at = now
+            generation = self.catalog.collection_generation()
+            if generation != self._generation:
+                self._collection = self._open_collection()
+                self._generation = generation
+        return self._collection
+    
+    def add_chunks(
+        self,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Dict],
+        embeddings: List[List[float]]
+    ):
+        """Write chunks to Chroma and the keyword index"""
+        self.collection.add(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+        if self.lexical_index is not None:
+            self._update_lexical_index(self.lexical_index.add, ids, documents)
+    
+    def delete_chunks(self, ids: List[str]):
+        """Remove chunks from Chroma and the keyword index"""
+        self.collection.delete(ids=ids)
+        if self.lexical_index is not None:
+            self._update_lexical_index(self.lexical_index.delete, ids)
+    
+    def delete_batch(self, where: Dict, batch_size: int) -> int:
+        """
+        Remove up to batch_size chunks matching a metadata filter
+        
+        Chroma applies the filter and returns IDs only, so memory stays
+        bounded by the batch however many chunks match.
+        
+        Returns:
+            Chunks removed; 0 once nothing matches
+        """
+        ids = self.collection.get(where=where, limit=batch_size, include=[]).get('ids', [])
+        if ids:
+            self.delete_chunks(ids)
+        return len(ids)
+    
+    def delete_where(self, where: Dict, batch_size: Optional[int] = None) -> int:
+        """Remove every chunk matching a metadata filter, a batch at a time"""
+        batch_size = batch_size or config.delete_batch_size
+        deleted = 0
+        while True:
+            removed = self.delete_batch(where, batch_size)
+            if not removed:
+                return deleted
+            deleted += removed
+    
+    def reset_collection(self) -> int:
+        """
+        Drop and recreate the collection, emptying the keyword index and catalog
+        
+        Returns:
+            Chunks the collection held
+        """
+        count = self.collection.count()
+        self.chroma_client.delete_collection(config.collection_name)
+        self._collection = self._open_collection()
+        if self.lexical_index is not None:
+            self._update_lexical_index(self.lexical_index.clear)
+        self.catalog.remove()
+        self._generation = self.catalog.bump_collection_generation()
+        self._generation_checked_at = time.monotonic()
+        return count
+    
+    def _sync_lexical_index(self):
+        try:
+            synced = self.lexical_index.sync_with(self.collection)
+        except Exception as e:
+            print(f"⚠️  Keyword index sync failed: {e}")
+            return
+        if synced["indexed"] or synced["removed"]:
+            print(f"🔤 Keyword index synced: {synced['indexed']} chunks indexed, {synced['removed']} removed")
+    
+    @staticmethod
+    def _update_lexical_index(update: Callable, *args):
+        # Chroma is the source of truth; a missed update is repaired by sync_with on the next start
+        try:
+            update(*args)
+        except Exception as e:
+            print(f"⚠️  Keyword index update failed: {e}")
+    
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed a batch of search queries"""
+        if not queries:
+            return []
+        if self.embedding_type == "local":
+            return self.embeddings.encode(queries, convert_to_numpy=True).tolist()
+        # API-based embeddings use a query-specific task type
+        return [self.embeddings.embed_query(query) for query in queries]
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of document chunks"""
+        if not texts:
+            return []
+        if self.embedding_type == "local":
+            return self.embeddings.encode(texts, convert_to_numpy=True).tolist()
+        return self.embeddings.embed_documents(texts)
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed document chunks without blocking the event loop"""
+        if self.embedding_type != "local" and hasattr(self.embeddings, 'aembed_documents'):
+            try:
+                return await self.embeddings.aembed_documents(texts)
+            except (AttributeError, NotImplementedError, TypeError):
+                # Fall back to sync if async not supported
+                pass
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, partial(self.embed_documents, texts))
+
+
+def chunk_filter(source: Optional[str] = None, category: Optional[str] = None) -> Dict:
+    """Chroma where-clause for the chunks of a document and/or category"""
+    conditions = []
+    if source is not None:
+        conditions.append({"source": source})
+    if category is not None:
+        conditions.append({"category": category})
+    if not conditions:
+        raise ValueError("A chunk filter needs a source or a category")
+    return {"$and": conditions} if len(conditions) > 1 else conditions[0]
+
+
+class QueryBatcher:
+    """
+    Coalesces concurrent query embeddings into one batched encode
+    
+    Queries that arrive within `window_ms` of the first pending query (or until
+    `max_batch_size` queries are waiting) are embedded together on `executor`,
+    and each caller gets its own vector back.
+    """
+    
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], List[List[float]]],
+        executor: Optional[Executor] = None,
+        window_ms: float = 5.0,
+        max_batch_size: int = 32
+    ):
+        self.embed_fn = embed_fn
+        self.executor = executor
+        self.window = window_ms / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self.batches_run = 0
+        self.queries_embedded = 0
+    
+    async def embed(self, query: str) -> List[float]:
+        """Embed a single query, sharing the encode call with concurrent callers"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((query, future))
+        
+        if len(self._pending) >= self.max_batch_size or self.window <= 0:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        
+        return await future
+    
+    def _flush(self):
+        """Send everything pending as one batch"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        
+        batch, self._pending = self._pending, []
+        task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+        # Keep a reference so the task isn't garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        """Embed one batch and resolve every waiting caller"""
+        loop = asyncio.get_running_loop()
+        try:
+            vectors = await loop.run_in_executor(
+                self.executor, self.embed_fn, [query for query, _ in batch]
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        self.batches_run += 1
+        self.queries_embedded += len(batch)
+        for (_, future), vector in zip(batch, vectors):
+            # A caller may have been cancelled while the batch was running
+            if not future.done():
+                future.set_result(vector)
+
+
+_service: Optional[EmbeddingService] = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Return the process-wide EmbeddingService, creating it on first use"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = EmbeddingService()
+    return _service
@@ -0,0 +1,132 @@
+"""
+Text extraction for supported document types
+
+These are plain synchronous functions at module level so they can run in a
+ProcessPoolExecutor; PDF and DOCX parsing is CPU-bound and would otherwise
+stall the event loop.
+"""
+
+import multiprocessing
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional
+
+import PyPDF2
+import docx
+from markdown import markdown
+from bs4 import BeautifulSoup
+
+SUPPORTED_EXTENSIONS = {'.pdf', '.docx', '.txt', '.md'}
+
+
+class ExtractionTimeout(Exception):
+    """Extraction of a single file took longer than its deadline"""
+
+
+def create_extraction_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Process pool for the functions in this module
+    
+    Workers are forked from a forkserver that has imported only this module,
+    never from the app process: forking a process that holds the embedding
+    model and its threads is unsafe, and spawned workers would each load the
+    app's whole dependency stack. Every start method still re-imports the
+    launching __main__ in the workers, so run the server with
+    `uvicorn main:app` rather than `python main.py`.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+    else:
+        context = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+
+def _raise_timeout(signum, frame):
+    raise ExtractionTimeout("Extraction timed out")
+
+
+def run_with_deadline(seconds: int, fn, *args):
+    """
+    Run fn(*args) in a pool worker, aborting it after `seconds`
+    
+    The alarm fires inside the worker, so a pathological file frees its worker
+    instead of occupying it after the caller has given up. Pool workers run
+    tasks on their main thread, which is where signals are delivered.
+    """
+    if seconds <= 0 or not hasattr(signal, "SIGALRM"):
+        return fn(*args)
+    previous = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.alarm(seconds)
+    try:
+        return fn(*args)
+    finally:
+        signal.alarm(0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def pdf_page_count(file_path: str) -> int:
+    """Number of pages in a PDF"""
+    with open(file_path, 'rb') as f:
+        return len(PyPDF2.PdfReader(f).pages)
+
+
+def iter_pdf_pages(file_path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+    """Yield the text of pages [start, stop) of a PDF one page at a time"""
+    with open(file_path, 'rb') as f:
+        pdf_reader = PyPDF2.PdfReader(f)
+        stop = len(pdf_reader.pages) if stop is None else stop
+        for i in range(start, stop):
+            yield pdf_reader.pages[i].extract_text() or ""
+
+
+def extract_pdf_pages(file_path: str, start: int, stop: int) -> List[str]:
+    """Text of pages [start, stop) of a PDF, one string per page"""
+    return list(iter_pdf_pages(file_path, start, stop))
+
+
+def extract_text_pdf(file_path: str) -> str:
+    """Extract text from PDF file"""
+    return "".join(page + "\n" for page in iter_pdf_pages(file_path))
+
+
+def extract_text_docx(file_path: str) -> str:
+    """Extract text from DOCX file"""
+    doc = docx.Document(file_path)
+    return "\n".join([paragraph.text for paragraph in doc.paragraphs])
+
+
+def extract_text_markdown(file_path: str) -> str:
+    """Extract text from Markdown file"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    # Convert markdown to HTML then extract text
+    html = markdown(content)
+    soup = BeautifulSoup(html, 'lxml')
+    return soup.get_text()
+
+
+def extract_text_txt(file_path: str) -> str:
+    """Extract text from plain text file"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def is_pdf(file_path: str, file_type: str = "") -> bool:
+    return file_type.lower() == 'application/pdf' or file_path.endswith('.pdf')
+
+
+def extract_text(file_path: str, file_type: str = "") -> str:
+    """Extract text from various file types"""
+    file_type_lower = file_type.lower()
+    
+    if is_pdf(file_path, file_type):
+        return extract_text_pdf(file_path)
+    elif file_type_lower == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document' or file_path.endswith('.docx'):
+        return extract_text_docx(file_path)
+    elif file_type_lower == 'text/markdown' or file_path.endswith('.md'):
+        return extract_text_markdown(file_path)
+    elif file_type_lower.startswith('text/') or file_path.endswith('.txt'):
+        return extract_text_txt(file_path)
+    else:
+        raise ValueError(f"Unsupported file type: {file_type}")
@@ -0,0 +1,403 @@
+"""
+Staged ingestion pipeline for batches of documents
+
+Files flow through bounded queues between stages so every resource stays
+busy at once: while one PDF is being parsed in the process pool, chunks from
+the previous file are being embedded and the batch before that is being
+written to Chroma.
+    
+    save -> extract + chunk (process pool) -> embed (batched) -> write (bulk)
+
+Pages are chunked as they are extracted, and each file moves on in parts of
+at most ingest_embed_batch_size new chunks, so the bounded queues also cap
+how much text and how many vectors of one large file are held at a time.
+Each stage has its own worker count, and a failure only marks that one file
+as failed.
+"""
+
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional
+
+from llm_rag import metrics
+from llm_rag.config import config
+from llm_rag.embedding_cache import EmbeddingStats
+from llm_rag.uploads import file_sha256
+
+# Tells a stage worker there is no more work
+_DONE = object()
+
+
+class IngestionPipeline:
+    """Concurrent save -> extract + chunk -> embed -> write pipeline"""
+    
+    def __init__(self, processor):
+        """
+        Args:
+            processor: DocumentProcessor providing extraction, chunking,
+                embeddings and collection
+        """
+        self.processor = processor
+        self.save_workers = config.ingest_save_workers
+        self.extract_workers = config.extract_workers
+        self.embed_workers = config.ingest_embed_workers
+        self.write_workers = config.ingest_write_workers
+        self.embed_batch_size = config.ingest_embed_batch_size
+        self.queue_size = config.ingest_queue_size
+    
+    async def ingest(
+        self,
+        sources: List[Dict],
+        category: str = "general",
+        embedding_stats: Optional[EmbeddingStats] = None
+    ) -> List[Dict]:
+        """
+        Ingest a batch of documents
+        
+        Args:
+            sources: Dicts with "filename" and either "upload" (an UploadFile)
+                or "path" (a file already on disk), plus optional "content_type"
+            category: Category assigned to every document
+            embedding_stats: Filled with embedding cache hits and timings for the batch
+        
+        Returns:
+            One result dict per source, in input order
+        """
+        jobs = [
+            {
+                "filename": source["filename"],
+                "upload": source.get("upload"),
+                "path": source.get("path"),
+                "content_type": source.get("content_type") or "",
+                "category": category,
+                "saved_here": False,
+                "status": "pending",
+                # Every chunk ID and metadata of the new version, for _finish
+                "ids": [],
+                "metadatas": [],
+                "occurrences": {},
+                "added": {},
+                # Parts queued for embedding or writing, and whether all are queued
+                "parts_pending": 0,
+                "extracted": False,
+                "timings": {}
+            }
+            for source in sources
+        ]
+        
+        save_q = asyncio.Queue(maxsize=self.queue_size)
+        extract_q = asyncio.Queue(maxsize=self.queue_size)
+        embed_q = asyncio.Queue(maxsize=self.queue_size)
+        write_q = asyncio.Queue(maxsize=self.queue_size)
+        
+        stages = [
+            self._run_stage("save", self._save, save_q, extract_q, self.save_workers, self.extract_workers),
+            self._run_extract_stage(extract_q, embed_q),
+            self._run_embed_stage(embed_q, write_q, embedding_stats),
+            self._run_write_stage(write_q),
+        ]
+        
+        async def feed():
+            for job in jobs:
+                await save_q.put(job)
+            for _ in range(self.save_workers):
+                await save_q.put(_DONE)
+        
+        await asyncio.gather(feed(), *stages)
+        if embedding_stats is not None:
+            self.processor._log_embedding_stats(f"batch of {len(jobs)} files", embedding_stats)
+        return [self._result(job) for job in jobs]
+    
+    async def _run_stage(self, name, handler, inbox, outbox, workers, downstream_workers):
+        """Run `workers` copies of a per-file stage, then signal the next stage"""
+        async def worker():
+            while True:
+                job = await inbox.get()
+                if job is _DONE:
+                    return
+                start = time.perf_counter()
+                try:
+                    await handler(job)
+                except Exception as e:
+                    await self._fail(job, name, e)
+                    continue
+                job["timings"][name] = round(time.perf_counter() - start, 4)
+                metrics.STAGE_SECONDS.observe(job["timings"][name], "batch_ingest", name)
+                if job["status"] == "success":
+                    # Finished early (unchanged file); nothing left to do
+                    continue
+                await outbox.put(job)
+        
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        for _ in range(downstream_workers):
+            await outbox.put(_DONE)
+    
+    async def _save(self, job: Dict):
+        """Write an uploaded file to the documents directory and skip unchanged files"""
+        if job["path"] is None:
+            saved = await self.processor._save_file(job["upload"])
+            job["path"] = saved.path
+            job["sha256"] = saved.sha256
+            job["saved_here"] = True
+            if not job["content_type"]:
+                job["content_type"] = job["upload"].content_type or ""
+        else:
+            job["sha256"] = await asyncio.to_thread(file_sha256, job["path"])
+        
+        job["existing"] = await asyncio.to_thread(
+            self.processor._existing_chunks, job["filename"], job["category"]
+        )
+        if self.processor._is_unchanged(job["existing"], job["sha256"]):
+            job["status"] = "success"
+            job["unchanged"] = True
+            metrics.CHUNKS_INGESTED.inc("unchanged", amount=len(job["existing"]))
+            job["counts"] = {
+                "chunks_added": 0,
+                "chunks_unchanged": len(job.pop("existing")),
+                "chunks_removed": 0
+            }
+    
+    async def _run_extract_stage(self, inbox: asyncio.Queue, outbox: asyncio.Queue):
+        """Extract and chunk files, passing each one on in parts as its pages arrive"""
+        async def worker():
+            while True:
+                job = await inbox.get()
+                if job is _DONE:
+                    return
+                start = time.perf_counter()
+                try:
+                    await self._extract(job, outbox)
+                except Exception as e:
+                    await self._fail(job, "extract", e)
+                    continue
+                if job["status"] == "error":
+                    # A part failed further down the pipeline
+                    continue
+                job["timings"]["extract"] = round(time.perf_counter() - start, 4)
+                metrics.STAGE_SECONDS.observe(job["timings"]["extract"], "batch_ingest", "extract")
+                job["extracted"] = True
+                if not job["parts_pending"]:
+                    # Nothing new to embed, or every part is already written
+                    await self._finish(job)
+        
+        await asyncio.gather(*(worker() for _ in range(self.extract_workers)))
+        for _ in range(self.embed_workers):
+            await outbox.put(_DONE)
+    
+    async def _extract(self, job: Dict, outbox: asyncio.Queue):
+        """
+        Chunk pages as the pool extracts them and queue the new chunks in parts
+        
+        Only chunk IDs and metadata are kept for the whole file; chunk text
+        travels with its part and is released once the part is written.
+        """
+        async for records in self.processor.iter_chunks(job["path"], job["content_type"], self.embed_batch_size):
+            if job["status"] == "error":
+                return
+            chunks = [chunk for chunk, _ in records]
+            # total_chunks stays 0 until _finish, as in DocumentProcessor.ingest_saved_file
+            ids, metadatas = self.processor._build_records(
+                job["filename"],
+                job["category"],
+                chunks,
+                start_index=len(job["ids"]),
+                chunk_metadata=[metadata for _, metadata in records],
+                file_hash=job["sha256"],
+                occurrences=job["occurrences"],
+                total_chunks=0
+            )
+            job["ids"].extend(ids)
+            job["metadatas"].extend(metadatas)
+            # Chunks already stored keep their embeddings
+            new = [i for i, chunk_id in enumerate(ids) if chunk_id not in job["existing"]]
+            if new:
+                job["parts_pending"] += 1
+                await outbox.put({
+                    "job": job,
+                    "chunks": [chunks[i] for i in new],
+                    "ids": [ids[i] for i in new],
+                    "metadatas": [metadatas[i] for i in new]
+                })
+        if job["status"] != "error" and not job["ids"]:
+            raise ValueError("No text content extracted from document")
+    
+    async def _run_embed_stage(
+        self,
+        inbox: asyncio.Queue,
+        outbox: asyncio.Queue,
+        embedding_stats: Optional[EmbeddingStats]
+    ):
+        """Embed parts from several files per model call"""
+        async def worker():
+            finished = False
+            while not finished:
+                part = await inbox.get()
+                if part is _DONE:
+                    break
+                # Greedily take whatever else is already queued, up to the batch size
+                batch = [part]
+                size = len(part["chunks"])
+                while size < self.embed_batch_size:
+                    try:
+                        queued = inbox.get_nowait()
+                    except asyncio.QueueEmpty:
+                        break
+                    if queued is _DONE:
+                        finished = True
+                        break
+                    batch.append(queued)
+                    size += len(queued["chunks"])
+                
+                batch = [part for part in batch if part["job"]["status"] != "error"]
+                if not batch:
+                    continue
+                start = time.perf_counter()
+                texts = [chunk for part in batch for chunk in part["chunks"]]
+                try:
+                    embeddings = await self.processor._create_embeddings(texts, embedding_stats)
+                except Exception as e:
+                    for part in batch:
+                        await self._fail(part["job"], "embed", e)
+                    continue
+                elapsed = time.perf_counter() - start
+                metrics.STAGE_SECONDS.observe(elapsed, "batch_ingest", "embed")
+                
+                offset = 0
+                for part in batch:
+                    part["embeddings"] = embeddings[offset:offset + len(part["chunks"])]
+                    offset += len(part["chunks"])
+                    self._add_timing(part["job"], "embed", elapsed)
+                await outbox.put(batch)
+        
+        await asyncio.gather(*(worker() for _ in range(self.embed_workers)))
+        for _ in range(self.write_workers):
+            await outbox.put(_DONE)
+    
+    async def _run_write_stage(self, inbox: asyncio.Queue):
+        """Write embedded parts to Chroma, one bulk add per batch"""
+        async def worker():
+            while True:
+                batch = await inbox.get()
+                if batch is _DONE:
+                    return
+                batch = [part for part in batch if part["job"]["status"] != "error"]
+                if not batch:
+                    continue
+                start = time.perf_counter()
+                try:
+                    await asyncio.to_thread(self._add_to_collection, batch)
+                except Exception:
+                    # Retry part by part so one bad document doesn't sink the batch
+                    for part in batch:
+                        try:
+                            await asyncio.to_thread(self._add_to_collection, [part])
+                        except Exception as e:
+                            await self._fail(part["job"], "write", e)
+                            continue
+                        await self._part_written(part, start)
+                    continue
+                metrics.STAGE_SECONDS.observe(time.perf_counter() - start, "batch_ingest", "write")
+                for part in batch:
+                    await self._part_written(part, start)
+        
+        await asyncio.gather(*(worker() for _ in range(self.write_workers)))
+    
+    def _add_to_collection(self, batch: List[Dict]):
+        """Bulk add the new chunks of several parts"""
+        ids, documents, metadatas, embeddings = [], [], [], []
+        for part in batch:
+            ids.extend(part["ids"])
+            documents.extend(part["chunks"])
+            metadatas.extend(part["metadatas"])
+            embeddings.extend(part["embeddings"])
+        self.processor.embedding_service.add_chunks(
+            ids=ids,
+            documents=documents,
+            metadatas=metadatas,
+            embeddings=embeddings
+        )
+    
+    async def _part_written(self, part: Dict, write_started: float):
+        """Record a written part and finish its file once it was the last one"""
+        job = part["job"]
+        if job["status"] == "error":
+            # The file failed while this part was being written
+            await self._remove_chunks(job, part["ids"])
+            return
+        job["added"].update(
+            (chunk_id, dict(metadata)) for chunk_id, metadata in zip(part["ids"], part["metadatas"])
+        )
+        job["parts_pending"] -= 1
+        self._add_timing(job, "write", time.perf_counter() - write_started)
+        if job["extracted"] and not job["parts_pending"]:
+            await self._finish(job)
+    
+    async def _finish(self, job: Dict):
+        """Fix totals, refresh moved chunks and drop removed ones"""
+        start = time.perf_counter()
+        try:
+            job["counts"] = await asyncio.to_thread(
+                self.processor._finish_document,
+                job["ids"],
+                job["metadatas"],
+                job["existing"],
+                job["added"],
+                job["filename"],
+                job["category"],
+                size_bytes=os.path.getsize(job["path"]),
+                file_hash=job["sha256"]
+            )
+        except Exception as e:
+            await self._fail(job, "finalize", e)
+            return
+        job["status"] = "success"
+        job["timings"]["finalize"] = round(time.perf_counter() - start, 4)
+        metrics.STAGE_SECONDS.observe(job["timings"]["finalize"], "batch_ingest", "finalize")
+        # Free the per-chunk bookkeeping as soon as the file is done
+        for key in ("ids", "metadatas", "occurrences", "existing", "added"):
+            job.pop(key, None)
+    
+    @staticmethod
+    def _add_timing(job: Dict, stage: str, seconds: float):
+        job["timings"][stage] = round(job["timings"].get(stage, 0.0) + seconds, 4)
+    
+    async def _remove_chunks(self, job: Dict, ids: List[str]):
+        try:
+            await asyncio.to_thread(self.processor.embedding_service.delete_chunks, ids)
+        except Exception as cleanup_error:
+            print(f"⚠️  Could not remove partial chunks of {job['filename']}: {cleanup_error}")
+    
+    async def _fail(self, job: Dict, stage: str, error: Exception):
+        if job["status"] == "error":
+            # Another part of the same file already failed it
+            return
+        print(f"❌ Error ingesting {job['filename']} during {stage}: {str(error)}")
+        job["status"] = "error"
+        job["error"] = f"{stage}: {str(error)}"
+        # Remove what this ingest added; the previous version stays intact
+        if job["added"]:
+            await self._remove_chunks(job, list(job["added"]))
+        for key in ("ids", "metadatas", "occurrences", "existing", "added"):
+            job.pop(key, None)
+        # Clean up file on error, but only if this pipeline saved it
+        if job["saved_here"] and job["path"] and os.path.exists(job["path"]):
+            os.remove(job["path"])
+    
+    def _result(self, job: Dict) -> Dict:
+        if job["status"] == "success":
+            return {
+                "filename": job["filename"],
+                "status": "success",
+                "chunks_created": job["counts"]["chunks_added"],
+                "chunks_unchanged": job["counts"]["chunks_unchanged"],
+                "chunks_removed": job["counts"]["chunks_removed"],
+                "unchanged": job.get("unchanged", False),
+                "sha256": job["sha256"],
+                "timings": job["timings"]
+            }
+        return {
+            "filename": job["filename"],
+            "status": "error",
+            "error": job.get("error", "not processed")
+        }
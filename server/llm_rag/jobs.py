@@ -0,0 +1,500 @@
+"""
+Background ingestion and bulk-delete jobs
+
+An upload is saved to its own job directory, recorded as a job and
+acknowledged straight away; a fixed number of workers per process then ingest
+queued jobs, never two for the same document at once, and move each file into
+the documents directory once it is ingested.
+Deletes too large to finish within a request are queued the same way and
+remove their chunks in batches, reporting progress as they go.
+Jobs live in SQLite, so queued work survives a restart and any uvicorn worker
+can answer a status poll. A running job sends heartbeats; one whose
+heartbeat stops (its process died) is picked up again by another worker.
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from fastapi import UploadFile
+
+from llm_rag.config import config
+from llm_rag.embeddings import chunk_filter
+from llm_rag.uploads import SavedUpload
+
+JOB_STATUSES = ("queued", "running", "success", "error")
+JOB_KINDS = ("ingest", "delete")
+# A job whose worker died this many times is failed instead of retried
+MAX_ATTEMPTS = 3
+# How often an idle worker looks for jobs enqueued by other processes
+POLL_SECONDS = 1.0
+
+_JSON_FIELDS = ("result", "stage_seconds")
+
+# Two jobs touch the same chunks when they share a category and a filename; an
+# empty category (whole-document delete) or filename (category delete) matches all
+_CONFLICT = """
+    (other.category = job.category OR other.category = '' OR job.category = '')
+    AND (other.filename = job.filename OR other.filename = '' OR job.filename = '')
+"""
+
+
+class JobStore:
+    """
+    Ingestion and delete jobs in a SQLite database
+    
+    WAL mode lets several uvicorn workers share the file. Methods are
+    synchronous; call them from a thread when on the event loop.
+    """
+    
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ingestion_jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    filename TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    content_type TEXT NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    kind TEXT NOT NULL DEFAULT 'ingest',
+                    chunks_total INTEGER,
+                    chunks_done INTEGER NOT NULL DEFAULT 0,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    claim TEXT,
+                    result TEXT,
+                    error TEXT,
+                    stage_seconds TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    heartbeat_at REAL,
+                    finished_at REAL
+                )
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_status
+                ON ingestion_jobs (status, created_at)
+            """)
+            # Job databases created before delete jobs existed
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(ingestion_jobs)")}
+            if "kind" not in columns:
+                conn.execute("ALTER TABLE ingestion_jobs ADD COLUMN kind TEXT NOT NULL DEFAULT 'ingest'")
+            if "chunks_total" not in columns:
+                conn.execute("ALTER TABLE ingestion_jobs ADD COLUMN chunks_total INTEGER")
+    
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; sqlite3 connections are not thread-safe"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+    
+    def create(
+        self,
+        saved: SavedUpload,
+        filename: str,
+        content_type: str,
+        category: str,
+        job_id: Optional[str] = None
+    ) -> str:
+        job_id = job_id or uuid.uuid4().hex
+        with self._connection() as conn:
+            conn.execute(
+                """
+                INSERT INTO ingestion_jobs
+                    (id, status, stage, filename, category, path, content_type, size_bytes, sha256, created_at)
+                VALUES (?, 'queued', 'queued', ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (job_id, filename, category, saved.path, content_type, saved.size, saved.sha256, time.time())
+            )
+        return job_id
+    
+    def create_delete(self, source: Optional[str], category: Optional[str], chunks_total: int) -> str:
+        """Queue removal of a document's or a category's chunks (the other filter is None)"""
+        job_id = uuid.uuid4().hex
+        with self._connection() as conn:
+            conn.execute(
+                """
+                INSERT INTO ingestion_jobs
+                    (id, status, stage, kind, filename, category, path, content_type, size_bytes, sha256,
+                     chunks_total, created_at)
+                VALUES (?, 'queued', 'queued', 'delete', ?, ?, '', '', 0, '', ?, ?)
+                """,
+                (job_id, source or "", category or "", chunks_total, time.time())
+            )
+        return job_id
+    
+    def claim_next(self, stale_seconds: float) -> Optional[Dict]:
+        """
+        Atomically take the oldest queued job, or a running one whose worker died
+        
+        The claim is a single UPDATE, so two workers (or processes) never get
+        the same job. Jobs whose document (or category, for a category delete)
+        already has a live running job wait until it is done; a delete of a
+        document in every category waits for any job on that document.
+        """
+        now = time.time()
+        stale_before = now - stale_seconds
+        claim = uuid.uuid4().hex
+        with self._connection() as conn:
+            conn.execute(
+                """
+                UPDATE ingestion_jobs
+                SET status = 'error', stage = 'error', finished_at = ?,
+                    error = 'Worker stopped while processing this job ' || attempts || ' times'
+                WHERE status = 'running' AND heartbeat_at < ? AND attempts >= ?
+                """,
+                (now, stale_before, MAX_ATTEMPTS)
+            )
+            cursor = conn.execute(
+                """
+                UPDATE ingestion_jobs
+                SET status = 'running', stage = 'starting', claim = ?, attempts = attempts + 1,
+                    chunks_done = 0, started_at = ?, heartbeat_at = ?
+                WHERE id = (
+                    SELECT id FROM ingestion_jobs AS job
+                    WHERE (status = 'queued' OR (status = 'running' AND heartbeat_at < ?))
+                      AND NOT EXISTS (
+                          SELECT 1 FROM ingestion_jobs AS other
+                          WHERE other.status = 'running' AND other.heartbeat_at >= ?
+                            AND other.id != job.id
+                            AND """ + _CONFLICT + """
+                      )
+                    ORDER BY created_at LIMIT 1
+                )
+                """,
+                (claim, now, now, stale_before, stale_before)
+            )
+            if cursor.rowcount == 0:
+                return None
+        row = self._connection().execute(
+            "SELECT * FROM ingestion_jobs WHERE claim = ?", (claim,)
+        ).fetchone()
+        return self._to_dict(row) if row else None
+    
+    def has_pending(self, source: Optional[str], category: Optional[str], stale_seconds: float) -> bool:
+        """Whether a queued or live running job touches this document or category"""
+        stale_before = time.time() - stale_seconds
+        row = self._connection().execute(
+            """
+            SELECT 1 FROM ingestion_jobs AS other, (SELECT ? AS filename, ? AS category) AS job
+            WHERE (other.status = 'queued' OR (other.status = 'running' AND other.heartbeat_at >= ?))
+              AND """ + _CONFLICT + """
+            LIMIT 1
+            """,
+            (source or "", category or "", stale_before)
+        ).fetchone()
+        return row is not None
+    
+    def update_progress(self, job_id: str, stage: str, chunks_done: int, stage_seconds: Dict[str, float]):
+        with self._connection() as conn:
+            conn.execute(
+                """
+                UPDATE ingestion_jobs
+                SET stage = ?, chunks_done = ?, stage_seconds = ?, heartbeat_at = ?
+                WHERE id = ? AND status = 'running'
+                """,
+                (stage, chunks_done, json.dumps(stage_seconds), time.time(), job_id)
+            )
+    
+    def heartbeat(self, job_id: str):
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE ingestion_jobs SET heartbeat_at = ? WHERE id = ? AND status = 'running'",
+                (time.time(), job_id)
+            )
+    
+    def finish(self, job_id: str, result: Dict, stage_seconds: Dict[str, float]):
+        with self._connection() as conn:
+            conn.execute(
+                """
+                UPDATE ingestion_jobs
+                SET status = 'success', stage = 'done', result = ?, stage_seconds = ?, finished_at = ?,
+                    chunks_done = ?
+                WHERE id = ?
+                """,
+                (
+                    json.dumps(result),
+                    json.dumps(stage_seconds),
+                    time.time(),
+                    result.get("chunks_created", 0) + result.get("chunks_unchanged", 0)
+                    + result.get("chunks_deleted", 0),
+                    job_id
+                )
+            )
+    
+    def fail(self, job_id: str, error: str, stage_seconds: Dict[str, float]):
+        with self._connection() as conn:
+            conn.execute(
+                """
+                UPDATE ingestion_jobs
+                SET status = 'error', stage = 'error', error = ?, stage_seconds = ?, finished_at = ?
+                WHERE id = ?
+                """,
+                (error, json.dumps(stage_seconds), time.time(), job_id)
+            )
+    
+    def get(self, job_id: str) -> Optional[Dict]:
+        row = self._connection().execute(
+            "SELECT * FROM ingestion_jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return self._to_dict(row) if row else None
+    
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        """Most recent jobs first, optionally only those with one status"""
+        if status:
+            rows = self._connection().execute(
+                "SELECT * FROM ingestion_jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?",
+                (status, limit)
+            ).fetchall()
+        else:
+            rows = self._connection().execute(
+                "SELECT * FROM ingestion_jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+    
+    def stats(self) -> Dict:
+        counts = dict(self._connection().execute(
+            "SELECT status, COUNT(*) FROM ingestion_jobs GROUP BY status"
+        ).fetchall())
+        return {status: counts.get(status, 0) for status in JOB_STATUSES}
+    
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict:
+        job = dict(row)
+        job.pop("claim", None)
+        for field in _JSON_FIELDS:
+            job[field] = json.loads(job[field]) if job[field] else None
+        
+        now = time.time()
+        started, finished = job["started_at"], job["finished_at"]
+        job["queued_seconds"] = round((started or now) - job["created_at"], 3)
+        job["run_seconds"] = round((finished or now) - started, 3) if started else None
+        return job
+
+
+class IngestionJobQueue:
+    """
+    Runs queued ingestion and delete jobs on a bounded set of background workers
+    
+    Args:
+        processor: DocumentProcessor that does the ingesting and deleting
+        store: Where jobs are persisted
+        workers: Jobs run concurrently by this process
+        on_success: Called with the finished job after each successful one
+    """
+    
+    def __init__(
+        self,
+        processor,
+        store: JobStore,
+        workers: int = 2,
+        on_success: Optional[Callable[[Dict], None]] = None
+    ):
+        self.processor = processor
+        self.store = store
+        self.workers = max(1, workers)
+        self.on_success = on_success
+        self.stale_seconds = config.ingest_job_stale_seconds
+        self.files_path = config.job_files_path
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+    
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        print(f"📥 Started {self.workers} ingestion job workers ({self.store.db_path})")
+    
+    async def stop(self):
+        """
+        Cancel the workers
+        
+        A job cut off here stays "running" until its heartbeat goes stale,
+        then another worker (or this server after a restart) runs it again.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+    
+    async def submit(self, file: UploadFile, category: str) -> Dict:
+        """
+        Save an upload to its own job directory and queue it for ingestion
+        
+        Two queued uploads of the same filename never share a file; each is
+        moved into documents_path only after it has been ingested.
+        
+        Raises:
+            FileTooLarge: If the upload is over the size limit (nothing is queued)
+        """
+        job_id = uuid.uuid4().hex
+        directory = os.path.join(self.files_path, job_id)
+        await asyncio.to_thread(os.makedirs, directory, exist_ok=True)
+        try:
+            saved = await self.processor._save_file(file, directory)
+        except BaseException:
+            await asyncio.to_thread(shutil.rmtree, directory, True)
+            raise
+        await asyncio.to_thread(
+            self.store.create, saved, file.filename, file.content_type or "", category, job_id
+        )
+        self._wakeup.set()
+        return await asyncio.to_thread(self.store.get, job_id)
+    
+    async def submit_delete(
+        self,
+        source: Optional[str] = None,
+        category: Optional[str] = None,
+        chunks_total: int = 0
+    ) -> Dict:
+        """Queue removal of every chunk of a document or a category"""
+        job_id = await asyncio.to_thread(self.store.create_delete, source, category, chunks_total)
+        self._wakeup.set()
+        return await asyncio.to_thread(self.store.get, job_id)
+    
+    async def has_pending(self, source: Optional[str] = None, category: Optional[str] = None) -> bool:
+        """Whether a job for this document or category is queued or running"""
+        return await asyncio.to_thread(self.store.has_pending, source, category, self.stale_seconds)
+    
+    async def _worker(self):
+        while True:
+            try:
+                job = await asyncio.to_thread(self.store.claim_next, self.stale_seconds)
+            except Exception as e:
+                print(f"⚠️  Could not claim ingestion job: {e}")
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+    
+    async def _run(self, job: Dict):
+        job_id = job["id"]
+        stage_seconds: Dict[str, float] = {}
+        current = {"stage": "starting", "since": time.perf_counter()}
+        
+        def close_stage():
+            now = time.perf_counter()
+            stage = current["stage"]
+            stage_seconds[stage] = round(stage_seconds.get(stage, 0.0) + now - current["since"], 3)
+            current["since"] = now
+        
+        async def progress(stage: str, chunks_done: int):
+            close_stage()
+            current["stage"] = stage
+            await asyncio.to_thread(self.store.update_progress, job_id, stage, chunks_done, dict(stage_seconds))
+        
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            if job["kind"] == "delete":
+                print(f"🗑️  Job {job_id}: deleting {_delete_target(job)} (attempt {job['attempts']})")
+                result = await self._delete(job, progress)
+            else:
+                print(f"📥 Job {job_id}: ingesting {job['filename']} (attempt {job['attempts']})")
+                result = await self.processor.ingest_saved_file(
+                    SavedUpload(path=job["path"], size=job["size_bytes"], sha256=job["sha256"]),
+                    job["filename"],
+                    job["content_type"],
+                    job["category"],
+                    progress=progress
+                )
+            close_stage()
+            await asyncio.to_thread(self.store.finish, job_id, result, stage_seconds)
+            await self._release_upload(job, publish=True)
+            if self.on_success:
+                self.on_success(job)
+            print(f"✅ Job {job_id} done in {sum(stage_seconds.values()):.1f}s")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            import traceback
+            close_stage()
+            print(f"❌ Job {job_id} ({job['filename'] or job['category']}) failed: {str(e)}")
+            print(traceback.format_exc())
+            await asyncio.to_thread(self.store.fail, job_id, str(e), stage_seconds)
+            await self._release_upload(job, publish=False)
+        finally:
+            heartbeat.cancel()
+    
+    async def _release_upload(self, job: Dict, publish: bool):
+        """Move an ingested upload into documents_path (or drop a failed one) and remove its job directory"""
+        if job["kind"] != "ingest" or os.path.basename(os.path.dirname(job["path"])) != job["id"]:
+            # Saved straight into documents_path by an older version
+            return
+        
+        def release():
+            if publish and os.path.exists(job["path"]):
+                os.replace(job["path"], os.path.join(config.documents_path, job["filename"]))
+            shutil.rmtree(os.path.dirname(job["path"]), ignore_errors=True)
+        
+        try:
+            await asyncio.to_thread(release)
+        except OSError as e:
+            print(f"⚠️  Job {job['id']}: could not move {job['filename']} into place: {e}")
+    
+    async def _delete(self, job: Dict, progress) -> Dict:
+        """
+        Remove a document's or category's chunks a batch at a time
+        
+        Each batch is looked up and deleted in a thread, so the event loop and
+        memory are never held for more than one batch. A retried job simply
+        carries on with whatever is left.
+        """
+        source, category = job["filename"] or None, job["category"] or None
+        service = self.processor.embedding_service
+        where = chunk_filter(source, category)
+        deleted = 0
+        await progress("deleting", 0)
+        while True:
+            removed = await asyncio.to_thread(service.delete_batch, where, config.delete_batch_size)
+            if not removed:
+                break
+            deleted += removed
+            await progress("deleting", deleted)
+        
+        await progress("finalizing", deleted)
+        documents = await asyncio.to_thread(service.catalog.remove, source, category)
+        return {
+            "status": "success",
+            "source": source,
+            "category": category,
+            "documents_deleted": documents,
+            "chunks_deleted": deleted
+        }
+    
+    async def _heartbeat(self, job_id: str):
+        """Keep a long extraction or embedding call from looking like a dead worker"""
+        interval = max(1.0, self.stale_seconds / 4)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.store.heartbeat, job_id)
+            except Exception as e:
+                print(f"⚠️  Job {job_id} heartbeat failed: {e}")
+
+
+def _delete_target(job: Dict) -> str:
+    if job["filename"]:
+        return f"document '{job['filename']}'"
+    return f"category '{job['category']}'"
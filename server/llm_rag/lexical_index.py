@@ -0,0 +1,199 @@
+"""
+BM25 keyword index over the document chunks
+
+Dense retrieval is weak on exact tokens such as CLI flags (--batch-files),
+environment variables (CHROMA_DB_PATH) and error codes (ERR_4012). This
+index keeps every chunk of the Chroma collection in a SQLite FTS5 table and
+ranks matches with FTS5's built-in BM25. Compound identifiers are indexed
+whole and split into their parts, so both "chroma_db_path" and "chroma"
+match. It is updated alongside Chroma on every add and delete and, like
+the other SQLite stores, shared by all uvicorn workers through WAL mode.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from llm_rag.config import config
+
+# Letters and digits, optionally joined by _ - . (env vars, flags, versions, hostnames)
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[._\-]+[a-z0-9]+)*")
+_PART_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Only dropped from queries; they would match nearly every chunk
+_QUERY_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it of on or "
+    "should the to what when where which who why with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased tokens, with each compound identifier followed by its parts"""
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        parts = _PART_PATTERN.findall(token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+def _match_expression(query: str) -> Optional[str]:
+    """FTS5 query matching any of the query's terms"""
+    terms = [term for term in dict.fromkeys(tokenize(query)) if term not in _QUERY_STOPWORDS]
+    if not terms:
+        return None
+    # Quoted, so punctuation inside identifiers is never read as FTS5 syntax
+    return " OR ".join(f'"{term}"' for term in terms)
+
+
+class LexicalIndex:
+    """
+    Chunk ID -> BM25-searchable text, in a SQLite FTS5 table
+    
+    Chunks are stored pre-tokenized (see tokenize) and FTS5 treats _ - . as
+    part of a token, so identifiers survive intact. Methods are synchronous;
+    call them from a thread when on the event loop.
+    """
+    
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        
+        self._local = threading.local()
+        with self._connection() as conn:
+            # FTS5 rowids are integers, so chunk IDs are mapped to them here
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS lexical_chunks (
+                    rowid INTEGER PRIMARY KEY,
+                    chunk_id TEXT NOT NULL UNIQUE
+                )
+            """)
+            conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS lexical_terms USING fts5(
+                    terms,
+                    tokenize = "unicode61 tokenchars '_-.'"
+                )
+            """)
+    
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; sqlite3 connections are not thread-safe"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def add(self, ids: List[str], documents: List[str]):
+        """Index chunks, replacing any already indexed under the same IDs"""
+        if not ids:
+            return
+        with self._connection() as conn:
+            self._delete(conn, ids)
+            for chunk_id, document in zip(ids, documents):
+                cursor = conn.execute("INSERT INTO lexical_chunks (chunk_id) VALUES (?)", (chunk_id,))
+                conn.execute(
+                    "INSERT INTO lexical_terms (rowid, terms) VALUES (?, ?)",
+                    (cursor.lastrowid, " ".join(tokenize(document)))
+                )
+    
+    def delete(self, ids: List[str]):
+        if not ids:
+            return
+        with self._connection() as conn:
+            self._delete(conn, ids)
+    
+    def clear(self):
+        """Drop every indexed chunk (the collection was recreated)"""
+        with self._connection() as conn:
+            conn.execute("DELETE FROM lexical_terms")
+            conn.execute("DELETE FROM lexical_chunks")
+    
+    @staticmethod
+    def _delete(conn: sqlite3.Connection, ids: List[str]):
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(ids), 500):
+            part = ids[start:start + 500]
+            placeholders = ",".join("?" * len(part))
+            conn.execute(
+                f"""
+                DELETE FROM lexical_terms WHERE rowid IN (
+                    SELECT rowid FROM lexical_chunks WHERE chunk_id IN ({placeholders})
+                )
+                """,
+                part
+            )
+            conn.execute(f"DELETE FROM lexical_chunks WHERE chunk_id IN ({placeholders})", part)
+    
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """
+        Best k chunks for a query by BM25
+        
+        Returns:
+            (chunk_id, score) pairs, best first; higher scores are better
+        """
+        expression = _match_expression(query)
+        if expression is None:
+            return []
+        rows = self._connection().execute(
+            """
+            SELECT c.chunk_id, bm25(lexical_terms) AS rank
+            FROM lexical_terms JOIN lexical_chunks c ON c.rowid = lexical_terms.rowid
+            WHERE lexical_terms MATCH ?
+            ORDER BY rank LIMIT ?
+            """,
+            (expression, k)
+        ).fetchall()
+        # FTS5's bm25() is negated so that ascending order is best first
+        return [(chunk_id, -rank) for chunk_id, rank in rows]
+    
+    def ids(self) -> List[str]:
+        return [row[0] for row in self._connection().execute("SELECT chunk_id FROM lexical_chunks")]
+    
+    def count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM lexical_chunks").fetchone()[0]
+    
+    def sync_with(self, collection, batch_size: int = 500) -> Dict:
+        """
+        Bring the index in line with a Chroma collection
+        
+        Indexes chunks the index is missing and drops chunks Chroma no longer
+        has. Covers the first start after upgrading (an empty index) and any
+        write that reached Chroma but not the index. When both hold the same
+        number of chunks the ID lists are not read at all.
+        """
+        if collection.count() == self.count():
+            return {"indexed": 0, "removed": 0}
+        stored = set(collection.get(include=[]).get('ids', []))
+        indexed = set(self.ids())
+        missing = [chunk_id for chunk_id in stored if chunk_id not in indexed]
+        stale = [chunk_id for chunk_id in indexed if chunk_id not in stored]
+        
+        for start in range(0, len(missing), batch_size):
+            results = collection.get(ids=missing[start:start + batch_size], include=["documents"])
+            self.add(results.get('ids', []), results.get('documents') or [])
+        self.delete(stale)
+        return {"indexed": len(missing), "removed": len(stale)}
+    
+    def stats(self) -> Dict:
+        return {
+            "chunks": self.count(),
+            "db_path": self.db_path
+        }
+
+
+def create_lexical_index() -> Optional[LexicalIndex]:
+    """Build the keyword index configured in RAGConfig, if hybrid retrieval is on"""
+    if config.retrieval_mode != "hybrid":
+        return None
+    try:
+        return LexicalIndex(config.lexical_index_path)
+    except sqlite3.OperationalError as e:
+        # SQLite builds without FTS5 fall back to dense-only retrieval
+        print(f"⚠️  Keyword index unavailable ({e}), using dense retrieval only")
+        return None
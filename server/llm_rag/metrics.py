@@ -0,0 +1,214 @@
+"""
+Stage timings and counters in Prometheus text format
+
+Every stage of a chat query, a document ingest and an analyst chat is timed
+into one histogram labelled by operation and stage, next to counters for
+cache hits, chunks ingested and prompt tokens; GET /metrics renders them.
+Timers are plain context managers (or the `timed` decorator); when metrics
+are disabled they return a shared no-op, so instrumented code pays only an
+attribute check. Values are per process: with several uvicorn workers each
+one reports its own, as a scrape reaches whichever worker answers.
+"""
+
+import asyncio
+import bisect
+import functools
+import threading
+import time
+from contextlib import nullcontext
+from typing import Callable, ContextManager, Dict, List, Optional, Sequence, Tuple
+
+from llm_rag.config import config
+
+# Seconds; chat stages range from sub-millisecond cache lookups to multi-second Gemini calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Rough size of a token in characters, when the LLM reports no usage
+CHARS_PER_TOKEN = 4
+
+_NULL_TIMER = nullcontext()
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count per label combination"""
+    
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, *labels, amount: float = 1):
+        if not config.metrics_enabled:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+    
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines.extend(
+            f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in values
+        )
+        return lines
+
+
+class Histogram:
+    """Bucketed observations (cumulative on output, as Prometheus expects) per label combination"""
+    
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last is +Inf), sum, count]
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float, *labels):
+        if not config.metrics_enabled:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+    
+    def time(self, *labels) -> ContextManager:
+        """Observe the duration of a with-block"""
+        if not config.metrics_enabled:
+            return _NULL_TIMER
+        return _Timer(self, labels)
+    
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted(
+                (labels, (list(counts), total, count)) for labels, (counts, total, count) in self._series.items()
+            )
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+    
+    def __init__(self, histogram: Histogram, labels: Tuple):
+        self.histogram = histogram
+        self.labels = labels
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_duration_seconds",
+    "Time spent in each stage of a chat query, document ingest or analyst chat",
+    ("operation", "stage")
+)
+CACHE_REQUESTS = Counter(
+    "rag_cache_requests_total",
+    "Cache lookups by cache and result (hit or miss)",
+    ("cache", "result")
+)
+CHUNKS_INGESTED = Counter(
+    "rag_chunks_ingested_total",
+    "Chunks processed by ingestion, by result (added, unchanged or removed)",
+    ("result",)
+)
+PROMPT_TOKENS = Counter(
+    "rag_prompt_tokens_total",
+    "Tokens sent to the LLM in prompts (estimated from length when the response reports no usage)",
+    ("operation",)
+)
+LLM_ERRORS = Counter(
+    "rag_llm_errors_total",
+    "Failed LLM calls",
+    ("operation",)
+)
+
+_METRICS = (STAGE_SECONDS, CACHE_REQUESTS, CHUNKS_INGESTED, PROMPT_TOKENS, LLM_ERRORS)
+
+
+def stage_timer(operation: str, stage: str) -> ContextManager:
+    """Time a with-block as one stage of an operation"""
+    return STAGE_SECONDS.time(operation, stage)
+
+
+def timed(operation: str, stage: str) -> Callable:
+    """Decorator form of stage_timer, for sync and async functions"""
+    def decorate(fn: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with STAGE_SECONDS.time(operation, stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+        
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with STAGE_SECONDS.time(operation, stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache, "hit" if hit else "miss")
+
+
+def record_prompt_tokens(operation: str, prompt: str, response=None):
+    """Count a prompt's tokens, from the LLM's reported usage when it has one"""
+    if not config.metrics_enabled:
+        return
+    usage: Optional[Dict] = getattr(response, "usage_metadata", None)
+    tokens = usage.get("input_tokens") if usage else None
+    if tokens is None:
+        tokens = len(prompt) // CHARS_PER_TOKEN
+    PROMPT_TOKENS.inc(operation, amount=tokens)
+
+
+def render() -> str:
+    """Every metric in the Prometheus text exposition format (version 0.0.4)"""
+    lines: List[str] = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
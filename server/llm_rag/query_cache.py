@@ -0,0 +1,107 @@
+"""
+In-memory cache of query embeddings
+
+New hires ask the same questions with small variations in case, spacing and
+punctuation, so queries are normalized before lookup and their embeddings are
+kept in a bounded LRU with a TTL.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return " ".join(_PUNCTUATION.sub(" ", query.lower()).split())
+
+
+class QueryEmbeddingCache:
+    """
+    LRU + TTL cache of query embeddings keyed on normalized query text
+    
+    Entries are tied to the embedding model that produced them: whenever
+    `model_name_fn` reports a different model the whole cache is dropped.
+    """
+    
+    def __init__(
+        self,
+        model_name_fn: Callable[[], str],
+        max_size: int = 1024,
+        ttl_seconds: float = 3600
+    ):
+        self.model_name_fn = model_name_fn
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self._model_name: Optional[str] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def _check_model(self):
+        """Drop every entry if the configured embedding model changed"""
+        model_name = self.model_name_fn()
+        if model_name != self._model_name:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._model_name = model_name
+    
+    def get(self, query: str) -> Optional[List[float]]:
+        """Return the cached embedding for a query, or None"""
+        if self.max_size <= 0:
+            return None
+        key = normalize_query(query)
+        with self._lock:
+            self._check_model()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, embedding = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+    
+    def put(self, query: str, embedding: List[float]):
+        """Store a query embedding, evicting the least recently used entry if full"""
+        if self.max_size <= 0:
+            return
+        key = normalize_query(query)
+        with self._lock:
+            self._check_model()
+            self._entries[key] = (time.monotonic(), embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """Drop every cached embedding"""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "model": self._model_name
+        }
@@ -3,17 +3,55 @@ RAG Pipeline - Retrieval Augmented Generation for answering questions
 """
 
 import os
-from typing import List, Tuple, Dict, Optional
-import chromadb
-from chromadb.config import Settings
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
-from langchain_openai import OpenAIEmbeddings
-from sentence_transformers import SentenceTransformer  # Local embeddings (FREE)
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, List, Tuple, Dict, Optional
+from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.memory import ConversationBufferMemory
-from langchain.schema import HumanMessage, AIMessage, SystemMessage
 
 from llm_rag.config import config
+from llm_rag.embeddings import QueryBatcher, configured_embedding_model, get_embedding_service
+from llm_rag.query_cache import QueryEmbeddingCache
+from llm_rag.answer_cache import SemanticAnswerCache
+from llm_rag.conversation_store import Message, create_conversation_store
+from llm_rag.reranker import create_reranker
+from llm_rag import metrics
+from llm_rag.metrics import stage_timer, timed
+
+
+NO_RESULTS_MESSAGE = (
+    "I couldn't find relevant information in the knowledge base to answer your question. "
+    "Please try rephrasing your question or contact support for assistance."
+)
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], weights: List[float], k: int = 60) -> List[str]:
+    """
+    Merge ranked ID lists: each ID scores sum(weight / (k + rank)) over the lists it appears in
+    
+    Only ranks are used, so BM25 and cosine scores never need to be put on a
+    common scale.
+    """
+    scores: Dict[str, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + weight / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class RestChatGoogleGenerativeAI(ChatGoogleGenerativeAI):
+    """
+    ChatGoogleGenerativeAI that makes async calls over REST as well
+    
+    The library's async client always speaks gRPC over TLS, which a plain
+    HTTP stand-in at GEMINI_BASE_URL cannot answer. With no async client,
+    ainvoke() and astream() run the REST client on a worker thread.
+    """
+    
+    @property
+    def async_client(self):
+        return None
 
 
 class RAGPipeline:
@@ -24,100 +62,137 @@ class RAGPipeline:
         if not config.google_api_key:
             raise ValueError("GOOGLE_API_KEY not found in environment variables")
         
-        # Initialize ChromaDB
-        self.chroma_client = chromadb.PersistentClient(
-            path=config.chroma_db_path,
-            settings=Settings(anonymized_telemetry=False)
-        )
-        self.collection = self.chroma_client.get_or_create_collection(
-            name=config.collection_name,
-            metadata={"hnsw:space": "cosine"}
-        )
-        
-        # Initialize embeddings (priority: local > OpenAI > Gemini)
-        if config.use_local_embeddings:
-            # Use local embeddings (FREE, no API needed)
-            print(f"📦 Loading local embedding model: {config.local_embedding_model}")
-            self.embeddings = SentenceTransformer(config.local_embedding_model)
-            self.embedding_type = "local"
-            print("✅ Using local embeddings (free, no API calls)")
-        elif config.use_openai_embeddings and config.openai_api_key:
-            # Use OpenAI embeddings (requires API key, very cheap)
-            self.embeddings = OpenAIEmbeddings(
-                model=config.openai_embedding_model,
-                openai_api_key=config.openai_api_key
-            )
-            self.embedding_type = "openai"
-            print("✅ Using OpenAI embeddings")
-        elif config.use_gemini_embeddings and config.google_api_key:
-            # Use Gemini embeddings (requires PAID account)
-            self.embeddings = GoogleGenerativeAIEmbeddings(
-                model=config.embedding_model,
-                google_api_key=config.google_api_key
-            )
-            self.embedding_type = "gemini"
-            print("✅ Using Gemini embeddings")
-        else:
-            # Default to local if nothing specified
-            print("⚠️  No embedding provider specified, defaulting to local embeddings")
-            self.embeddings = SentenceTransformer(config.local_embedding_model)
-            self.embedding_type = "local"
+        # Embedding model and Chroma collection are shared with DocumentProcessor
+        self.embedding_service = get_embedding_service()
         
         # Initialize Gemini LLM
         # Available models: gemini-pro (free), gemini-1.5-pro, gemini-1.5-flash, gemini-2.5-flash
         if not config.google_api_key:
             raise ValueError("GOOGLE_API_KEY not found in environment variables")
         
-        self.llm = ChatGoogleGenerativeAI(
-            model=config.gemini_model,
-            temperature=0.7,
-            google_api_key=config.google_api_key
+        if config.gemini_base_url:
+            self.llm = RestChatGoogleGenerativeAI(
+                model=config.gemini_model,
+                temperature=0.7,
+                google_api_key=config.google_api_key,
+                transport="rest",
+                client_options={"api_endpoint": config.gemini_base_url}
+            )
+            print(f"✅ Using Gemini model: {config.gemini_model} at {config.gemini_base_url}")
+        else:
+            self.llm = ChatGoogleGenerativeAI(
+                model=config.gemini_model,
+                temperature=0.7,
+                google_api_key=config.google_api_key
+            )
+            print(f"✅ Using Gemini model: {config.gemini_model}")
+        
+        # Encoding and Chroma lookups are blocking, so they run on a bounded pool
+        self.query_executor = ThreadPoolExecutor(
+            max_workers=config.query_thread_pool_size,
+            thread_name_prefix="rag-query"
         )
-        print(f"✅ Using Gemini model: {config.gemini_model}")
+        # Concurrent chats share one encode call instead of encoding one by one
+        self.query_batcher = QueryBatcher(
+            self.embedding_service.embed_queries,
+            executor=self.query_executor,
+            window_ms=config.query_batch_window_ms,
+            max_batch_size=config.query_batch_max_size
+        )
+        # Repeated questions skip encoding entirely
+        self.query_cache = QueryEmbeddingCache(
+            configured_embedding_model,
+            max_size=config.query_cache_size,
+            ttl_seconds=config.query_cache_ttl_seconds
+        )
+        # Near-duplicate questions over the same chunks reuse the previous answer
+        self.answer_cache = SemanticAnswerCache(
+            similarity_threshold=config.answer_cache_similarity_threshold,
+            max_size=config.answer_cache_size,
+            ttl_seconds=config.answer_cache_ttl_seconds
+        )
+        # Cap concurrent Gemini calls so a burst of chats can't exhaust quota
+        self.llm_semaphore = asyncio.Semaphore(config.max_concurrent_llm_calls)
+        
+        # Conversation memory (bounded; in-memory or SQLite, see RAGConfig)
+        self.conversation_store = create_conversation_store()
         
-        # Conversation memory (in-memory for now, can be upgraded to Redis/DB)
-        self.conversation_memories: Dict[str, ConversationBufferMemory] = {}
+        # Optional cross-encoder that picks the best few of many candidates
+        self.reranker = create_reranker()
     
-    def _get_memory(self, conversation_id: str) -> ConversationBufferMemory:
-        """Get or create conversation memory"""
-        if conversation_id not in self.conversation_memories:
-            self.conversation_memories[conversation_id] = ConversationBufferMemory(
-                memory_key="chat_history",
-                return_messages=True,
-                output_key="answer"
-            )
-        return self.conversation_memories[conversation_id]
+    @property
+    def collection(self):
+        # Looked up on each use: a full wipe replaces the collection
+        return self.embedding_service.collection
     
-    def _retrieve_relevant_docs(self, query: str, top_k: int = None) -> Tuple[List[str], List[Dict]]:
+    async def _retrieve_relevant_docs(self, query: str, top_k: int = None) -> Dict:
         """
         Retrieve relevant documents from vector database
         
+        In hybrid mode the BM25 keyword index is searched alongside Chroma and
+        the two rankings are merged with reciprocal rank fusion.
+        
         Returns:
-            Tuple of (documents, metadata_list)
+            Dict with the query embedding and the matching chunk ids, documents and metadatas
         """
         top_k = top_k or config.top_k_retrieval
+        lexical_index = self.embedding_service.lexical_index
         
         try:
-            # Create query embedding
-            if self.embedding_type == "local":
-                # Local embeddings use encode() method
-                query_embedding = self.embeddings.encode(query, convert_to_numpy=True).tolist()
-            else:
-                # API-based embeddings use embed_query() method
-                query_embedding = self.embeddings.embed_query(query)
+            loop = asyncio.get_running_loop()
+            candidates = max(top_k, config.hybrid_candidates)
+            # The keyword search needs no embedding, so it runs while the query is encoded
+            lexical_search = None
+            if lexical_index is not None:
+                lexical_search = loop.run_in_executor(
+                    self.query_executor, self._lexical_search, query, candidates
+                )
             
-            # Query ChromaDB
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=top_k
-            )
+            # Create query embedding (batched with any concurrent queries)
+            with stage_timer("query", "encode"):
+                query_embedding = self.query_cache.get(query)
+                metrics.record_cache("query_embedding", query_embedding is not None)
+                if query_embedding is None:
+                    query_embedding = await self.query_batcher.embed(query)
+                    self.query_cache.put(query, query_embedding)
+            
+            if lexical_search is None:
+                dense = await self._dense_search(query_embedding, top_k)
+                return {"query_embedding": query_embedding, **dense}
             
-            # Extract documents and metadata
-            # ChromaDB returns results as lists of lists
-            documents = results.get('documents', [[]])[0] if results.get('documents') and len(results.get('documents', [])) > 0 else []
-            metadatas = results.get('metadatas', [[]])[0] if results.get('metadatas') and len(results.get('metadatas', [])) > 0 else []
+            dense = await self._dense_search(query_embedding, candidates)
+            lexical_ids = [chunk_id for chunk_id, _ in await lexical_search]
+            fused = reciprocal_rank_fusion(
+                [dense["ids"], lexical_ids],
+                [config.hybrid_dense_weight, config.hybrid_lexical_weight],
+                k=config.rrf_k
+            )[:top_k]
             
-            return documents, metadatas
+            found = {
+                chunk_id: (document, metadata)
+                for chunk_id, document, metadata in zip(dense["ids"], dense["documents"], dense["metadatas"])
+            }
+            # Chunks only the keyword search found still need their text
+            missing = [chunk_id for chunk_id in fused if chunk_id not in found]
+            if missing:
+                with stage_timer("query", "fetch_lexical_only"):
+                    results = await loop.run_in_executor(
+                        self.query_executor,
+                        lambda: self.collection.get(ids=missing, include=["documents", "metadatas"])
+                    )
+                found.update(zip(
+                    results.get('ids', []),
+                    zip(results.get('documents') or [], results.get('metadatas') or [])
+                ))
+            
+            # A chunk deleted since it was indexed is skipped
+            ids = [chunk_id for chunk_id in fused if chunk_id in found]
+            return {
+                "query_embedding": query_embedding,
+                "ids": ids,
+                "documents": [found[chunk_id][0] for chunk_id in ids],
+                "metadatas": [found[chunk_id][1] for chunk_id in ids]
+            }
         except Exception as e:
             import traceback
             error_details = traceback.format_exc()
@@ -126,7 +201,49 @@ class RAGPipeline:
             print(f"Error: {str(e)}")
             print(f"Traceback:\n{error_details}")
             # Return empty results instead of crashing
-            return [], []
+            return {"query_embedding": None, "ids": [], "documents": [], "metadatas": []}
+    
+    def _lexical_search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        # Runs on the query pool, alongside query encoding
+        with stage_timer("query", "lexical_search"):
+            return self.embedding_service.lexical_index.search(query, k)
+    
+    @timed("query", "dense_search")
+    async def _dense_search(self, query_embedding: List[float], n_results: int) -> Dict:
+        """Nearest chunks in Chroma: ids, documents and metadatas, best first"""
+        # Query ChromaDB on the query pool so the event loop stays free
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(
+            self.query_executor,
+            lambda: self.collection.query(query_embeddings=[query_embedding], n_results=n_results)
+        )
+        
+        # Extract ids, documents and metadata
+        # ChromaDB returns results as lists of lists
+        ids = results.get('ids', [[]])[0] if results.get('ids') and len(results.get('ids', [])) > 0 else []
+        documents = results.get('documents', [[]])[0] if results.get('documents') and len(results.get('documents', [])) > 0 else []
+        metadatas = results.get('metadatas', [[]])[0] if results.get('metadatas') and len(results.get('metadatas', [])) > 0 else []
+        return {"ids": ids, "documents": documents, "metadatas": metadatas}
+    
+    @timed("query", "rerank")
+    async def _rerank(self, query: str, retrieved: Dict) -> Dict:
+        """
+        Keep the rerank_top_n candidates the cross-encoder scores highest
+        
+        If the time budget runs out, the first top_k_retrieval candidates are
+        kept in retrieval order instead, as they would be without re-ranking.
+        """
+        order = await self.reranker.rerank(query, retrieved["documents"])
+        if order is None:
+            order = list(range(min(config.top_k_retrieval, len(retrieved["ids"]))))
+        else:
+            order = order[:config.rerank_top_n]
+        return {
+            "query_embedding": retrieved["query_embedding"],
+            "ids": [retrieved["ids"][i] for i in order],
+            "documents": [retrieved["documents"][i] for i in order],
+            "metadatas": [retrieved["metadatas"][i] for i in order]
+        }
     
     def _create_context(self, documents: List[str], metadatas: List[Dict]) -> str:
         """Create context string from retrieved documents"""
@@ -154,43 +271,8 @@ class RAGPipeline:
             sources.add(f"{source} ({category})")
         return list(sources)
     
-    async def query(
-        self,
-        query: str,
-        conversation_id: Optional[str] = None
-    ) -> Tuple[str, List[str]]:
-        """
-        Process a query using RAG
-        
-        Args:
-            query: User's question
-            conversation_id: Optional conversation ID for context
-        
-        Returns:
-            Tuple of (response, sources)
-        """
-        conversation_id = conversation_id or "default"
-        
-        # Retrieve relevant documents
-        documents, metadatas = self._retrieve_relevant_docs(query)
-        
-        if not documents:
-            return (
-                "I couldn't find relevant information in the knowledge base to answer your question. "
-                "Please try rephrasing your question or contact support for assistance.",
-                []
-            )
-        
-        # Create context
-        context = self._create_context(documents, metadatas)
-        
-        # Extract sources for citation
-        sources = self._extract_sources(metadatas)
-        
-        # Get conversation memory
-        memory = self._get_memory(conversation_id)
-        chat_history = memory.chat_memory.messages
-        
+    def _build_prompt(self, query: str, context: str, chat_history: List[Message]) -> str:
+        """Build the Gemini prompt from retrieved context and recent history"""
         # Build prompt for Gemini
         # Gemini works well with structured prompts that include system instructions
         system_instructions = """You are a helpful AI assistant for onboarding new hires at project44. 
@@ -243,16 +325,16 @@ another command
         history_text = ""
         if chat_history:
             history_parts = []
-            for msg in chat_history[-6:]:  # Keep last 3 exchanges (6 messages)
-                if isinstance(msg, HumanMessage):
-                    history_parts.append(f"User: {msg.content}")
-                elif isinstance(msg, AIMessage):
-                    history_parts.append(f"Assistant: {msg.content}")
+            for role, content in chat_history[-6:]:  # Keep last 3 exchanges (6 messages)
+                if role == "user":
+                    history_parts.append(f"User: {content}")
+                elif role == "assistant":
+                    history_parts.append(f"Assistant: {content}")
             if history_parts:
                 history_text = "\n\nPrevious conversation:\n" + "\n".join(history_parts)
         
         # Combine everything into a single prompt
-        full_prompt = f"""{system_instructions}
+        return f"""{system_instructions}
 
 Context from knowledge base:
 {context}{history_text}
@@ -260,18 +342,114 @@ Context from knowledge base:
 User question: {query}
 
 Provide a helpful answer based on the context:"""
+    
+    async def _prepare_query(self, query: str, conversation_id: str) -> Optional[Dict]:
+        """
+        Retrieve context and either find a cached answer or assemble the prompt
+        
+        Returns:
+            Dict with prompt (None on a cache hit), cached_answer, sources,
+            conversation_id and the retrieval details needed to cache the answer, or None if
+            nothing relevant was found
+        """
+        # Retrieve relevant documents (over-fetching when a re-ranker will choose among them)
+        if self.reranker is None:
+            retrieved = await self._retrieve_relevant_docs(query)
+        else:
+            retrieved = await self._retrieve_relevant_docs(query, top_k=config.rerank_candidates)
+            retrieved = await self._rerank(query, retrieved)
+        documents, metadatas = retrieved["documents"], retrieved["metadatas"]
+        
+        if not documents:
+            return None
+        
+        # Extract sources for citation
+        sources = self._extract_sources(metadatas)
+        
+        with stage_timer("query", "answer_cache"):
+            cached_answer = self.answer_cache.lookup(retrieved["query_embedding"], retrieved["ids"])
+        metrics.record_cache("answer", cached_answer is not None)
+        
+        prepared = {
+            "prompt": None,
+            "cached_answer": cached_answer,
+            "sources": sources,
+            "conversation_id": conversation_id,
+            "query_embedding": retrieved["query_embedding"],
+            "chunk_ids": retrieved["ids"],
+            "source_names": {meta.get('source', 'Unknown') for meta in metadatas}
+        }
+        
+        if prepared["cached_answer"] is None:
+            with stage_timer("query", "prompt"):
+                # Create context
+                context = self._create_context(documents, metadatas)
+                # The SQLite store may wait on another worker's write lock
+                chat_history = await asyncio.to_thread(self.conversation_store.get_history, conversation_id)
+                prepared["prompt"] = self._build_prompt(query, context, chat_history)
+        
+        return prepared
+    
+    async def _save_answer(self, query: str, answer: str, prepared: Dict):
+        """Record an answer in conversation memory and, if freshly generated, the answer cache"""
+        await asyncio.to_thread(
+            self.conversation_store.append_exchange, prepared["conversation_id"], query, answer
+        )
+        
+        if prepared["cached_answer"] is None:
+            self.answer_cache.store(
+                prepared["query_embedding"],
+                prepared["chunk_ids"],
+                prepared["source_names"],
+                answer
+            )
+    
+    async def query(
+        self,
+        query: str,
+        conversation_id: Optional[str] = None
+    ) -> Tuple[str, List[str]]:
+        """
+        Process a query using RAG
+        
+        Args:
+            query: User's question
+            conversation_id: Optional conversation ID for context
+        
+        Returns:
+            Tuple of (response, sources)
+        """
+        conversation_id = conversation_id or "default"
+        with stage_timer("query", "total"):
+            return await self._answer(query, conversation_id)
+    
+    async def _answer(self, query: str, conversation_id: str) -> Tuple[str, List[str]]:
+        """Body of query(), which times the whole call"""
+        prepared = await self._prepare_query(query, conversation_id)
+        if prepared is None:
+            return NO_RESULTS_MESSAGE, []
+        
+        # Near-duplicate question over the same chunks: skip Gemini
+        if prepared["cached_answer"] is not None:
+            await self._save_answer(query, prepared["cached_answer"], prepared)
+            return prepared["cached_answer"], prepared["sources"]
         
         # Get response from Gemini LLM (using simple string prompt)
         try:
-            response = self.llm.invoke(full_prompt)
+            waiting = time.perf_counter()
+            async with self.llm_semaphore:
+                metrics.STAGE_SECONDS.observe(time.perf_counter() - waiting, "query", "llm_wait")
+                with stage_timer("query", "llm"):
+                    response = await self.llm.ainvoke(prepared["prompt"])
             answer = response.content
+            metrics.record_prompt_tokens("query", prepared["prompt"], response)
             
             # Save to memory
-            memory.chat_memory.add_user_message(query)
-            memory.chat_memory.add_ai_message(answer)
+            await self._save_answer(query, answer, prepared)
             
-            return answer, sources
+            return answer, prepared["sources"]
         except Exception as e:
+            metrics.LLM_ERRORS.inc("query")
             import traceback
             error_details = traceback.format_exc()
             print(f"❌ Error calling Gemini LLM:")
@@ -279,13 +457,91 @@ Provide a helpful answer based on the context:"""
             print(f"Traceback:\n{error_details}")
             raise Exception(f"Failed to get response from Gemini: {str(e)}")
     
+    async def stream_query(
+        self,
+        query: str,
+        conversation_id: Optional[str] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Process a query using RAG, yielding the answer as Gemini generates it
+        
+        Args:
+            query: User's question
+            conversation_id: Optional conversation ID for context
+        
+        Yields:
+            {"type": "sources", "sources": [...]} once, then
+            {"type": "token", "content": "..."} per chunk, then
+            {"type": "done", "conversation_id": "..."}
+        """
+        conversation_id = conversation_id or "default"
+        started = time.perf_counter()
+        
+        prepared = await self._prepare_query(query, conversation_id)
+        if prepared is None:
+            yield {"type": "sources", "sources": []}
+            yield {"type": "token", "content": NO_RESULTS_MESSAGE}
+            yield {"type": "done", "conversation_id": conversation_id}
+            return
+        
+        # Sources are known before generation starts, so send them first
+        yield {"type": "sources", "sources": prepared["sources"]}
+        
+        if prepared["cached_answer"] is not None:
+            yield {"type": "token", "content": prepared["cached_answer"]}
+            await self._save_answer(query, prepared["cached_answer"], prepared)
+            metrics.STAGE_SECONDS.observe(time.perf_counter() - started, "query", "total")
+            yield {"type": "done", "conversation_id": conversation_id}
+            return
+        
+        answer_parts = []
+        try:
+            waiting = time.perf_counter()
+            async with self.llm_semaphore:
+                generating = time.perf_counter()
+                metrics.STAGE_SECONDS.observe(generating - waiting, "query", "llm_wait")
+                async for chunk in self.llm.astream(prepared["prompt"]):
+                    if chunk.content:
+                        if not answer_parts:
+                            metrics.STAGE_SECONDS.observe(
+                                time.perf_counter() - generating, "query", "llm_first_token"
+                            )
+                        answer_parts.append(chunk.content)
+                        yield {"type": "token", "content": chunk.content}
+                metrics.STAGE_SECONDS.observe(time.perf_counter() - generating, "query", "llm")
+            metrics.record_prompt_tokens("query", prepared["prompt"])
+        except Exception as e:
+            metrics.LLM_ERRORS.inc("query")
+            import traceback
+            error_details = traceback.format_exc()
+            print(f"❌ Error streaming from Gemini LLM:")
+            print(f"Error: {str(e)}")
+            print(f"Traceback:\n{error_details}")
+            raise Exception(f"Failed to get response from Gemini: {str(e)}")
+        
+        # Only a completed answer is written to memory
+        await self._save_answer(query, "".join(answer_parts), prepared)
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - started, "query", "total")
+        
+        yield {"type": "done", "conversation_id": conversation_id}
+    
     async def get_collection_stats(self) -> Dict:
         """Get statistics about the document collection"""
+        lexical_index = self.embedding_service.lexical_index
         try:
             count = self.collection.count()
+            documents = self.embedding_service.catalog.stats()
             return {
                 "total_chunks": count,
+                "total_documents": documents["total_documents"],
+                "categories": documents["categories"],
                 "collection_name": config.collection_name,
+                "query_embedding_cache": self.query_cache.stats(),
+                "answer_cache": self.answer_cache.stats(),
+                "conversations": self.conversation_store.stats(),
+                "retrieval_mode": "hybrid" if self.embedding_service.lexical_index is not None else "dense",
+                "keyword_index": lexical_index.stats() if lexical_index is not None else None,
+                "reranker": self.reranker.stats() if self.reranker is not None else None,
                 "status": "healthy"
             }
         except Exception as e:
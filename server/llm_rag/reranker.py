@@ -0,0 +1,112 @@
+"""
+Cross-encoder re-ranking of retrieved chunks
+
+Retrieval over-fetches candidates; a small cross-encoder then reads each
+(question, chunk) pair and only the best few go into the prompt. Scoring runs
+on CPU in batches on a dedicated thread, under a per-query time budget: when
+the budget runs out the caller keeps the retrieval order and the remaining
+batches are abandoned.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from sentence_transformers import CrossEncoder
+
+from llm_rag.config import config
+
+
+class CrossEncoderReranker:
+    """
+    Orders candidate chunks by cross-encoder relevance to the query
+    
+    Args:
+        model_name: sentence-transformers CrossEncoder model
+        batch_size: (query, chunk) pairs scored per forward pass
+        budget_ms: Per-query limit; 0 disables it
+        workers: Threads scoring concurrently (queries beyond this wait their turn)
+    """
+    
+    def __init__(self, model_name: str, batch_size: int = 16, budget_ms: float = 250, workers: int = 1):
+        print(f"📦 Loading re-ranking model: {model_name}")
+        self.model = CrossEncoder(model_name, device="cpu")
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.budget = budget_ms / 1000
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="rag-rerank")
+        # The first forward pass is much slower; don't charge it to a user's budget
+        self.model.predict([("warm up", "warm up")])
+        
+        self.reranked = 0
+        self.fallbacks = 0
+        self.total_seconds = 0.0
+    
+    def _score(self, query: str, documents: List[str], cancelled: threading.Event) -> Optional[List[float]]:
+        """Scores for every document, or None if cancelled part way"""
+        scores: List[float] = []
+        for start in range(0, len(documents), self.batch_size):
+            if cancelled.is_set():
+                return None
+            pairs = [(query, document) for document in documents[start:start + self.batch_size]]
+            scores.extend(float(score) for score in self.model.predict(pairs, batch_size=self.batch_size))
+        return scores
+    
+    async def rerank(self, query: str, documents: List[str]) -> Optional[List[int]]:
+        """
+        Positions of `documents`, most relevant first
+        
+        Returns:
+            The new order, or None if the time budget ran out (keep the retrieval order)
+        """
+        if len(documents) < 2:
+            return list(range(len(documents)))
+        
+        cancelled = threading.Event()
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, self._score, query, documents, cancelled)
+        start = time.perf_counter()
+        try:
+            # The budget includes time spent queued behind other queries
+            scores = await asyncio.wait_for(future, timeout=self.budget or None)
+        except asyncio.TimeoutError:
+            scores = None
+        finally:
+            # Let a scoring thread that is still running stop after its current batch
+            cancelled.set()
+        self.total_seconds += time.perf_counter() - start
+        
+        if scores is None:
+            self.fallbacks += 1
+            return None
+        self.reranked += 1
+        return sorted(range(len(documents)), key=lambda i: scores[i], reverse=True)
+    
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+    
+    def stats(self) -> Dict:
+        queries = self.reranked + self.fallbacks
+        return {
+            "model": self.model_name,
+            "candidates": config.rerank_candidates,
+            "top_n": config.rerank_top_n,
+            "budget_ms": round(self.budget * 1000, 1),
+            "reranked": self.reranked,
+            "fallbacks": self.fallbacks,
+            "avg_ms": round(self.total_seconds / queries * 1000, 1) if queries else 0.0
+        }
+
+
+def create_reranker() -> Optional[CrossEncoderReranker]:
+    """Build the re-ranker configured in RAGConfig, if enabled"""
+    if not config.rerank_enabled:
+        return None
+    return CrossEncoderReranker(
+        config.rerank_model,
+        batch_size=config.rerank_batch_size,
+        budget_ms=config.rerank_budget_ms,
+        workers=config.rerank_workers
+    )
@@ -0,0 +1,84 @@
+"""
+Streaming uploads to disk
+
+Uploads are copied in fixed-size blocks and hashed on the way through, so a
+50 MB file costs one block of memory rather than 50 MB, and the size limit is
+enforced as soon as it is crossed instead of after the whole body is read.
+"""
+
+import hashlib
+import os
+import uuid
+from typing import NamedTuple
+
+import aiofiles
+from fastapi import UploadFile
+
+from llm_rag.config import config
+
+
+class FileTooLarge(ValueError):
+    """Upload exceeds max_file_size_mb"""
+
+
+class SavedUpload(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+
+
+def max_upload_bytes() -> int:
+    return config.max_file_size_mb * 1024 * 1024
+
+
+async def save_upload(file: UploadFile, path: str, max_bytes: int = None) -> SavedUpload:
+    """
+    Copy an upload to `path` block by block
+    
+    The data goes to a temporary file first and is only moved into place once
+    complete, so a rejected upload never clobbers an existing file. Each call
+    has its own temporary file, so concurrent uploads of one name never mix.
+    
+    Raises:
+        FileTooLarge: If the upload is bigger than max_bytes (0 disables the limit)
+    """
+    max_bytes = max_upload_bytes() if max_bytes is None else max_bytes
+    # Starlette knows the size of a spooled upload; reject without reading it
+    if max_bytes and (getattr(file, "size", None) or 0) > max_bytes:
+        raise FileTooLarge(_too_large_message(file.filename, max_bytes))
+    
+    block_size = config.upload_block_size_kb * 1024
+    digest = hashlib.sha256()
+    size = 0
+    partial_path = f"{path}.{uuid.uuid4().hex}.part"
+    try:
+        async with aiofiles.open(partial_path, 'wb') as f:
+            while True:
+                block = await file.read(block_size)
+                if not block:
+                    break
+                size += len(block)
+                if max_bytes and size > max_bytes:
+                    raise FileTooLarge(_too_large_message(file.filename, max_bytes))
+                digest.update(block)
+                await f.write(block)
+        os.replace(partial_path, path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    return SavedUpload(path=path, size=size, sha256=digest.hexdigest())
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 of a file already on disk, read in upload-sized blocks"""
+    digest = hashlib.sha256()
+    block_size = config.upload_block_size_kb * 1024
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _too_large_message(filename: str, max_bytes: int) -> str:
+    return f"File '{filename}' exceeds the {max_bytes // (1024 * 1024)} MB upload limit"
@@ -5,19 +5,37 @@ Main entry point for the RAG-powered chatbot API
 
 from fastapi import FastAPI, HTTPException, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
 import uvicorn
 from dotenv import load_dotenv
 import os
 import uuid
+import json
+import time
 import asyncio
-import aiofiles
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 
 from llm_rag.rag_pipeline import RAGPipeline
 from llm_rag.document_processor import DocumentProcessor
+from llm_rag.embedding_cache import EmbeddingStats
+from llm_rag.embeddings import chunk_filter
+from llm_rag.ingestion import IngestionPipeline
+from llm_rag.jobs import IngestionJobQueue, JobStore
+from llm_rag.uploads import FileTooLarge, save_upload
+from llm_rag.analyst import (
+    AnalystDocumentStore,
+    DocumentExpired,
+    DocumentIndex,
+    DocumentTooLarge,
+    build_analyst_prompt,
+    format_excerpts,
+)
+from llm_rag.config import config
+from llm_rag import metrics
+from llm_rag.metrics import stage_timer
 
 # Load environment variables
 load_dotenv()
@@ -45,22 +63,125 @@ app.add_middleware(
 # Initialize RAG pipeline and document processor
 rag_pipeline = None
 document_processor = None
+ingestion_pipeline = None
+# Background ingestion of single uploads; jobs persist in SQLite
+job_queue: Optional[IngestionJobQueue] = None
 
-# In-memory storage for analyst documents (session-based)
-# In production, consider using Redis or a database
-analyst_documents: Dict[str, Dict] = {}
+# Session storage for analyst documents (memory-bounded, spills to disk)
+analyst_store: Optional[AnalystDocumentStore] = None
+analyst_sweeper: Optional[asyncio.Task] = None
+# Caps concurrent Gemini calls from The Analyst (which shares rag_pipeline.llm)
+analyst_llm_semaphore: Optional[asyncio.Semaphore] = None
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize RAG pipeline on startup"""
-    global rag_pipeline, document_processor
+    global rag_pipeline, document_processor, ingestion_pipeline, job_queue, analyst_store, analyst_sweeper, analyst_llm_semaphore
     try:
         rag_pipeline = RAGPipeline()
         document_processor = DocumentProcessor()
+        ingestion_pipeline = IngestionPipeline(document_processor)
+        job_queue = IngestionJobQueue(
+            document_processor,
+            JobStore(config.job_db_path),
+            workers=config.ingest_job_workers,
+            on_success=finish_job
+        )
+        job_queue.start()
         print("✅ RAG pipeline initialized successfully")
     except Exception as e:
         print(f"❌ Error initializing RAG pipeline: {e}")
         raise
+    
+    analyst_store = AnalystDocumentStore(
+        spill_dir=config.analyst_spill_dir,
+        memory_budget_bytes=config.analyst_memory_budget_mb * 1024 * 1024,
+        spill_threshold_bytes=config.analyst_spill_threshold_mb * 1024 * 1024,
+        disk_budget_bytes=config.analyst_disk_budget_mb * 1024 * 1024,
+        ttl=timedelta(hours=config.analyst_ttl_hours)
+    )
+    analyst_sweeper = asyncio.create_task(sweep_analyst_documents())
+    analyst_llm_semaphore = asyncio.Semaphore(config.max_concurrent_analyst_calls)
+    
+    if config.gemini_base_url:
+        # RestChatGoogleGenerativeAI runs each Gemini call on the default executor, so it
+        # needs a thread for every call the two semaphores let through, on top of the usual
+        llm_threads = config.max_concurrent_llm_calls + config.max_concurrent_analyst_calls
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=llm_threads + min(32, (os.cpu_count() or 1) + 4))
+        )
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background tasks"""
+    if analyst_sweeper is not None:
+        analyst_sweeper.cancel()
+    if analyst_store is not None:
+        await asyncio.to_thread(analyst_store.close)
+    if job_queue is not None:
+        await job_queue.stop()
+    if rag_pipeline is not None and rag_pipeline.reranker is not None:
+        rag_pipeline.reranker.shutdown()
+    if document_processor is not None:
+        document_processor.shutdown()
+
+async def sweep_analyst_documents():
+    """Periodically drop expired analyst documents, even if nobody asks for them"""
+    while True:
+        await asyncio.sleep(config.analyst_sweep_interval_seconds)
+        try:
+            removed = await asyncio.to_thread(analyst_store.sweep)
+            if removed:
+                print(f"🧹 Removed {removed} expired analyst documents")
+        except Exception as e:
+            print(f"❌ Error sweeping analyst documents: {str(e)}")
+
+def invalidate_cached_answers(*sources: str):
+    """Drop cached chat answers generated from documents that changed"""
+    if rag_pipeline is None:
+        return
+    for source in sources:
+        rag_pipeline.answer_cache.invalidate_source(source)
+
+def finish_job(job: Dict):
+    """A background ingest or delete finished; its cached answers are stale"""
+    if job["kind"] == "delete" and not job["filename"]:
+        # A whole category went; clearing beats listing its documents
+        if rag_pipeline is not None:
+            rag_pipeline.answer_cache.clear()
+    else:
+        invalidate_cached_answers(job["filename"])
+
+async def delete_or_queue(source: Optional[str], category: Optional[str], chunk_count: int) -> Tuple[Optional[Dict], int]:
+    """
+    Remove the chunks of a document or category, batch by batch
+    
+    Deletes of up to delete_inline_max_chunks chunks run here, off the event
+    loop. Larger ones, and any delete of a document or category that a job
+    is still ingesting or deleting, are queued as a background job so they
+    run after it.
+    
+    Returns:
+        (queued job or None, chunks deleted so far)
+    """
+    if job_queue is not None and (
+        chunk_count > config.delete_inline_max_chunks or await job_queue.has_pending(source, category)
+    ):
+        return await job_queue.submit_delete(source, category, chunk_count), 0
+    
+    service = rag_pipeline.embedding_service
+    deleted = await asyncio.to_thread(service.delete_where, chunk_filter(source, category))
+    await asyncio.to_thread(service.catalog.remove, source, category)
+    return None, deleted
+
+def queued_delete_response(job: Dict, message: str) -> JSONResponse:
+    return JSONResponse(status_code=202, content={
+        "status": "queued",
+        "message": message,
+        "job_id": job["id"],
+        "status_url": f"/api/jobs/{job['id']}",
+        "chunks_to_delete": job["chunks_total"]
+    })
 
 # Request/Response models
 class ChatMessage(BaseModel):
@@ -140,31 +261,68 @@ async def chat(message: ChatMessage):
             detail=f"Error processing chat: {str(e)}"
         )
 
+@app.post("/api/chat/stream")
+async def chat_stream(message: ChatMessage):
+    """
+    Streaming chat endpoint - sends sources, then answer tokens, as Server-Sent Events
+    
+    Events: `sources`, then one `token` per chunk, then `done` (or `error`)
+    """
+    if rag_pipeline is None:
+        raise HTTPException(status_code=503, detail="RAG pipeline not initialized")
+    
+    async def event_stream():
+        try:
+            async for event in rag_pipeline.stream_query(
+                query=message.message,
+                conversation_id=message.conversation_id
+            ):
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        except Exception as e:
+            import traceback
+            error_details = traceback.format_exc()
+            print(f"❌ Error streaming chat response:")
+            print(f"Query: {message.message}")
+            print(f"Error: {str(e)}")
+            print(f"Traceback:\n{error_details}")
+            # Headers are already sent, so the error is reported in-band
+            error_event = {"type": "error", "detail": f"Error processing chat: {str(e)}"}
+            yield f"event: error\ndata: {json.dumps(error_event)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Stop nginx from buffering the stream
+        }
+    )
+
 @app.post("/api/documents/upload")
 async def upload_document(
     file: UploadFile = File(...),
     category: Optional[str] = None
 ):
     """
-    Upload and process documents for RAG
+    Upload a document for RAG
     Supports: PDF, DOCX, TXT, MD files
+    The file is saved and queued; poll /api/jobs/{job_id} for progress
     """
-    if document_processor is None:
+    if job_queue is None:
         raise HTTPException(status_code=503, detail="Document processor not initialized")
     
     try:
-        # Process and ingest document
-        result = await document_processor.process_and_ingest(
-            file=file,
-            category=category or "general"
-        )
-        
-        return JSONResponse(content={
-            "status": "success",
-            "message": f"Document '{file.filename}' processed successfully",
-            "chunks_created": result.get("chunks_created", 0),
-            "category": category or "general"
+        job = await job_queue.submit(file, category or "general")
+        return JSONResponse(status_code=202, content={
+            "status": "queued",
+            "message": f"Document '{file.filename}' queued for processing",
+            "job_id": job["id"],
+            "status_url": f"/api/jobs/{job['id']}",
+            "category": job["category"],
+            "size_bytes": job["size_bytes"]
         })
+    except FileTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
@@ -178,6 +336,29 @@ async def upload_document(
             detail=f"Error processing document: {str(e)}"
         )
 
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Stage, chunk progress, timings and (when finished) result of an ingestion or delete job"""
+    if job_queue is None:
+        raise HTTPException(status_code=503, detail="Document processor not initialized")
+    
+    job = await asyncio.to_thread(job_queue.store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    job.pop("path", None)
+    return JSONResponse(content=job)
+
+@app.get("/api/jobs")
+async def list_jobs(status: Optional[str] = None, limit: int = 50):
+    """Most recent ingestion and delete jobs, optionally filtered by status"""
+    if job_queue is None:
+        raise HTTPException(status_code=503, detail="Document processor not initialized")
+    
+    jobs = await asyncio.to_thread(job_queue.store.list, status, min(max(limit, 1), 500))
+    for job in jobs:
+        job.pop("path", None)
+    return JSONResponse(content={"jobs": jobs})
+
 @app.post("/api/documents/batch-upload")
 async def batch_upload_documents(
     files: List[UploadFile] = File(...),
@@ -185,32 +366,24 @@ async def batch_upload_documents(
 ):
     """
     Upload multiple documents at once
+    Files are saved, extracted, embedded and written concurrently; one failed
+    file does not stop the others
     """
-    if document_processor is None:
+    if document_processor is None or ingestion_pipeline is None:
         raise HTTPException(status_code=503, detail="Document processor not initialized")
     
-    results = []
-    for file in files:
-        try:
-            result = await document_processor.process_and_ingest(
-                file=file,
-                category=category or "general"
-            )
-            results.append({
-                "filename": file.filename,
-                "status": "success",
-                "chunks_created": result.get("chunks_created", 0)
-            })
-        except Exception as e:
-            results.append({
-                "filename": file.filename,
-                "status": "error",
-                "error": str(e)
-            })
+    embedding_stats = EmbeddingStats()
+    results = await ingestion_pipeline.ingest(
+        [{"filename": file.filename, "upload": file} for file in files],
+        category=category or "general",
+        embedding_stats=embedding_stats
+    )
+    invalidate_cached_answers(*(r["filename"] for r in results if r["status"] == "success"))
     
     return JSONResponse(content={
         "status": "completed",
-        "results": results
+        "results": results,
+        "embedding_cache": embedding_stats.as_dict()
     })
 
 @app.get("/api/documents/stats")
@@ -221,53 +394,49 @@ async def get_document_stats():
     
     try:
         stats = await rag_pipeline.get_collection_stats()
+        if document_processor is not None and document_processor.embedding_cache is not None:
+            stats["embedding_cache"] = await asyncio.to_thread(document_processor.embedding_cache.stats)
+        if job_queue is not None:
+            stats["ingestion_jobs"] = await asyncio.to_thread(job_queue.store.stats)
         return JSONResponse(content=stats)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting stats: {str(e)}")
 
 @app.get("/api/documents/list")
-async def list_documents():
-    """List all documents in the collection with their metadata"""
+async def list_documents(category: Optional[str] = None, offset: int = 0, limit: int = 100):
+    """List documents with their metadata, a page at a time, from the document catalog"""
     if rag_pipeline is None:
         raise HTTPException(status_code=503, detail="RAG pipeline not initialized")
     
     try:
-        # Get all documents from ChromaDB
-        results = rag_pipeline.collection.get()
-        
-        # Group by source (filename)
-        documents_by_source = {}
-        for i, doc_id in enumerate(results.get('ids', [])):
-            metadata = results.get('metadatas', [{}])[i] if results.get('metadatas') else {}
-            source = metadata.get('source', 'unknown')
-            category = metadata.get('category', 'general')
-            chunk_index = metadata.get('chunk_index', 0)
-            total_chunks = metadata.get('total_chunks', 1)
-            
-            if source not in documents_by_source:
-                documents_by_source[source] = {
-                    "filename": source,
-                    "category": category,
-                    "total_chunks": total_chunks,
-                    "chunk_ids": []
-                }
-            
-            documents_by_source[source]["chunk_ids"].append(doc_id)
+        catalog = rag_pipeline.embedding_service.catalog
+        documents, total_documents = await asyncio.to_thread(
+            catalog.list, category, max(offset, 0), min(max(limit, 1), 1000)
+        )
+        stats = await asyncio.to_thread(catalog.stats)
         
-        # Convert to list format
         documents_list = [
             {
-                "filename": info["filename"],
-                "category": info["category"],
-                "total_chunks": info["total_chunks"],
-                "chunk_count": len(info["chunk_ids"])
+                "filename": document["source"],
+                "category": document["category"],
+                "total_chunks": document["chunk_count"],
+                "chunk_count": document["chunk_count"],
+                "size_bytes": document["size_bytes"],
+                "sha256": document["sha256"],
+                "ingested_at": document["ingested_at"],
+                "updated_at": document["updated_at"]
             }
-            for info in documents_by_source.values()
+            for document in documents
         ]
         
         return JSONResponse(content={
-            "total_documents": len(documents_list),
-            "total_chunks": len(results.get('ids', [])),
+            "total_documents": total_documents,
+            "total_chunks": (
+                stats["total_chunks"] if category is None
+                else stats["categories"].get(category, {}).get("chunks", 0)
+            ),
+            "offset": offset,
+            "limit": limit,
             "documents": documents_list
         })
     except Exception as e:
@@ -285,33 +454,31 @@ async def get_document_details(filename: str):
         raise HTTPException(status_code=503, detail="RAG pipeline not initialized")
     
     try:
-        # Get all documents with matching source
-        results = rag_pipeline.collection.get(
-            where={"source": filename}
-        )
-        
-        if not results.get('ids'):
+        entries = await asyncio.to_thread(rag_pipeline.embedding_service.catalog.get, filename)
+        if not entries:
             raise HTTPException(status_code=404, detail=f"Document '{filename}' not found")
         
-        # Extract metadata
-        metadatas = results.get('metadatas', [])
-        documents = results.get('documents', [])
+        # IDs only, plus one chunk for the preview, rather than the whole document
+        chunk_ids = await asyncio.to_thread(
+            rag_pipeline.collection.get, where={"source": filename}, include=[]
+        )
+        sample = await asyncio.to_thread(
+            rag_pipeline.collection.get, where={"source": filename}, limit=1, include=["documents"]
+        )
+        documents = sample.get('documents') or []
         
-        if metadatas:
-            first_metadata = metadatas[0]
-            return JSONResponse(content={
-                "filename": filename,
-                "category": first_metadata.get('category', 'general'),
-                "total_chunks": len(results.get('ids', [])),
-                "chunk_ids": results.get('ids', []),
-                "sample_chunk": documents[0][:200] + "..." if documents and len(documents[0]) > 200 else (documents[0] if documents else "")
-            })
-        else:
-            return JSONResponse(content={
-                "filename": filename,
-                "total_chunks": len(results.get('ids', [])),
-                "chunk_ids": results.get('ids', [])
-            })
+        return JSONResponse(content={
+            "filename": filename,
+            "category": entries[0]["category"],
+            "categories": [entry["category"] for entry in entries],
+            "total_chunks": sum(entry["chunk_count"] for entry in entries),
+            "chunk_ids": chunk_ids.get('ids', []),
+            "size_bytes": entries[0]["size_bytes"],
+            "sha256": entries[0]["sha256"],
+            "ingested_at": entries[0]["ingested_at"],
+            "updated_at": entries[0]["updated_at"],
+            "sample_chunk": documents[0][:200] + "..." if documents and len(documents[0]) > 200 else (documents[0] if documents else "")
+        })
     except HTTPException:
         raise
     except Exception as e:
@@ -325,28 +492,29 @@ async def get_document_details(filename: str):
 
 @app.delete("/api/documents/{filename}")
 async def delete_document(filename: str):
-    """Delete a specific document from the collection"""
+    """
+    Delete a specific document from the collection
+    Large documents are deleted in the background; poll /api/jobs/{job_id}
+    """
     if rag_pipeline is None:
         raise HTTPException(status_code=503, detail="RAG pipeline not initialized")
     
     try:
-        # Get all chunk IDs for this document
-        results = rag_pipeline.collection.get(
-            where={"source": filename}
-        )
-        
-        if not results.get('ids'):
+        # The catalog knows the chunk count without reading any chunks
+        entries = await asyncio.to_thread(rag_pipeline.embedding_service.catalog.get, filename)
+        if not entries:
             raise HTTPException(status_code=404, detail=f"Document '{filename}' not found")
+        chunk_count = sum(entry["chunk_count"] for entry in entries)
         
-        chunk_ids = results.get('ids', [])
-        
-        # Delete all chunks
-        rag_pipeline.collection.delete(ids=chunk_ids)
+        job, chunks_deleted = await delete_or_queue(filename, None, chunk_count)
+        if job is not None:
+            return queued_delete_response(job, f"Document '{filename}' queued for deletion")
+        invalidate_cached_answers(filename)
         
         return JSONResponse(content={
             "status": "success",
             "message": f"Document '{filename}' deleted successfully",
-            "chunks_deleted": len(chunk_ids)
+            "chunks_deleted": chunks_deleted
         })
     except HTTPException:
         raise
@@ -361,34 +529,29 @@ async def delete_document(filename: str):
 
 @app.delete("/api/documents/category/{category}")
 async def delete_documents_by_category(category: str):
-    """Delete all documents in a specific category"""
+    """
+    Delete all documents in a specific category
+    Large categories are deleted in the background; poll /api/jobs/{job_id}
+    """
     if rag_pipeline is None:
         raise HTTPException(status_code=503, detail="RAG pipeline not initialized")
     
     try:
-        # Get all chunk IDs for this category
-        results = rag_pipeline.collection.get(
-            where={"category": category}
-        )
-        
-        if not results.get('ids'):
+        stats = await asyncio.to_thread(rag_pipeline.embedding_service.catalog.stats)
+        counts = stats["categories"].get(category)
+        if not counts:
             raise HTTPException(status_code=404, detail=f"No documents found in category '{category}'")
         
-        chunk_ids = results.get('ids', [])
-        
-        # Group by source to count documents
-        sources = set()
-        for metadata in results.get('metadatas', []):
-            sources.add(metadata.get('source', 'unknown'))
-        
-        # Delete all chunks
-        rag_pipeline.collection.delete(ids=chunk_ids)
+        job, chunks_deleted = await delete_or_queue(None, category, counts["chunks"])
+        if job is not None:
+            return queued_delete_response(job, f"All documents in category '{category}' queued for deletion")
+        rag_pipeline.answer_cache.clear()
         
         return JSONResponse(content={
             "status": "success",
             "message": f"All documents in category '{category}' deleted successfully",
-            "documents_deleted": len(sources),
-            "chunks_deleted": len(chunk_ids)
+            "documents_deleted": counts["documents"],
+            "chunks_deleted": chunks_deleted
         })
     except HTTPException:
         raise
@@ -414,24 +577,22 @@ async def delete_all_documents(confirm: bool = False):
         raise HTTPException(status_code=503, detail="RAG pipeline not initialized")
     
     try:
-        # Get all chunk IDs
-        results = rag_pipeline.collection.get()
-        chunk_ids = results.get('ids', [])
-        
-        if not chunk_ids:
+        service = rag_pipeline.embedding_service
+        if await asyncio.to_thread(service.collection.count) == 0:
             return JSONResponse(content={
                 "status": "success",
                 "message": "No documents to delete",
                 "chunks_deleted": 0
             })
         
-        # Delete all chunks
-        rag_pipeline.collection.delete(ids=chunk_ids)
+        # Dropping the collection is one operation however many chunks it holds
+        chunks_deleted = await asyncio.to_thread(service.reset_collection)
+        rag_pipeline.answer_cache.clear()
         
         return JSONResponse(content={
             "status": "success",
             "message": "All documents deleted successfully",
-            "chunks_deleted": len(chunk_ids)
+            "chunks_deleted": chunks_deleted
         })
     except Exception as e:
         import traceback
@@ -448,21 +609,21 @@ async def analyst_upload(file: UploadFile = File(...)):
     Upload a document for analysis in The Analyst section
     Documents are stored temporarily in memory for the session
     """
-    if document_processor is None:
+    if document_processor is None or analyst_store is None:
         raise HTTPException(status_code=503, detail="Document processor not initialized")
     
     try:
         # Generate unique document ID
         document_id = str(uuid.uuid4())
         
-        # Extract text from the document using the document processor
-        file_content = await file.read()
         file_ext = os.path.splitext(file.filename)[1].lower()
         
-        # Save file temporarily to extract text
+        # Stream the file to a temporary path to extract text
         temp_path = f"/tmp/analyst_{document_id}{file_ext}"
-        async with aiofiles.open(temp_path, 'wb') as f:
-            await f.write(file_content)
+        try:
+            await save_upload(file, temp_path)
+        except FileTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
         
         # Extract text using the document processor's public method
         try:
@@ -484,19 +645,25 @@ async def analyst_upload(file: UploadFile = File(...)):
         if not text or not text.strip():
             raise HTTPException(status_code=400, detail="No text content could be extracted from the document")
         
-        # Store document in memory (with expiration after 24 hours)
-        analyst_documents[document_id] = {
-            "filename": file.filename,
-            "text": text,
-            "uploaded_at": datetime.now(),
-            "expires_at": datetime.now() + timedelta(hours=24)
-        }
+        # Chunk and embed once so each question only sends the relevant parts
+        chunks = await asyncio.to_thread(document_processor.text_splitter.split_text, text)
+        embeddings = await document_processor.embedding_service.aembed_documents(chunks)
+        
+        # Store document for the session (expires after ANALYST_TTL_HOURS)
+        try:
+            await asyncio.to_thread(
+                analyst_store.put, document_id, file.filename, DocumentIndex(chunks, embeddings)
+            )
+        except DocumentTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
         
         return AnalystUploadResponse(
             document_id=document_id,
             filename=file.filename,
             message=f"Document '{file.filename}' uploaded successfully. You can now ask questions about it."
         )
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
@@ -509,61 +676,61 @@ async def analyst_upload(file: UploadFile = File(...)):
             detail=f"Error processing document: {str(e)}"
         )
 
+async def build_analyst_chat_prompt(request: AnalystChatRequest) -> str:
+    """Look up an analyst document and build the prompt for a question about it"""
+    # Check if document exists and has not expired
+    try:
+        with stage_timer("analyst_chat", "lookup"):
+            stored = await asyncio.to_thread(analyst_store.get, request.document_id)
+    except DocumentExpired:
+        raise HTTPException(status_code=410, detail="Document session has expired. Please upload again.")
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Document not found. Please upload the document first.")
+    
+    doc_data, index = stored
+    
+    # Retrieve only the chunks of this document that match the question
+    with stage_timer("analyst_chat", "encode"):
+        query_embedding = await rag_pipeline.query_batcher.embed(request.message)
+    with stage_timer("analyst_chat", "search"):
+        excerpts = index.context_for(query_embedding, config.analyst_top_k)
+    
+    # Create a prompt that includes the relevant document excerpts
+    with stage_timer("analyst_chat", "prompt"):
+        return build_analyst_prompt(
+            doc_data["filename"],
+            format_excerpts(index, excerpts),
+            request.message
+        )
+
 @app.post("/api/analyst/chat", response_model=AnalystChatResponse)
 async def analyst_chat(request: AnalystChatRequest):
     """
     Ask questions about an uploaded document in The Analyst section
     Uses RAG on the specific document content
     """
-    if rag_pipeline is None:
+    if rag_pipeline is None or analyst_store is None:
         raise HTTPException(status_code=503, detail="RAG pipeline not initialized")
     
-    # Check if document exists
-    if request.document_id not in analyst_documents:
-        raise HTTPException(status_code=404, detail="Document not found. Please upload the document first.")
-    
-    doc_data = analyst_documents[request.document_id]
-    
-    # Check if document has expired
-    if datetime.now() > doc_data["expires_at"]:
-        del analyst_documents[request.document_id]
-        raise HTTPException(status_code=410, detail="Document session has expired. Please upload again.")
-    
+    started = time.perf_counter()
     try:
-        # Create a temporary RAG query with the document content as context
-        # We'll use the document text directly as context instead of searching the vector DB
-        document_text = doc_data["text"]
-        
-        # Use the LLM to answer questions based on the document
-        from llm_rag.config import config
-        import google.generativeai as genai
-        
-        if not config.google_api_key:
-            raise ValueError("GOOGLE_API_KEY not found in environment variables")
-        
-        genai.configure(api_key=config.google_api_key)
-        model = genai.GenerativeModel(config.gemini_model)
-        
-        # Create a prompt that includes the document content
-        prompt = f"""You are an AI assistant helping analyze a document. Answer the user's question based ONLY on the following document content.
-
-Document: {doc_data['filename']}
-
-Document Content:
-{document_text}
-
-User Question: {request.message}
-
-Please provide a helpful answer based on the document content. If the document doesn't contain information to answer the question, say so. Format your response using markdown for better readability (use headings, lists, code blocks, etc.).
-
-Answer:"""
-        
-        # Get response from Gemini
-        response = model.generate_content(prompt)
-        answer = response.text
+        prompt = await build_analyst_chat_prompt(request)
+        
+        # Get response from Gemini using the client shared with the RAG pipeline
+        waiting = time.perf_counter()
+        async with analyst_llm_semaphore:
+            metrics.STAGE_SECONDS.observe(time.perf_counter() - waiting, "analyst_chat", "llm_wait")
+            with stage_timer("analyst_chat", "llm"):
+                response = await rag_pipeline.llm.ainvoke(prompt)
+        answer = response.content
+        metrics.record_prompt_tokens("analyst_chat", prompt, response)
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - started, "analyst_chat", "total")
         
         return AnalystChatResponse(response=answer)
+    except HTTPException:
+        raise
     except Exception as e:
+        metrics.LLM_ERRORS.inc("analyst_chat")
         import traceback
         error_details = traceback.format_exc()
         print(f"❌ Error processing analyst chat:")
@@ -576,15 +743,87 @@ Answer:"""
             detail=f"Error processing chat: {str(e)}"
         )
 
+@app.post("/api/analyst/chat/stream")
+async def analyst_chat_stream(request: AnalystChatRequest):
+    """
+    Streaming version of /api/analyst/chat over Server-Sent Events
+    
+    Events: one `token` per chunk, then `done` (or `error`)
+    """
+    if rag_pipeline is None or analyst_store is None:
+        raise HTTPException(status_code=503, detail="RAG pipeline not initialized")
+    
+    try:
+        prompt = await build_analyst_chat_prompt(request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
+    
+    async def event_stream():
+        try:
+            waiting = time.perf_counter()
+            async with analyst_llm_semaphore:
+                generating = time.perf_counter()
+                metrics.STAGE_SECONDS.observe(generating - waiting, "analyst_chat", "llm_wait")
+                first_token = True
+                async for chunk in rag_pipeline.llm.astream(prompt):
+                    if chunk.content:
+                        if first_token:
+                            metrics.STAGE_SECONDS.observe(
+                                time.perf_counter() - generating, "analyst_chat", "llm_first_token"
+                            )
+                            first_token = False
+                        event = {"type": "token", "content": chunk.content}
+                        yield f"event: token\ndata: {json.dumps(event)}\n\n"
+                metrics.STAGE_SECONDS.observe(time.perf_counter() - generating, "analyst_chat", "llm")
+            metrics.record_prompt_tokens("analyst_chat", prompt)
+            yield f"event: done\ndata: {json.dumps({'type': 'done'})}\n\n"
+        except Exception as e:
+            metrics.LLM_ERRORS.inc("analyst_chat")
+            import traceback
+            error_details = traceback.format_exc()
+            print(f"❌ Error streaming analyst chat:")
+            print(f"Document ID: {request.document_id}")
+            print(f"Question: {request.message}")
+            print(f"Error: {str(e)}")
+            print(f"Traceback:\n{error_details}")
+            error_event = {"type": "error", "detail": f"Error processing chat: {str(e)}"}
+            yield f"event: error\ndata: {json.dumps(error_event)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Stop nginx from buffering the stream
+        }
+    )
+
 @app.delete("/api/analyst/document/{document_id}")
 async def delete_analyst_document(document_id: str):
     """Delete an uploaded analyst document"""
-    if document_id in analyst_documents:
-        del analyst_documents[document_id]
+    if analyst_store is not None and await asyncio.to_thread(analyst_store.delete, document_id):
         return JSONResponse(content={"status": "success", "message": "Document deleted"})
     else:
         raise HTTPException(status_code=404, detail="Document not found")
 
+@app.get("/metrics")
+async def get_metrics():
+    """Stage timing histograms and counters in Prometheus text format (this worker only)"""
+    if not config.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (METRICS_ENABLED=false)")
+    
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/analyst/stats")
+async def get_analyst_stats():
+    """Memory/disk usage and eviction counters of the analyst document store"""
+    if analyst_store is None:
+        raise HTTPException(status_code=503, detail="Analyst store not initialized")
+    
+    return JSONResponse(content=analyst_store.stats())
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
@@ -10,6 +10,7 @@ Usage:
 """
 
 import sys
+import time
 import requests
 import json
 from typing import Optional
@@ -19,9 +20,19 @@ API_BASE_URL = "http://localhost:8000"
 def list_documents():
     """List all documents in the collection"""
     try:
-        response = requests.get(f"{API_BASE_URL}/api/documents/list")
-        response.raise_for_status()
-        data = response.json()
+        # The list is paginated; fetch every page
+        documents = []
+        while True:
+            response = requests.get(
+                f"{API_BASE_URL}/api/documents/list",
+                params={"offset": len(documents), "limit": 1000}
+            )
+            response.raise_for_status()
+            data = response.json()
+            documents.extend(data['documents'])
+            if not data['documents'] or len(documents) >= data['total_documents']:
+                break
+        data['documents'] = documents
         
         print("\n📚 Documents in RAG System:")
         print("=" * 60)
@@ -77,6 +88,21 @@ def show_document(filename: str):
         print(f"❌ Error: {e}")
         sys.exit(1)
 
+def wait_for_delete(data: dict) -> dict:
+    """Follow a delete the server queued as a background job; returns its result"""
+    print(f"\n⏳ {data['message']} ({data['chunks_to_delete']} chunks)")
+    while True:
+        response = requests.get(f"{API_BASE_URL}{data['status_url']}")
+        response.raise_for_status()
+        job = response.json()
+        if job['status'] == 'success':
+            print()
+            return job['result']
+        if job['status'] == 'error':
+            raise RuntimeError(f"Delete job failed: {job['error']}")
+        print(f"\r   {job['chunks_done']}/{job['chunks_total']} chunks deleted", end="", flush=True)
+        time.sleep(1)
+
 def delete_document(filename: str, confirm: bool = False):
     """Delete a specific document"""
     if not confirm:
@@ -90,6 +116,9 @@ def delete_document(filename: str, confirm: bool = False):
         response = requests.delete(f"{API_BASE_URL}/api/documents/{filename}")
         response.raise_for_status()
         data = response.json()
+        if response.status_code == 202:
+            data = wait_for_delete(data)
+            data['message'] = f"Document '{filename}' deleted successfully"
         
         print(f"\n✅ {data['message']}")
         print(f"   Chunks deleted: {data['chunks_deleted']}\n")
@@ -119,6 +148,9 @@ def delete_category(category: str, confirm: bool = False):
         response = requests.delete(f"{API_BASE_URL}/api/documents/category/{category}")
         response.raise_for_status()
         data = response.json()
+        if response.status_code == 202:
+            data = wait_for_delete(data)
+            data['message'] = f"All documents in category '{category}' deleted successfully"
         
         print(f"\n✅ {data['message']}")
         print(f"   Documents deleted: {data['documents_deleted']}")
@@ -176,7 +208,10 @@ def show_stats():
         print("=" * 60)
         print(f"Status: {data['status']}")
         print(f"Collection Name: {data['collection_name']}")
+        print(f"Total Documents: {data['total_documents']}")
         print(f"Total Chunks: {data['total_chunks']}")
+        for category, counts in data.get('categories', {}).items():
+            print(f"   {category}: {counts['documents']} documents, {counts['chunks']} chunks")
         print("\n")
     except requests.exceptions.ConnectionError:
         print("❌ Error: Could not connect to API. Make sure the server is running on http://localhost:8000")
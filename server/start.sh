@@ -28,5 +28,5 @@ fi
 
 # Start the server
 echo "Starting server..."
-python main.py
+uvicorn main:app --host localhost --port 8000
 
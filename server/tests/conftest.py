@@ -0,0 +1,10 @@
+"""
+Shared pytest setup
+
+Run from server/: python -m pytest tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,103 @@
+import os
+from datetime import timedelta
+
+import pytest
+
+from llm_rag.analyst import AnalystDocumentStore, DocumentExpired, DocumentIndex, DocumentTooLarge
+
+
+def make_index(n: int = 4) -> DocumentIndex:
+    return DocumentIndex([f"chunk {i}" for i in range(n)], [[float(i), 1.0] for i in range(n)])
+
+
+def make_store(spill_dir, **overrides) -> AnalystDocumentStore:
+    options = dict(
+        memory_budget_bytes=1 << 20,
+        spill_threshold_bytes=1 << 20,
+        disk_budget_bytes=1 << 20
+    )
+    options.update(overrides)
+    return AnalystDocumentStore(spill_dir=str(spill_dir), **options)
+
+
+def test_large_documents_spill_to_disk_and_load_back(tmp_path):
+    store = make_store(tmp_path, spill_threshold_bytes=0)
+    store.put("doc", "report.pdf", make_index())
+    
+    assert store.stats()["documents_on_disk"] == 1
+    entry, index = store.get("doc")
+    assert entry["filename"] == "report.pdf"
+    assert index.chunks == make_index().chunks
+
+
+def test_missing_spill_file_reads_as_expired(tmp_path):
+    store = make_store(tmp_path, spill_threshold_bytes=0)
+    store.put("doc", "report.pdf", make_index())
+    os.remove(os.path.join(store.spill_dir, "doc.npz"))
+    
+    with pytest.raises(DocumentExpired):
+        store.get("doc")
+    assert store.stats()["documents"] == 0
+    assert store.stats()["disk_bytes"] == 0
+
+
+def test_stores_sharing_a_spill_dir_keep_each_others_files(tmp_path):
+    first = make_store(tmp_path, spill_threshold_bytes=0)
+    first.put("doc", "report.pdf", make_index())
+    
+    # A second worker (or a restart during a rolling deploy) on the same directory
+    second = make_store(tmp_path, spill_threshold_bytes=0)
+    second.close()
+    
+    assert first.get("doc") is not None
+    assert first.spill_dir != second.spill_dir
+    assert not os.path.exists(second.spill_dir)
+
+
+def test_memory_budget_spills_least_recently_used(tmp_path):
+    index = make_index()
+    store = make_store(tmp_path, memory_budget_bytes=index.nbytes)
+    store.put("old", "old.md", make_index())
+    store.put("new", "new.md", make_index())
+    
+    assert store._entries["old"]["index"] is None
+    assert store._entries["new"]["index"] is not None
+
+
+def test_index_size_counts_encoded_text():
+    index = DocumentIndex(["é" * 10], [[1.0, 0.0]])
+    
+    assert index.nbytes == index.matrix.nbytes + 20
+
+
+def test_disk_budget_drops_older_documents_not_the_new_one(tmp_path):
+    probe = make_store(tmp_path / "probe", spill_threshold_bytes=0)
+    probe.put("doc", "report.pdf", make_index())
+    spill_bytes = probe.stats()["disk_bytes"]
+    
+    store = make_store(tmp_path, spill_threshold_bytes=0, disk_budget_bytes=spill_bytes * 3 // 2)
+    store.put("old", "old.md", make_index())
+    store.put("new", "new.md", make_index())
+    
+    assert store.get("old") is None
+    assert store.get("new")[1].chunks == make_index().chunks
+    assert store.stats()["evictions"] == 1
+
+
+def test_document_bigger_than_the_disk_budget_is_rejected(tmp_path):
+    store = make_store(tmp_path, spill_threshold_bytes=0, disk_budget_bytes=1)
+    
+    with pytest.raises(DocumentTooLarge):
+        store.put("doc", "huge.pdf", make_index())
+    assert store.get("doc") is None
+    assert store.stats()["disk_bytes"] == 0
+    assert os.listdir(store.spill_dir) == []
+
+
+def test_sweep_removes_expired_documents(tmp_path):
+    store = make_store(tmp_path, ttl=timedelta(seconds=-1))
+    store.put("doc", "report.pdf", make_index())
+    
+    assert store.sweep() == 1
+    with pytest.raises(DocumentExpired):
+        store.get("doc")
@@ -0,0 +1,67 @@
+from llm_rag import answer_cache
+from llm_rag.answer_cache import SemanticAnswerCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+def test_near_duplicate_question_over_same_chunks_hits():
+    cache = SemanticAnswerCache(similarity_threshold=0.9)
+    cache.store([1.0, 0.0], ["a", "b"], ["doc.md"], "answer")
+    
+    assert cache.lookup([0.99, 0.05], ["b", "a"]) == "answer"
+    assert cache.lookup([0.0, 1.0], ["a", "b"]) is None
+    assert cache.lookup([1.0, 0.0], ["a"]) is None
+
+
+def test_expired_entries_drop_their_group_and_source(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(answer_cache.time, "monotonic", clock)
+    cache = SemanticAnswerCache(ttl_seconds=10)
+    cache.store([1.0, 0.0], ["a"], ["doc.md"], "answer")
+    
+    clock.now += 11
+    assert cache.lookup([1.0, 0.0], ["a"]) is None
+    assert cache._groups == {}
+    assert cache._by_source == {}
+    assert cache.stats()["size"] == 0
+
+
+def test_per_chunk_set_eviction_forgets_unused_sources():
+    cache = SemanticAnswerCache(max_per_chunk_set=2)
+    cache.store([1.0, 0.0], ["a"], ["old.md"], "first")
+    cache.store([0.0, 1.0], ["a"], ["new.md"], "second")
+    cache.store([0.7, 0.7], ["a"], ["new.md"], "third")
+    
+    assert len(cache._groups[frozenset(["a"])]) == 2
+    assert "old.md" not in cache._by_source
+    assert cache._by_source["new.md"] == {frozenset(["a"])}
+    assert cache.invalidate_source("old.md") == 0
+    assert cache.stats()["size"] == 2
+
+
+def test_lru_eviction_keeps_source_index_in_step():
+    cache = SemanticAnswerCache(max_size=2)
+    cache.store([1.0, 0.0], ["a"], ["a.md"], "a")
+    cache.store([1.0, 0.0], ["b"], ["b.md"], "b")
+    cache.store([1.0, 0.0], ["c"], ["c.md"], "c")
+    
+    assert list(cache._groups) == [frozenset(["b"]), frozenset(["c"])]
+    assert set(cache._by_source) == {"b.md", "c.md"}
+
+
+def test_invalidate_source_removes_only_answers_using_it():
+    cache = SemanticAnswerCache()
+    cache.store([1.0, 0.0], ["a"], ["shared.md", "a.md"], "a")
+    cache.store([1.0, 0.0], ["b"], ["b.md"], "b")
+    
+    assert cache.invalidate_source("shared.md") == 1
+    assert cache.lookup([1.0, 0.0], ["a"]) is None
+    assert cache.lookup([1.0, 0.0], ["b"]) == "b"
+    assert set(cache._by_source) == {"b.md"}
+    assert cache.stats()["size"] == 1
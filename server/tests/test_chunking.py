@@ -0,0 +1,146 @@
+import asyncio
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from llm_rag.chunking import PageChunker
+from llm_rag.config import config
+from llm_rag.document_processor import DocumentProcessor
+from llm_rag.ingestion import IngestionPipeline
+
+CHUNK_SIZE = 200
+CHUNK_OVERLAP = 40
+
+
+def make_chunker(window_chunks: int = 2) -> PageChunker:
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    return PageChunker(splitter, CHUNK_SIZE, CHUNK_OVERLAP, window_chunks=window_chunks)
+
+
+def make_pages(count: int = 6):
+    return [
+        (page, "\n\n".join(f"p{page}s{n} " + "lorem ipsum " * (n % 7 + 1) for n in range(12)))
+        for page in range(1, count + 1)
+    ]
+
+
+def chunk_all(chunker: PageChunker, pages):
+    records = []
+    for page, text in pages:
+        records.extend(chunker.feed(text, page))
+    return records + chunker.flush()
+
+
+def test_chunks_stay_within_chunk_size_and_lose_no_text():
+    records = chunk_all(make_chunker(), make_pages())
+    chunks = [chunk for chunk, _ in records]
+    
+    assert all(len(chunk) <= CHUNK_SIZE for chunk in chunks)
+    for page, text in make_pages():
+        for sentence in text.split("\n\n"):
+            assert any(sentence.strip() in chunk for chunk in chunks), sentence
+
+
+def test_overlap_carries_across_page_boundaries():
+    records = chunk_all(make_chunker(window_chunks=1), make_pages(2))
+    
+    # Some chunk starts on page 1 and ends on page 2
+    assert any(meta == {"page": 1, "page_end": 2} for _, meta in records)
+    # Consecutive chunks share text, including across the window edge
+    chunks = [chunk for chunk, _ in records]
+    shared = [a[-10:] in b or b[:10] in a for a, b in zip(chunks, chunks[1:])]
+    assert sum(shared) >= len(shared) - 1
+
+
+def test_page_metadata_follows_the_text():
+    for chunk, meta in chunk_all(make_chunker(), make_pages()):
+        first_marker = chunk.split("s", 1)[0]
+        if first_marker.startswith("p") and first_marker[1:].isdigit():
+            assert meta["page"] <= int(first_marker[1:]) <= meta["page_end"]
+
+
+def test_text_shorter_than_the_window_splits_like_the_splitter():
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    text = make_pages(1)[0][1]
+    chunker = PageChunker(splitter, CHUNK_SIZE, CHUNK_OVERLAP, window_chunks=100)
+    
+    assert [chunk for chunk, _ in chunk_all(chunker, [(None, text)])] == splitter.split_text(text)
+
+
+def test_blank_input_produces_no_chunks():
+    chunker = make_chunker()
+    assert chunker.feed("", 1) == []
+    assert chunk_all(chunker, [(1, "   \n  ")]) == []
+
+
+class FakeCollection:
+    def __init__(self):
+        self.rows = {}
+    
+    def get(self, where=None, include=None):
+        return {"ids": [], "metadatas": []}
+    
+    def update(self, ids, metadatas):
+        for chunk_id, metadata in zip(ids, metadatas):
+            self.rows[chunk_id] = (self.rows[chunk_id][0], metadata)
+
+
+class FakeEmbeddingService:
+    model_name = "fake"
+    
+    def __init__(self):
+        self.collection = FakeCollection()
+        self.add_sizes = []
+    
+    def add_chunks(self, ids, documents, metadatas, embeddings):
+        self.add_sizes.append(len(ids))
+        for chunk_id, document, metadata in zip(ids, documents, metadatas):
+            self.collection.rows[chunk_id] = (document, dict(metadata))
+    
+    def delete_chunks(self, ids):
+        for chunk_id in ids:
+            self.collection.rows.pop(chunk_id, None)
+    
+    async def aembed_documents(self, texts):
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+class FakeCatalog:
+    def upsert(self, *args, **kwargs):
+        pass
+    
+    def remove(self, *args, **kwargs):
+        pass
+
+
+def test_batch_pipeline_streams_pages_in_bounded_parts(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "chunk_size", CHUNK_SIZE)
+    monkeypatch.setattr(config, "chunk_overlap", CHUNK_OVERLAP)
+    monkeypatch.setattr(config, "ingest_embed_batch_size", 4)
+    monkeypatch.setattr(config, "ingest_queue_size", 1)
+    
+    processor = DocumentProcessor.__new__(DocumentProcessor)
+    processor.embedding_service = FakeEmbeddingService()
+    processor.catalog = FakeCatalog()
+    processor.embedding_cache = None
+    processor._seconds_per_chunk = 0.0
+    processor.text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    pages_read = []
+    
+    async def iter_pages(file_path, file_type):
+        for page, text in make_pages():
+            pages_read.append(page)
+            yield page, text
+    
+    processor.iter_pages = iter_pages
+    path = tmp_path / "manual.pdf"
+    path.write_bytes(b"%PDF")
+    
+    [result] = asyncio.run(IngestionPipeline(processor).ingest([{"filename": "manual.pdf", "path": str(path)}]))
+    
+    rows = processor.embedding_service.collection.rows
+    assert result["status"] == "success"
+    assert result["chunks_created"] == len(rows) > 4
+    assert max(processor.embedding_service.add_sizes) <= 4
+    assert pages_read == [1, 2, 3, 4, 5, 6]
+    assert {metadata["total_chunks"] for _, metadata in rows.values()} == {len(rows)}
+    assert {metadata["page"] for _, metadata in rows.values()} == set(pages_read)
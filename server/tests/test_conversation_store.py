@@ -0,0 +1,98 @@
+import asyncio
+import threading
+
+from llm_rag.conversation_store import InMemoryConversationStore, SQLiteConversationStore
+from llm_rag.rag_pipeline import RAGPipeline
+
+
+def test_memory_store_keeps_last_messages_per_conversation():
+    store = InMemoryConversationStore(max_messages=4)
+    for n in range(3):
+        store.append_exchange("c", f"q{n}", f"a{n}")
+    
+    assert store.get_history("c") == [("user", "q1"), ("assistant", "a1"), ("user", "q2"), ("assistant", "a2")]
+    assert store.get_history("other") == []
+
+
+def test_memory_store_evicts_least_recently_used_conversation():
+    store = InMemoryConversationStore(max_conversations=2)
+    store.append_exchange("a", "q", "a")
+    store.append_exchange("b", "q", "a")
+    store.get_history("a")
+    store.append_exchange("c", "q", "a")
+    
+    assert store.get_history("b") == []
+    assert store.get_history("a") != []
+    assert store.stats()["evictions"] == 1
+
+
+def test_sqlite_store_trims_and_is_shared_through_the_file(tmp_path):
+    path = str(tmp_path / "conversations.db")
+    writer = SQLiteConversationStore(path, max_messages=2)
+    writer.append_exchange("c", "q0", "a0")
+    writer.append_exchange("c", "q1", "a1")
+    
+    # A second store on the same file stands in for another worker
+    reader = SQLiteConversationStore(path, max_messages=2)
+    assert reader.get_history("c") == [("user", "q1"), ("assistant", "a1")]
+    assert reader.stats()["messages"] == 2
+    
+    reader.clear("c")
+    assert writer.get_history("c") == []
+
+
+def test_sqlite_store_drops_least_recently_active_conversations_past_the_cap(tmp_path):
+    store = SQLiteConversationStore(str(tmp_path / "conversations.db"), max_conversations=2, prune_every=1)
+    store.append_exchange("a", "q", "a")
+    store.append_exchange("b", "q", "a")
+    store.append_exchange("a", "q2", "a2")
+    store.append_exchange("c", "q", "a")
+    
+    assert store.get_history("b") == []
+    assert len(store.get_history("a")) == 4
+    assert store.get_history("c") != []
+    assert store.stats()["conversations"] == 2
+    assert store.stats()["evictions"] == 1
+
+
+def test_sqlite_store_drops_idle_conversations_after_the_ttl(tmp_path, monkeypatch):
+    from llm_rag import conversation_store
+    
+    now = [1000.0]
+    monkeypatch.setattr(conversation_store.time, "time", lambda: now[0])
+    store = SQLiteConversationStore(str(tmp_path / "conversations.db"), ttl_seconds=60, prune_every=1)
+    store.append_exchange("idle", "q", "a")
+    store.append_exchange("active", "q", "a")
+    now[0] += 50
+    store.append_exchange("active", "q2", "a2")
+    now[0] += 50
+    store.append_exchange("new", "q", "a")
+    
+    assert store.get_history("idle") == []
+    assert len(store.get_history("active")) == 4
+    assert store.get_history("new") != []
+
+
+class RecordingStore(InMemoryConversationStore):
+    def __init__(self):
+        super().__init__()
+        self.threads = []
+    
+    def get_history(self, conversation_id):
+        self.threads.append(threading.get_ident())
+        return super().get_history(conversation_id)
+    
+    def append_exchange(self, conversation_id, user_message, ai_message):
+        self.threads.append(threading.get_ident())
+        super().append_exchange(conversation_id, user_message, ai_message)
+
+
+def test_pipeline_saves_answers_off_the_event_loop():
+    pipeline = RAGPipeline.__new__(RAGPipeline)
+    pipeline.conversation_store = RecordingStore()
+    prepared = {"conversation_id": "c", "cached_answer": "cached"}
+    
+    asyncio.run(pipeline._save_answer("q", "cached", prepared))
+    
+    assert pipeline.conversation_store.get_history("c") == [("user", "q"), ("assistant", "cached")]
+    assert pipeline.conversation_store.threads[0] != threading.get_ident()
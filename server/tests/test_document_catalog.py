@@ -0,0 +1,78 @@
+from llm_rag import embeddings
+from llm_rag.document_catalog import DocumentCatalog
+from llm_rag.embeddings import GENERATION_CHECK_SECONDS, EmbeddingService
+
+
+def test_upsert_list_and_remove(tmp_path):
+    catalog = DocumentCatalog(str(tmp_path / "catalog.db"))
+    catalog.upsert("a.md", "dev_setup", 3, size_bytes=10, sha256="x")
+    catalog.upsert("b.md", "general", 2)
+    catalog.upsert("a.md", "dev_setup", 5)
+    
+    documents, total = catalog.list(category="dev_setup")
+    assert total == 1
+    assert documents[0]["chunk_count"] == 5
+    assert catalog.stats()["total_chunks"] == 7
+    
+    assert catalog.remove(category="general") == 1
+    assert catalog.get("b.md") == []
+
+
+def test_generation_is_shared_through_the_file(tmp_path):
+    path = str(tmp_path / "catalog.db")
+    first, second = DocumentCatalog(path), DocumentCatalog(path)
+    
+    assert first.collection_generation() == 0
+    assert second.bump_collection_generation() == 1
+    assert first.collection_generation() == 1
+
+
+class CountingCatalog(DocumentCatalog):
+    def __init__(self, db_path):
+        super().__init__(db_path)
+        self.reads = 0
+    
+    def collection_generation(self):
+        self.reads += 1
+        return super().collection_generation()
+
+
+class FakeClient:
+    def __init__(self):
+        self.opened = 0
+    
+    def get_or_create_collection(self, name, metadata=None):
+        self.opened += 1
+        return f"collection-{self.opened}"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+def test_collection_rechecks_generation_at_most_every_interval(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(embeddings.time, "monotonic", clock)
+    path = str(tmp_path / "catalog.db")
+    service = EmbeddingService.__new__(EmbeddingService)
+    service.catalog = CountingCatalog(path)
+    service.chroma_client = FakeClient()
+    service._generation = service.catalog.collection_generation()
+    service._generation_checked_at = clock()
+    service._collection = service._open_collection()
+    service.catalog.reads = 0
+    
+    for _ in range(100):
+        assert service.collection == "collection-1"
+    assert service.catalog.reads == 0
+    
+    # Another process recreates the collection
+    DocumentCatalog(path).bump_collection_generation()
+    clock.now += GENERATION_CHECK_SECONDS
+    assert service.collection == "collection-2"
+    assert service.collection == "collection-2"
+    assert service.catalog.reads == 1
@@ -0,0 +1,74 @@
+import itertools
+
+import pytest
+
+from llm_rag import embedding_cache
+from llm_rag.embedding_cache import EmbeddingCache
+
+
+@pytest.fixture
+def ticking_clock(monkeypatch):
+    """Every time.time() call is one second after the last, so last_used never ties"""
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: float(next(ticks)))
+
+
+def record_counts(cache: EmbeddingCache):
+    statements = []
+    cache._connection().set_trace_callback(statements.append)
+    return lambda: sum("COUNT(*)" in statement for statement in statements)
+
+
+def test_least_recently_used_vectors_are_evicted(tmp_path, ticking_clock):
+    cache = EmbeddingCache(str(tmp_path / "embedding_cache.db"), max_entries=10)
+    for n in range(10):
+        cache.put_many("model", {f"h{n}": [float(n)]})
+    cache.get_many("model", ["h0"])
+    
+    # 11 entries: trim to 90% of the limit, oldest use first
+    cache.put_many("model", {"h10": [10.0]})
+    
+    remaining = cache.get_many("model", [f"h{n}" for n in range(11)])
+    assert sorted(remaining) == sorted(["h0"] + [f"h{n}" for n in range(3, 11)])
+    assert cache.stats()["entries"] == 9
+    assert cache.stats()["evictions"] == 2
+
+
+def test_puts_below_the_limit_do_not_count_rows(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embedding_cache.db"), max_entries=100)
+    counts = record_counts(cache)
+    
+    for n in range(50):
+        cache.put_many("model", {f"h{n}": [float(n)]})
+    assert counts() == 1
+    
+    for n in range(50, 101):
+        cache.put_many("model", {f"h{n}": [float(n)]})
+    assert counts() == 2
+    assert cache.stats()["entries"] == 90
+
+
+def test_float16_vectors_round_trip_at_half_the_size(tmp_path):
+    vector = [0.1, -0.25, 0.5, 1.0 / 3]
+    half = EmbeddingCache(str(tmp_path / "half.db"), dtype="float16")
+    full = EmbeddingCache(str(tmp_path / "full.db"), dtype="float32")
+    half.put_many("model", {"h": vector})
+    full.put_many("model", {"h": vector})
+    
+    restored = half.get_many("model", ["h", "missing"])
+    assert list(restored) == ["h"]
+    assert restored["h"] == pytest.approx(vector, abs=1e-3)
+    assert full.get_many("model", ["h"])["h"] == pytest.approx(vector, abs=1e-7)
+    
+    (half_bytes,) = half._connection().execute("SELECT LENGTH(vector) FROM chunk_embeddings").fetchone()
+    (full_bytes,) = full._connection().execute("SELECT LENGTH(vector) FROM chunk_embeddings").fetchone()
+    assert (half_bytes, full_bytes) == (8, 16)
+    assert (half.hits, half.misses) == (1, 1)
+
+
+def test_vectors_are_kept_per_model(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embedding_cache.db"))
+    cache.put_many("model-a", {"h": [1.0]})
+    
+    assert cache.get_many("model-b", ["h"]) == {}
+    assert cache.get_many("model-a", ["h"]) == {"h": [1.0]}
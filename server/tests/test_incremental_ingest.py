@@ -0,0 +1,167 @@
+import asyncio
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from llm_rag.config import config
+from llm_rag.document_processor import DocumentProcessor
+from llm_rag.uploads import SavedUpload
+
+CHUNK_SIZE = 200
+
+
+class FakeCollection:
+    def __init__(self):
+        self.rows = {}
+        self.updates = []
+    
+    def get(self, where=None, include=None):
+        wanted = {key: value for clause in where["$and"] for key, value in clause.items()}
+        ids = [
+            chunk_id for chunk_id, (_, metadata) in self.rows.items()
+            if all(metadata.get(key) == value for key, value in wanted.items())
+        ]
+        return {"ids": ids, "metadatas": [dict(self.rows[chunk_id][1]) for chunk_id in ids]}
+    
+    def update(self, ids, metadatas):
+        self.updates.extend(ids)
+        for chunk_id, metadata in zip(ids, metadatas):
+            self.rows[chunk_id] = (self.rows[chunk_id][0], dict(metadata))
+
+
+class FakeEmbeddingService:
+    model_name = "fake"
+    
+    def __init__(self):
+        self.collection = FakeCollection()
+        self.added = []
+        self.deleted = []
+    
+    def add_chunks(self, ids, documents, metadatas, embeddings):
+        self.added.extend(dict(metadata) for metadata in metadatas)
+        for chunk_id, document, metadata in zip(ids, documents, metadatas):
+            self.collection.rows[chunk_id] = (document, dict(metadata))
+    
+    def delete_chunks(self, ids):
+        self.deleted.extend(ids)
+        for chunk_id in ids:
+            self.collection.rows.pop(chunk_id, None)
+    
+    async def aembed_documents(self, texts):
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+class FakeCatalog:
+    def __init__(self):
+        self.documents = {}
+    
+    def upsert(self, source, category, chunk_count, size_bytes=None, sha256=None):
+        self.documents[(source, category)] = chunk_count
+    
+    def remove(self, source, category):
+        self.documents.pop((source, category), None)
+
+
+def make_processor(monkeypatch, text_by_path) -> DocumentProcessor:
+    monkeypatch.setattr(config, "chunk_size", CHUNK_SIZE)
+    monkeypatch.setattr(config, "chunk_overlap", 0)
+    monkeypatch.setattr(config, "ingest_embed_batch_size", 8)
+    
+    processor = DocumentProcessor.__new__(DocumentProcessor)
+    processor.embedding_service = FakeEmbeddingService()
+    processor.catalog = FakeCatalog()
+    processor.embedding_cache = None
+    processor._seconds_per_chunk = 0.0
+    processor.text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=0)
+    
+    async def iter_pages(file_path, file_type):
+        yield None, text_by_path[file_path]
+    
+    processor.iter_pages = iter_pages
+    return processor
+
+
+def section(n: int, edit: str = "") -> str:
+    """About 150 characters, so every section is exactly one chunk"""
+    return f"Section {n}{edit}: " + " ".join(["carriers send location pings every fifteen minutes."] * 2)
+
+
+def ingest(processor, tmp_path, text_by_path, text: str, sha256: str):
+    path = str(tmp_path / f"{sha256}.md")
+    open(path, "w").write(text)
+    text_by_path[path] = text
+    saved = SavedUpload(path=path, size=len(text), sha256=sha256)
+    return asyncio.run(processor.ingest_saved_file(saved, "guide.md", "text/markdown", "dev_setup"))
+
+
+def test_chunk_ids_follow_content_and_repeats_get_occurrence_suffixes():
+    processor = DocumentProcessor.__new__(DocumentProcessor)
+    occurrences = {}
+    first, _ = processor._build_records("a.md", "general", ["alpha", "beta", "alpha"], occurrences=occurrences)
+    # A later batch of the same document continues the count
+    second, _ = processor._build_records("a.md", "general", ["alpha"], start_index=3, occurrences=occurrences)
+    moved, _ = processor._build_records("a.md", "general", ["beta", "alpha"])
+    
+    assert len(set(first + second)) == 4
+    assert first[2] == first[0] + "_1"
+    assert second[0] == first[0] + "_2"
+    assert set(moved) == {first[0], first[1]}
+
+
+def test_only_a_complete_ingest_of_the_same_file_counts_as_unchanged():
+    complete = {"a": {"file_hash": "h", "total_chunks": 2}, "b": {"file_hash": "h", "total_chunks": 2}}
+    partial = {"a": {"file_hash": "h", "total_chunks": 0}, "b": {"file_hash": "h", "total_chunks": 0}}
+    
+    assert DocumentProcessor._is_unchanged(complete, "h")
+    assert not DocumentProcessor._is_unchanged(complete, "other")
+    assert not DocumentProcessor._is_unchanged(complete, None)
+    assert not DocumentProcessor._is_unchanged(partial, "h")
+    assert not DocumentProcessor._is_unchanged({}, "h")
+
+
+def test_total_chunks_is_zero_until_the_document_is_finished(tmp_path, monkeypatch):
+    text_by_path = {}
+    processor = make_processor(monkeypatch, text_by_path)
+    
+    result = ingest(processor, tmp_path, text_by_path, "\n\n".join(section(n) for n in range(20)), "v1")
+    
+    service = processor.embedding_service
+    assert result["chunks_created"] == 20
+    assert {metadata["total_chunks"] for metadata in service.added} == {0}
+    assert {metadata["total_chunks"] for _, metadata in service.collection.rows.values()} == {20}
+    assert processor.catalog.documents == {("guide.md", "dev_setup"): 20}
+
+
+def test_reingesting_an_edited_document_embeds_only_the_changes(tmp_path, monkeypatch):
+    text_by_path = {}
+    processor = make_processor(monkeypatch, text_by_path)
+    ingest(processor, tmp_path, text_by_path, "\n\n".join(section(n) for n in range(20)), "v1")
+    service = processor.embedding_service
+    service.added.clear()
+    
+    # Section 5 is edited and section 10 dropped
+    edited = [section(n, " (revised)" if n == 5 else "") for n in range(20) if n != 10]
+    result = ingest(processor, tmp_path, text_by_path, "\n\n".join(edited), "v2")
+    
+    assert (result["chunks_created"], result["chunks_unchanged"], result["chunks_removed"]) == (1, 18, 2)
+    assert len(service.added) == 1 and len(service.deleted) == 2
+    rows = sorted(service.collection.rows.values(), key=lambda row: row[1]["chunk_index"])
+    assert [metadata["chunk_index"] for _, metadata in rows] == list(range(19))
+    assert [document for document, _ in rows] == edited
+    assert {metadata["total_chunks"] for _, metadata in rows} == {19}
+    assert processor.catalog.documents == {("guide.md", "dev_setup"): 19}
+
+
+def test_unchanged_reupload_writes_nothing(tmp_path, monkeypatch):
+    text_by_path = {}
+    processor = make_processor(monkeypatch, text_by_path)
+    text = "\n\n".join(section(n) for n in range(20))
+    ingest(processor, tmp_path, text_by_path, text, "v1")
+    service = processor.embedding_service
+    service.added.clear()
+    service.collection.updates.clear()
+    
+    result = ingest(processor, tmp_path, text_by_path, text, "v1")
+    
+    assert result["unchanged"] is True
+    assert result["chunks_unchanged"] == 20
+    assert service.added == [] and service.deleted == [] and service.collection.updates == []
@@ -0,0 +1,134 @@
+import asyncio
+import io
+import os
+
+from fastapi import UploadFile
+
+from llm_rag.config import config
+from llm_rag.document_processor import DocumentProcessor
+from llm_rag.jobs import MAX_ATTEMPTS, IngestionJobQueue, JobStore
+from llm_rag.uploads import SavedUpload
+
+
+def queue_ingest(store: JobStore, filename: str = "a.txt", category: str = "general") -> str:
+    return store.create(SavedUpload(path=f"/tmp/{filename}", size=1, sha256="0" * 64), filename, "text/plain", category)
+
+
+def test_claims_oldest_job_once(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    first = queue_ingest(store, "a.txt")
+    second = queue_ingest(store, "b.txt")
+    
+    assert store.claim_next(stale_seconds=60)["id"] == first
+    assert store.claim_next(stale_seconds=60)["id"] == second
+    assert store.claim_next(stale_seconds=60) is None
+
+
+def test_dead_job_is_retried_then_failed_after_max_attempts(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    job_id = queue_ingest(store)
+    
+    # A negative stale time makes every running job look abandoned
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        job = store.claim_next(stale_seconds=-1)
+        assert job["id"] == job_id
+        assert job["attempts"] == attempt
+    
+    assert store.claim_next(stale_seconds=-1) is None
+    job = store.get(job_id)
+    assert job["status"] == "error"
+    assert f"{MAX_ATTEMPTS} times" in job["error"]
+
+
+def test_jobs_for_the_same_document_run_one_at_a_time(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    first = queue_ingest(store, "a.txt")
+    second = queue_ingest(store, "a.txt")
+    other = queue_ingest(store, "b.txt")
+    
+    assert store.claim_next(stale_seconds=60)["id"] == first
+    assert store.claim_next(stale_seconds=60)["id"] == other
+    assert store.claim_next(stale_seconds=60) is None
+    
+    store.finish(first, {}, {})
+    assert store.claim_next(stale_seconds=60)["id"] == second
+
+
+def test_category_delete_waits_for_ingests_in_that_category(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    ingest = queue_ingest(store, "a.txt", "dev_setup")
+    delete = store.create_delete(None, "dev_setup", 10)
+    
+    assert store.claim_next(stale_seconds=60)["id"] == ingest
+    assert store.claim_next(stale_seconds=60) is None
+    store.finish(ingest, {}, {})
+    assert store.claim_next(stale_seconds=60)["id"] == delete
+
+
+def test_document_delete_waits_for_ingest_of_that_document_in_any_category(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    delete = store.create_delete("a.txt", None, 10)
+    ingest = queue_ingest(store, "a.txt", "dev_setup")
+    other = queue_ingest(store, "b.txt", "dev_setup")
+    
+    assert store.claim_next(stale_seconds=60)["id"] == delete
+    assert store.claim_next(stale_seconds=60)["id"] == other
+    assert store.claim_next(stale_seconds=60) is None
+    assert store.has_pending("a.txt", None, stale_seconds=60)
+    
+    store.finish(delete, {}, {})
+    assert store.claim_next(stale_seconds=60)["id"] == ingest
+    store.finish(ingest, {}, {})
+    store.finish(other, {}, {})
+    assert not store.has_pending("a.txt", None, stale_seconds=60)
+
+
+class RecordingProcessor:
+    """Saves uploads like DocumentProcessor and records what each job ingested"""
+    
+    _save_file = DocumentProcessor._save_file
+    
+    def __init__(self):
+        self.ingested = []
+    
+    async def ingest_saved_file(self, saved, filename, content_type, category, progress=None):
+        await progress("embedding", 0)
+        with open(saved.path, "rb") as f:
+            content = f.read()
+        self.ingested.append((filename, content, saved.sha256))
+        return {"chunks_created": 1, "chunks_unchanged": 0, "chunks_removed": 0}
+
+
+def upload(filename: str, content: bytes) -> UploadFile:
+    return UploadFile(file=io.BytesIO(content), filename=filename, size=len(content))
+
+
+def test_same_name_uploads_keep_their_own_content(tmp_path, monkeypatch):
+    documents = tmp_path / "documents"
+    documents.mkdir()
+    monkeypatch.setattr(config, "documents_path", str(documents))
+    monkeypatch.setattr(config, "job_files_path", str(tmp_path / "job_files"))
+    monkeypatch.setattr(config, "upload_block_size_kb", 1)
+    store = JobStore(str(tmp_path / "jobs.db"))
+    processor = RecordingProcessor()
+    queue = IngestionJobQueue(processor, store)
+    first_content, second_content = b"first " * 2000, b"second " * 2000
+    
+    async def scenario():
+        first, second = await asyncio.gather(
+            queue.submit(upload("report.txt", first_content), "general"),
+            queue.submit(upload("report.txt", second_content), "general")
+        )
+        assert first["path"] != second["path"]
+        for _ in range(2):
+            await queue._run(store.claim_next(queue.stale_seconds))
+        return first, second
+    
+    first, second = asyncio.run(scenario())
+    
+    assert [content for _, content, _ in processor.ingested] == [first_content, second_content]
+    assert [sha for _, _, sha in processor.ingested] == [first["sha256"], second["sha256"]]
+    assert store.get(first["id"])["status"] == store.get(second["id"])["status"] == "success"
+    # The last ingest is the one left in place, and the job directories are gone
+    assert (documents / "report.txt").read_bytes() == second_content
+    assert os.listdir(tmp_path / "job_files") == []
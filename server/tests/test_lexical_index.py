@@ -0,0 +1,90 @@
+from llm_rag.lexical_index import LexicalIndex, tokenize
+from llm_rag.rag_pipeline import reciprocal_rank_fusion
+
+CHUNKS = {
+    "env": "Set CHROMA_DB_PATH to move the vector store out of the working directory.",
+    "flag": "Pass --batch-files to the ingest CLI to upload a whole folder at once.",
+    "error": "Error ERR_4012 means the upstream token expired; sign in again.",
+    "prose": "The vector store keeps every chunk of every uploaded document.",
+}
+
+
+def make_index(tmp_path) -> LexicalIndex:
+    index = LexicalIndex(str(tmp_path / "lexical_index.db"))
+    index.add(list(CHUNKS), list(CHUNKS.values()))
+    return index
+
+
+class FakeCollection:
+    def __init__(self, chunks):
+        self.chunks = dict(chunks)
+    
+    def count(self):
+        return len(self.chunks)
+    
+    def get(self, ids=None, include=None):
+        ids = list(self.chunks) if ids is None else ids
+        return {"ids": ids, "documents": [self.chunks[chunk_id] for chunk_id in ids]}
+
+
+def test_compound_identifiers_are_indexed_whole_and_in_parts():
+    assert tokenize("Set CHROMA_DB_PATH now") == ["set", "chroma_db_path", "chroma", "db", "path", "now"]
+
+
+def test_exact_identifiers_rank_their_chunk_first(tmp_path):
+    index = make_index(tmp_path)
+    
+    assert index.search("What does CHROMA_DB_PATH control?", k=3)[0][0] == "env"
+    assert index.search("what is --batch-files for", k=3)[0][0] == "flag"
+    assert index.search("How do I fix ERR_4012?", k=3)[0][0] == "error"
+    scores = [score for _, score in index.search("vector store", k=4)]
+    assert scores == sorted(scores, reverse=True) and all(score > 0 for score in scores)
+
+
+def test_stopword_only_query_matches_nothing(tmp_path):
+    assert make_index(tmp_path).search("what is the", k=3) == []
+
+
+def test_deleted_and_cleared_chunks_are_not_found(tmp_path):
+    index = make_index(tmp_path)
+    index.delete(["env"])
+    
+    assert all(chunk_id != "env" for chunk_id, _ in index.search("CHROMA_DB_PATH vector", k=4))
+    assert index.count() == 3
+    
+    # Re-adding an ID replaces its text rather than duplicating it
+    index.add(["flag"], ["Nothing about the command line here."])
+    assert index.search("--batch-files", k=4) == []
+    assert index.count() == 3
+    
+    index.clear()
+    assert index.count() == 0
+    assert index.search("vector store", k=4) == []
+
+
+def test_sync_with_indexes_missing_chunks_and_drops_stale_ones(tmp_path):
+    index = make_index(tmp_path)
+    index.add(["gone"], ["Only the keyword index still has GONE_SETTING."])
+    collection = FakeCollection(CHUNKS)
+    collection.chunks["new"] = "Raise WEBHOOK_RETRY_LIMIT to retry failed webhooks longer."
+    del collection.chunks["prose"]
+    
+    assert index.sync_with(collection, batch_size=1) == {"indexed": 1, "removed": 2}
+    assert sorted(index.ids()) == sorted(collection.chunks)
+    assert index.search("WEBHOOK_RETRY_LIMIT", k=1)[0][0] == "new"
+    assert index.search("GONE_SETTING", k=1) == []
+    assert index.sync_with(collection) == {"indexed": 0, "removed": 0}
+
+
+def test_reciprocal_rank_fusion_rewards_agreement_and_honours_weights():
+    dense = ["a", "b", "c"]
+    lexical = ["c", "d", "b"]
+    
+    # b and c appear in both lists, so they beat a and d
+    fused = reciprocal_rank_fusion([dense, lexical], [1.0, 1.0], k=60)
+    assert set(fused[:2]) == {"b", "c"} and fused[2:] == ["a", "d"]
+    # Weighting the keyword list ranks its hits above dense-only ones
+    fused = reciprocal_rank_fusion([dense, lexical], [0.1, 1.0], k=60)
+    assert fused[0] == "c" and fused.index("d") < fused.index("a")
+    # With a zero weight only the other list decides the order
+    assert reciprocal_rank_fusion([dense, lexical], [1.0, 0.0], k=60)[:3] == dense
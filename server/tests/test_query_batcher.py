@@ -0,0 +1,72 @@
+import asyncio
+import threading
+
+import pytest
+
+from llm_rag.embeddings import QueryBatcher
+
+
+class CountingEncoder:
+    """Embeds a text as [len(text), position in its batch]; records every call"""
+    
+    def __init__(self, error: Exception = None):
+        self.error = error
+        self.calls = []
+        self._lock = threading.Lock()
+    
+    def __call__(self, texts):
+        with self._lock:
+            self.calls.append(list(texts))
+        if self.error is not None:
+            raise self.error
+        return [[float(len(text)), float(i)] for i, text in enumerate(texts)]
+
+
+def run_concurrently(batcher: QueryBatcher, queries, return_exceptions: bool = False):
+    async def scenario():
+        return await asyncio.gather(
+            *(batcher.embed(query) for query in queries), return_exceptions=return_exceptions
+        )
+    
+    return asyncio.run(scenario())
+
+
+def test_concurrent_queries_share_one_encode_call():
+    encoder = CountingEncoder()
+    batcher = QueryBatcher(encoder, window_ms=50, max_batch_size=32)
+    queries = [f"question {'x' * n}" for n in range(8)]
+    
+    vectors = run_concurrently(batcher, queries)
+    
+    assert encoder.calls == [queries]
+    assert vectors == [[float(len(query)), float(i)] for i, query in enumerate(queries)]
+    assert (batcher.batches_run, batcher.queries_embedded) == (1, 8)
+
+
+def test_batches_are_split_at_max_batch_size():
+    encoder = CountingEncoder()
+    batcher = QueryBatcher(encoder, window_ms=50, max_batch_size=3)
+    queries = ["q" + "x" * n for n in range(7)]
+    
+    vectors = run_concurrently(batcher, queries)
+    
+    assert encoder.calls == [queries[0:3], queries[3:6], queries[6:7]]
+    # Each caller still gets the vector for its own query
+    assert [vector[0] for vector in vectors] == [float(len(query)) for query in queries]
+    assert [vector[1] for vector in vectors] == [0.0, 1.0, 2.0, 0.0, 1.0, 2.0, 0.0]
+    assert batcher.batches_run == 3
+
+
+def test_encode_error_reaches_every_waiting_caller():
+    error = RuntimeError("model not loaded")
+    encoder = CountingEncoder(error=error)
+    batcher = QueryBatcher(encoder, window_ms=50)
+    
+    results = run_concurrently(batcher, ["a", "b", "c"], return_exceptions=True)
+    
+    assert len(encoder.calls) == 1
+    assert results == [error, error, error]
+    assert batcher.batches_run == 0
+    
+    with pytest.raises(RuntimeError):
+        run_concurrently(batcher, ["d"])
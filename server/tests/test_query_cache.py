@@ -0,0 +1,64 @@
+from llm_rag import query_cache
+from llm_rag.query_cache import QueryEmbeddingCache, normalize_query
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+def test_case_spacing_and_punctuation_are_normalized_away():
+    assert normalize_query("  How do I set up   my DEV environment?! ") == "how do i set up my dev environment"
+    assert normalize_query("What's CHROMA_DB_PATH?") == "what s chroma_db_path"
+    
+    cache = QueryEmbeddingCache(lambda: "model")
+    cache.put("How do I set up my dev environment?", [1.0])
+    assert cache.get("how do i set up my dev environment") == [1.0]
+    assert cache.get("How do I set up my prod environment?") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(query_cache.time, "monotonic", clock)
+    cache = QueryEmbeddingCache(lambda: "model", ttl_seconds=10)
+    cache.put("question", [1.0])
+    
+    clock.now += 9
+    assert cache.get("question") == [1.0]
+    clock.now += 2
+    assert cache.get("question") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = QueryEmbeddingCache(lambda: "model", max_size=2)
+    cache.put("a", [1.0])
+    cache.put("b", [2.0])
+    cache.get("a")
+    cache.put("c", [3.0])
+    
+    assert cache.get("b") is None
+    assert cache.get("a") == [1.0] and cache.get("c") == [3.0]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_changing_the_embedding_model_drops_every_entry():
+    model = ["model-a"]
+    cache = QueryEmbeddingCache(lambda: model[0])
+    cache.put("question", [1.0])
+    
+    model[0] = "model-b"
+    assert cache.get("question") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_zero_size_disables_the_cache():
+    cache = QueryEmbeddingCache(lambda: "model", max_size=0)
+    cache.put("question", [1.0])
+    
+    assert cache.get("question") is None
+    assert cache.stats()["size"] == 0
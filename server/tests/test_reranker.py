@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_rag.config import config
+from llm_rag.rag_pipeline import RAGPipeline
+from llm_rag.reranker import CrossEncoderReranker
+
+
+class StubCrossEncoder:
+    """Scores a chunk by the number in its text, optionally after a delay per batch"""
+    
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.batches = 0
+    
+    def predict(self, pairs, batch_size=None):
+        self.batches += 1
+        time.sleep(self.delay)
+        return [float(document.split()[-1]) for _, document in pairs]
+
+
+def make_reranker(model: StubCrossEncoder, budget_ms: float) -> CrossEncoderReranker:
+    reranker = CrossEncoderReranker.__new__(CrossEncoderReranker)
+    reranker.model = model
+    reranker.model_name = "stub"
+    reranker.batch_size = 2
+    reranker.budget = budget_ms / 1000
+    reranker.executor = ThreadPoolExecutor(max_workers=1)
+    reranker.reranked = reranker.fallbacks = 0
+    reranker.total_seconds = 0.0
+    
+    # Keep hold of each query's cancel flag
+    reranker.cancel_events = []
+    score = reranker._score
+    
+    def recording_score(query, documents, cancelled: threading.Event):
+        reranker.cancel_events.append(cancelled)
+        return score(query, documents, cancelled)
+    
+    reranker._score = recording_score
+    return reranker
+
+
+def make_pipeline(reranker: CrossEncoderReranker) -> RAGPipeline:
+    pipeline = RAGPipeline.__new__(RAGPipeline)
+    pipeline.reranker = reranker
+    return pipeline
+
+
+def retrieved(count: int = 10):
+    # Vector order puts the lowest-scoring chunks first
+    return {
+        "query_embedding": [0.0],
+        "ids": [f"id{n}" for n in range(count)],
+        "documents": [f"chunk {n}" for n in range(count)],
+        "metadatas": [{"source": f"doc{n}.md"} for n in range(count)],
+    }
+
+
+def test_over_budget_rerank_keeps_vector_order_and_stops_scoring(monkeypatch):
+    monkeypatch.setattr(config, "top_k_retrieval", 3)
+    monkeypatch.setattr(config, "rerank_top_n", 2)
+    model = StubCrossEncoder(delay=0.2)
+    reranker = make_reranker(model, budget_ms=20)
+    
+    start = time.perf_counter()
+    result = asyncio.run(make_pipeline(reranker)._rerank("question", retrieved()))
+    elapsed = time.perf_counter() - start
+    
+    assert result["ids"] == ["id0", "id1", "id2"]
+    assert result["documents"] == ["chunk 0", "chunk 1", "chunk 2"]
+    assert elapsed < 0.2
+    assert reranker.cancel_events[0].is_set()
+    assert reranker.fallbacks == 1
+    # The scoring thread gives up after the batch it was in
+    reranker.executor.shutdown(wait=True)
+    assert model.batches == 1
+
+
+def test_rerank_within_budget_keeps_the_best_top_n(monkeypatch):
+    monkeypatch.setattr(config, "top_k_retrieval", 3)
+    monkeypatch.setattr(config, "rerank_top_n", 2)
+    model = StubCrossEncoder()
+    reranker = make_reranker(model, budget_ms=1000)
+    
+    result = asyncio.run(make_pipeline(reranker)._rerank("question", retrieved()))
+    
+    assert result["ids"] == ["id9", "id8"]
+    assert result["metadatas"] == [{"source": "doc9.md"}, {"source": "doc8.md"}]
+    assert reranker.reranked == 1 and reranker.fallbacks == 0
+    assert model.batches == 5
+    reranker.executor.shutdown(wait=True)
@@ -8,6 +8,7 @@ RED='\033[0;31m'
 NC='\033[0m' # No Color
 
 API_URL="http://localhost:8000/api/documents/upload"
+JOBS_URL="http://localhost:8000/api/jobs"
 DOCUMENTS_DIR="server/documents"
 
 echo "📁 Uploading documents from $DOCUMENTS_DIR..."
@@ -15,10 +16,20 @@ echo "📁 Uploading documents from $DOCUMENTS_DIR..."
 # Check if backend is running
 if ! curl -s http://localhost:8000/health > /dev/null; then
     echo -e "${RED}❌ Backend is not running!${NC}"
-    echo "Start it with: cd server && source venv/bin/activate && python main.py"
+    echo "Start it with: cd server && source venv/bin/activate && uvicorn main:app --port 8000"
     exit 1
 fi
 
+# Uploads are queued on the server; remember each job so we can wait for it
+JOB_IDS=()
+JOB_FILES=()
+FAILED=0
+
+# Pull a string field out of a JSON response
+json_field() {
+    echo "$1" | sed -n "s/.*\"$2\":\"\([^\"]*\)\".*/\1/p"
+}
+
 # Function to upload a file
 upload_file() {
     local file=$1
@@ -26,18 +37,43 @@ upload_file() {
     
     echo -e "${YELLOW}📄 Uploading: $(basename $file) (category: $category)${NC}"
     
-    response=$(curl -s -X POST "$API_URL" \
-        -F "file=@$file" \
-        -F "category=$category")
+    response=$(curl -s -X POST "$API_URL?category=$category" \
+        -F "file=@$file")
     
-    if echo "$response" | grep -q "success"; then
-        echo -e "${GREEN}✅ Successfully uploaded: $(basename $file)${NC}"
+    job_id=$(json_field "$response" "job_id")
+    if [ -n "$job_id" ]; then
+        echo -e "${GREEN}📥 Queued: $(basename $file) (job $job_id)${NC}"
+        JOB_IDS+=("$job_id")
+        JOB_FILES+=("$(basename $file)")
     else
         echo -e "${RED}❌ Failed to upload: $(basename $file)${NC}"
         echo "Response: $response"
+        FAILED=$((FAILED + 1))
     fi
 }
 
+# Poll every queued job until it succeeds or fails
+wait_for_jobs() {
+    echo ""
+    echo "⏳ Waiting for ${#JOB_IDS[@]} ingestion jobs..."
+    for i in "${!JOB_IDS[@]}"; do
+        while true; do
+            job=$(curl -s "$JOBS_URL/${JOB_IDS[$i]}")
+            status=$(json_field "$job" "status")
+            if [ "$status" == "success" ]; then
+                echo -e "${GREEN}✅ Successfully processed: ${JOB_FILES[$i]}${NC}"
+                break
+            elif [ "$status" != "queued" ] && [ "$status" != "running" ]; then
+                echo -e "${RED}❌ Failed to process: ${JOB_FILES[$i]}${NC}"
+                echo "Response: $job"
+                FAILED=$((FAILED + 1))
+                break
+            fi
+            sleep 1
+        done
+    done
+}
+
 # Upload files based on filename patterns or directory structure
 if [ -d "$DOCUMENTS_DIR" ]; then
     # Upload all .txt files
@@ -86,8 +122,14 @@ if [ -d "$DOCUMENTS_DIR" ]; then
         fi
     done
     
+    wait_for_jobs
+    
     echo ""
-    echo -e "${GREEN}✅ Upload complete!${NC}"
+    if [ "$FAILED" -gt 0 ]; then
+        echo -e "${RED}❌ $FAILED documents failed${NC}"
+    else
+        echo -e "${GREEN}✅ Upload complete!${NC}"
+    fi
     echo "Check stats: curl http://localhost:8000/api/documents/stats"
 else
     echo -e "${RED}❌ Documents directory not found: $DOCUMENTS_DIR${NC}"